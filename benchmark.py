@@ -0,0 +1,273 @@
+"""
+Benchmark suite for the game loop.
+
+Every scenario builds a stress situation directly on AndromedaClashGameState (headless, drawn into the
+SDL dummy display) and measures the update, collision, draw and display.update phases of every frame.
+
+    python benchmark.py --output results.json
+    python benchmark.py --compare baseline.json             # run and flag regressions against a baseline
+    python benchmark.py --compare baseline.json --current results.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+import numpy as np
+import pygame
+from game.headless import create_headless_state
+from game.game_state import AndromedaClashGameState
+from game import consts, objects
+from game.user_input import BotUserInput
+
+PHASES = ("update", "collision", "draw", "display", "frame")
+RESULT_VERSION = 1
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    setup: Callable[[AndromedaClashGameState, random.Random], None]
+    frames: int
+    warmup: int = 0 # Frames, die vor dem Messen ohne Rendern simuliert werden
+
+class PhaseTimer:
+    """
+    Misst pro Frame die Zeit der einzelnen Phasen, indem die zuständigen Methoden umhüllt werden.
+    Die Kollisionen laufen innerhalb der Updates, update ist daher die Zeit des Frames ohne die anderen Phasen.
+    """
+    current: dict[str, float]
+    frames: list[dict[str, float]]
+
+    def __init__(self):
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frames = []
+
+    def _timed(self, function: Callable[..., Any], phase: str) -> Callable[..., Any]:
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.current[phase] += time.perf_counter() - start
+        return timed_function
+
+    @contextmanager
+    def patched(self, state: AndromedaClashGameState) -> Iterator[None]:
+        patches: list[tuple[Any, str, Any]] = [
+            (objects.SpaceShip, "collision", "collision"),
+            (objects.PowerUp, "collision", "collision"),
+            (objects.Stone, "collision", "collision"),
+            (objects.CommonEnemy, "collision", "collision"),
+            (state, "draw_objects", "draw"),
+            (state, "draw_active_powerups", "draw"),
+            (pygame.display, "update", "display"),
+        ]
+        originals = [(owner, name, vars(owner).get(name)) for owner, name, _ in patches]
+        for owner, name, phase in patches:
+            setattr(owner, name, self._timed(getattr(owner, name), phase))
+        try:
+            yield
+        finally:
+            for owner, name, original in originals:
+                if original is None:
+                    delattr(owner, name) # Beim Spielzustand gilt danach wieder die Methode der Klasse
+                else:
+                    setattr(owner, name, original)
+
+    def run_frame(self, state: AndromedaClashGameState) -> None:
+        self.current = dict.fromkeys(PHASES, 0.0)
+        start = time.perf_counter()
+        state.step()
+        frame = time.perf_counter() - start
+        state.clock.tick(state.fps)
+        self.current["frame"] = frame
+        self.current["update"] = frame - self.current["collision"] - self.current["draw"] - self.current["display"]
+        self.frames.append(self.current)
+
+def summarize(values: list[float]) -> dict[str, float]:
+    milliseconds = [value * 1000 for value in values]
+    cuts = statistics.quantiles(milliseconds, n=100, method="inclusive")
+    return {
+        "mean_ms": statistics.fmean(milliseconds),
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "p99_ms": cuts[98],
+        "max_ms": max(milliseconds),
+    }
+
+# Szenarien
+
+def _skip() -> None:
+    pass
+
+def _isolate(state: AndromedaClashGameState) -> None:
+    """
+    Keine natürlichen Spawns, und der Spieler kann nicht sterben, damit die Last über alle Frames gleich bleibt.
+    """
+    state.spawn_stone = _skip
+    state.spawn_powerup = _skip
+    state.spawn_enemy = _skip
+    state.player.invincible = True
+
+def _add_stones(state: AndromedaClashGameState, rng: random.Random, count: int) -> None:
+    for _ in range(count):
+        size = rng.choice(consts.STONE_SIZES)
+        pos = (rng.random() * consts.SCREEN_WIDTH, rng.random() * consts.SCREEN_HEIGHT * 0.75)
+        vel = ((rng.random() - 0.5) * 2, (rng.random() - 0.5) * 0.1) # Fast waagrecht, damit die Steine im Bild bleiben
+        turning_speed = consts.STONE_TURNING_SPEED_MIN + rng.random() * (consts.STONE_TURNING_SPEED_MAX - consts.STONE_TURNING_SPEED_MIN)
+        state.add_object(objects.Stone(pos, vel, size, turning_speed))
+
+def _activate(state: AndromedaClashGameState, power_up_type: type[objects.PowerUp]) -> None:
+    power_up = power_up_type([0, 0], (0, 0))
+    power_up.game_state = state
+    state.activate_powerup(power_up)
+
+def setup_stones(state: AndromedaClashGameState, rng: random.Random) -> None:
+    _isolate(state)
+    _add_stones(state, rng, 500)
+
+def setup_projectiles(state: AndromedaClashGameState, rng: random.Random) -> None:
+    _isolate(state)
+    _activate(state, objects.StrikePowerUp)
+    _activate(state, objects.MultishotPowerUp)
+    angle = consts.PROJECILE_MULTISHOT_ANGLE
+    for _ in range(2000):
+        direction = rng.choice((-angle, 0, angle))
+        speed = 0.25 + rng.random() * 0.5 # Langsam, damit die Projektile im Bild bleiben
+        pos = (rng.random() * consts.SCREEN_WIDTH, rng.random() * consts.SCREEN_HEIGHT)
+        state.add_object(objects.WaveProjectile(pos, (math.sin(direction) * speed, -math.cos(direction) * speed), direction, objects.ProjectileOwner.PLAYER))
+    _add_stones(state, rng, 40)
+    for _ in range(10):
+        state.add_object(state.create_enemy(objects.CommonEnemy))
+
+def setup_boss_wave(state: AndromedaClashGameState, rng: random.Random) -> None:
+    _isolate(state)
+    for _ in range(50):
+        state.add_object(state.create_enemy(objects.BossEnemy))
+
+def setup_late_game(state: AndromedaClashGameState, rng: random.Random) -> None:
+    state.player.invincible = True # Natürliches Spiel, nur ohne Game Over
+
+SCENARIOS: list[Scenario] = [
+    Scenario("stones_500", "500 stones drifting across the screen", setup_stones, 300),
+    Scenario("projectiles_2000", "2000 piercing player projectiles with multishot and StrikePowerUp", setup_projectiles, 300),
+    Scenario("boss_wave_50", "a wave of 50 BossEnemy", setup_boss_wave, 300),
+    Scenario("late_game", "natural game after a 2 minute warmup, invincible player", setup_late_game, 60 * consts.SECOND, warmup=120 * consts.SECOND),
+]
+
+def run_scenario(scenario: Scenario, seed: int, frame_scale: float, dirty_rects: bool) -> dict[str, Any]:
+    state = create_headless_state(BotUserInput(), render=False, seed=seed, dirty_rects=dirty_rects)
+    scenario.setup(state, random.Random(f"{seed}:{scenario.name}"))
+    for _ in range(round(scenario.warmup * frame_scale)):
+        state.step()
+        state.clock.tick(state.fps)
+    state.render = True
+    timer = PhaseTimer()
+    frames = max(2, round(scenario.frames * frame_scale))
+    with timer.patched(state):
+        for _ in range(frames):
+            timer.run_frame(state)
+    total = sum(frame["frame"] for frame in timer.frames)
+    return {
+        "description": scenario.description,
+        "frames": frames,
+        "frames_per_second": frames / total if total > 0 else 0.0,
+        "objects_at_end": len(state.current_objects),
+        "projectiles_at_end": len(state.projectiles),
+        "phases": {phase: summarize([frame[phase] for frame in timer.frames]) for phase in PHASES},
+    }
+
+def run_benchmarks(names: list[str], seed: int, frame_scale: float, dirty_rects: bool) -> dict[str, Any]:
+    scenarios = [scenario for scenario in SCENARIOS if not names or scenario.name in names]
+    results: dict[str, Any] = {
+        "version": RESULT_VERSION,
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "frame_scale": frame_scale,
+            "dirty_rects": dirty_rects,
+        },
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        print(f"running {scenario.name} ...", file=sys.stderr)
+        results["scenarios"][scenario.name] = run_scenario(scenario, seed, frame_scale, dirty_rects)
+    return results
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float, min_delta_ms: float, statistic: str) -> list[str]:
+    """
+    Vergleicht jede Phase jedes Szenarios. Gibt die Regressionen zurück: langsamer um mehr als threshold (relativ)
+    und mehr als min_delta_ms (absolut, damit Messrauschen bei sehr kurzen Phasen nicht zählt).
+    """
+    regressions = []
+    print(f"{'scenario':<18} {'phase':<10} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, scenario in current["scenarios"].items():
+        base_scenario = baseline["scenarios"].get(name)
+        if base_scenario is None:
+            print(f"{name:<18} (not in baseline)")
+            continue
+        for phase in PHASES:
+            base_value = base_scenario["phases"][phase][statistic]
+            value = scenario["phases"][phase][statistic]
+            change = (value - base_value) / base_value if base_value > 0 else 0.0
+            regressed = change > threshold and value - base_value > min_delta_ms
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<18} {phase:<10} {base_value:>8.3f}ms {value:>8.3f}ms {change:>+7.1%}{flag}")
+            if regressed:
+                regressions.append(f"{name}/{phase}")
+    return regressions
+
+def print_results(results: dict[str, Any]) -> None:
+    print(f"{'scenario':<18} {'fps':>8}  " + "".join(f"{phase + ' p50/p95 ms':>22}" for phase in PHASES))
+    for name, scenario in results["scenarios"].items():
+        cells = "".join(
+            f"{scenario['phases'][phase]['p50_ms']:>12.3f}/{scenario['phases'][phase]['p95_ms']:<9.3f}"
+            for phase in PHASES
+        )
+        print(f"{name:<18} {scenario['frames_per_second']:>8.1f}  {cells}")
+
+parser = argparse.ArgumentParser(description="Scenario benchmarks for the Andromeda Clash game loop.")
+parser.add_argument("--scenario", action="append", default=[], choices=[scenario.name for scenario in SCENARIOS], help="only run this scenario (repeatable)")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--frame-scale", type=float, default=1.0, help="multiply the number of frames of every scenario")
+parser.add_argument("--dirty-rects", action="store_true", help="render with the dirty-rect renderer")
+parser.add_argument("--output", metavar="PATH", help="write the results as JSON")
+parser.add_argument("--compare", metavar="BASELINE", help="compare against a stored result file and exit with 1 on regressions")
+parser.add_argument("--current", metavar="PATH", help="with --compare: use this result file instead of running the benchmarks")
+parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression (default: 0.10)")
+parser.add_argument("--min-delta-ms", type=float, default=0.05, help="absolute slowdown below which changes are ignored (default: 0.05)")
+parser.add_argument("--statistic", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"], help="statistic used for --compare")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.current:
+        with open(args.current, encoding="utf-8") as file:
+            results = json.load(file)
+    else:
+        results = run_benchmarks(args.scenario, args.seed, args.frame_scale, args.dirty_rects)
+        print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, results, args.threshold, args.min_delta_ms, args.statistic)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("no regressions")
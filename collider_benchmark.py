@@ -0,0 +1,115 @@
+"""
+Measures the memory per collider instance and the collides() throughput of game/collider.py.
+
+    python collider_benchmark.py
+    python collider_benchmark.py --baseline 829d96a^     # compare with collider.py from another revision
+
+The baseline module is read with git show and imported on its own, so any revision whose collider.py has
+BoxCollider, CircleCollider and RotatedRectangleCollider can be compared.
+"""
+from __future__ import annotations
+import argparse
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+from collections.abc import Callable
+from typing import Any
+from game import collider as module_collider
+
+PAIR_KINDS = ("mixed", "box-circle", "box-box")
+
+def load_collider_module(revision: str) -> types.ModuleType:
+    source = subprocess.run(["git", "show", f"{revision}:game/collider.py"], capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType(f"collider_{revision}")
+    sys.modules[module.__name__] = module # dataclasses looks the module up while creating the classes
+    exec(compile(source, f"{revision}:game/collider.py", "exec"), module.__dict__)
+    return module
+
+def get_factories(module: types.ModuleType, rng: random.Random) -> dict[str, Callable[[], Any]]:
+    def position() -> tuple[float, float]:
+        return (rng.random() * 600, rng.random() * 400)
+    return {
+        "Box": lambda: module.BoxCollider(rng.uniform(4, 60), rng.uniform(4, 60), position()),
+        "Circle": lambda: module.CircleCollider(rng.uniform(4, 40), position()),
+        "Rotated": lambda: module.RotatedRectangleCollider(rng.uniform(4, 60), rng.uniform(4, 60), position(), rng.uniform(-1, 1)),
+    }
+
+def measure_bytes(module: types.ModuleType, count: int, seed: int) -> dict[str, float]:
+    """
+    Bytes per instance, measured with tracemalloc over count instances (the random numbers are drawn beforehand).
+    """
+    results = {}
+    for name in ("Box", "Circle", "Rotated"):
+        rng = random.Random(seed)
+        arguments = [(rng.uniform(4, 60), rng.uniform(4, 60), (rng.random() * 600, rng.random() * 400), rng.uniform(-1, 1)) for _ in range(count)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        if name == "Box":
+            instances = [module.BoxCollider(width, height, pos) for width, height, pos, _ in arguments]
+        elif name == "Circle":
+            instances = [module.CircleCollider(width, pos) for width, _, pos, _ in arguments]
+        else:
+            instances = [module.RotatedRectangleCollider(width, height, pos, rotation) for width, height, pos, rotation in arguments]
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[name] = (used - sys.getsizeof(instances)) / count
+    return results
+
+def make_pairs(module: types.ModuleType, kind: str, count: int, seed: int) -> list[tuple[Any, Any]]:
+    rng = random.Random(seed)
+    factories = get_factories(module, rng)
+    if kind == "box-box":
+        return [(factories["Box"](), factories["Box"]()) for _ in range(count)]
+    if kind == "box-circle":
+        return [(factories["Box"](), factories["Circle"]()) for _ in range(count)]
+    names = list(factories)
+    return [(factories[rng.choice(names)](), factories[rng.choice(names)]()) for _ in range(count)]
+
+def measure_throughput(module: types.ModuleType, kind: str, count: int, repeats: int, seed: int) -> float:
+    """
+    Million collides() calls per second, best of repeats runs over count pairs.
+    """
+    pairs = make_pairs(module, kind, count, seed)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for first, second in pairs:
+            first.collides(second)
+        best = min(best, time.perf_counter() - start)
+    return count / best / 1e6
+
+def count_differences(baseline: types.ModuleType, module: types.ModuleType, count: int, seed: int) -> int:
+    """
+    On how many of the same random pairs the two modules disagree.
+    """
+    pairs = zip(make_pairs(baseline, "mixed", count, seed), make_pairs(module, "mixed", count, seed))
+    return sum(first.collides(second) != other_first.collides(other_second) for (first, second), (other_first, other_second) in pairs)
+
+def measure(module: types.ModuleType, args: argparse.Namespace) -> dict[str, float]:
+    results = {f"{name} bytes/instance": value for name, value in measure_bytes(module, args.instances, args.seed).items()}
+    for kind in PAIR_KINDS:
+        results[f"{kind} M collides/s"] = measure_throughput(module, kind, args.pairs, args.repeats, args.seed)
+    return results
+
+parser = argparse.ArgumentParser(description="Memory and collides() throughput of the collider classes.")
+parser.add_argument("--baseline", metavar="REVISION", help="also measure game/collider.py of this git revision")
+parser.add_argument("--instances", type=int, default=10000, help="instances per class for the memory measurement")
+parser.add_argument("--pairs", type=int, default=2000, help="collider pairs per throughput measurement")
+parser.add_argument("--repeats", type=int, default=7, help="the best of this many runs counts")
+parser.add_argument("--seed", type=int, default=1)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    columns = {"current": measure(module_collider, args)}
+    baseline = load_collider_module(args.baseline) if args.baseline else None
+    if baseline is not None:
+        columns = {args.baseline: measure(baseline, args), **columns}
+    print(f"{'':28}" + "".join(f"{name:>14}" for name in columns))
+    for row in columns["current"]:
+        print(f"{row:28}" + "".join(f"{values[row]:>14.2f}" for values in columns.values()))
+    if baseline is not None:
+        print(f"different results on {count_differences(baseline, module_collider, args.pairs, args.seed)} of {args.pairs} mixed pairs")
@@ -0,0 +1,50 @@
+"""
+Checks which text sizes take the glyph path, i.e. are composed from single glyphs instead of rasterized (headless).
+
+    python -m unittest fonts_test
+"""
+import unittest
+from game.headless import init_headless
+from game import consts, fonts, objects
+import pygame
+
+WHITE = (255, 255, 255)
+
+class GlyphAtlasTest(unittest.TestCase):
+    def setUp(self):
+        init_headless()
+
+    def get_atlas(self, size: int) -> fonts.GlyphAtlas:
+        return fonts.GlyphAtlas(fonts.load_font(consts.FONT_NAME, size), WHITE)
+
+    def assert_same_as_font(self, atlas: fonts.GlyphAtlas, text: str) -> None:
+        expected = atlas.font.render(text, True, WHITE)
+        composed = atlas.compose(text)
+        self.assertEqual(composed.get_size(), expected.get_size(), text)
+        self.assertEqual(pygame.image.tobytes(composed, "RGBA"), pygame.image.tobytes(expected, "RGBA"), text)
+
+    def test_glyph_sizes(self):
+        usable = [size for size in range(8, 41, 2) if self.get_atlas(size).usable]
+        self.assertEqual(usable, [8, 16, 24, 26, 28, 30, 32, 34, 36, 38, 40])
+
+    def test_hud_texts_take_the_glyph_path(self):
+        for cls, size in ((objects.Score, consts.TEXT_SIZE_SCORE), (objects.Credits, consts.TEXT_SIZE_CREDITS)):
+            with self.subTest(cls.__name__):
+                self.assertTrue(cls.use_glyphs)
+                self.assertTrue(self.get_atlas(size).usable)
+
+    def test_composed_texts_match_the_font(self):
+        for size in (consts.TEXT_SIZE_SCORE, consts.TEXT_SIZE_CREDITS):
+            atlas = self.get_atlas(size)
+            for text in ("0", "1234", "Score: 120", "gjpqy_", "Highscore: 99"):
+                with self.subTest(size=size, text=text):
+                    self.assert_same_as_font(atlas, text)
+
+    def test_text_cache_composes_only_with_glyphs(self):
+        cache = fonts.TextCache()
+        cache.render(consts.FONT_NAME, consts.TEXT_SIZE_CREDITS, "Credits: 3", WHITE, use_glyphs=True)
+        cache.render(consts.FONT_NAME, consts.TEXT_SIZE_CREDITS, "Credits: 4", WHITE)
+        self.assertEqual(cache.composed, 1)
+
+if __name__ == "__main__":
+    unittest.main()
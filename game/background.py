@@ -0,0 +1,152 @@
+from __future__ import annotations
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Optional
+import math
+import pygame
+from . import consts
+from .images import Image, load_image, convert_for_display
+
+LayerDetails = tuple[Path, Optional[tuple[int, int]], float] # Bild, Grösse einer Kachel, Pixel pro Frame
+
+COLOR_KEY = (255, 0, 255) # Ersetzt bei Bildern, die nur ganz durchsichtige oder ganz deckende Pixel haben, die Transparenz
+
+def _convert_layer(surface: Image) -> tuple[Image, bool]:
+    """
+    Wandelt einen Layer ins Format des Bildschirms um. Bilder ohne halbdurchsichtige Pixel bekommen statt des Alphakanals
+    einen Colorkey mit RLE, so werden die durchsichtigen Stellen beim Blitten übersprungen.
+    Gibt das Bild zurück und ob es den Bildschirm ganz bedeckt.
+    """
+    if not surface.get_flags() & pygame.SRCALPHA:
+        return convert_for_display(surface, alpha=False), True
+    visible = pygame.mask.from_surface(surface, 0).count()
+    if visible == surface.get_width() * surface.get_height():
+        return convert_for_display(surface, alpha=False), True
+    if visible != pygame.mask.from_surface(surface, 254).count():
+        return convert_for_display(surface), False
+    keyed = pygame.Surface(surface.get_size())
+    keyed.fill(COLOR_KEY)
+    keyed.blit(surface, (0, 0))
+    keyed = convert_for_display(keyed, alpha=False)
+    keyed.set_colorkey(COLOR_KEY, pygame.RLEACCEL)
+    return keyed, False
+
+def _scale_size(size: tuple[int, int], scale: float) -> tuple[int, int]:
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+class ParallaxLayer:
+    """
+    Ein Bild, das gekachelt wird und mit speed Pixeln pro Frame nach unten scrollt.
+    Die Kacheln werden beim Erstellen für jede Auflösung in scales einmal in einen Streifen kopiert, der um eine Kachel höher
+    ist als der Bildschirm. Gemalt wird immer genau ein bildschirmgrosser Ausschnitt davon, egal wie schnell der Layer scrollt.
+    """
+    screen_size: tuple[int, int]
+    strips: dict[float, Image] # Der Streifen für jede Auflösung
+    periods: dict[float, int] # Höhe einer Kachel in jeder Auflösung, nach so vielen Pixeln wiederholt sich der Layer
+    opaque: bool # Ob der Layer alles hinter ihm verdeckt
+    period: int # Höhe einer Kachel in Pixeln des Bildschirms
+    speed: float
+    offset: float # In Pixeln des Bildschirms
+    scale: float # Die Auflösung, in der gerade gemalt wird
+    area: pygame.Rect # Der Ausschnitt des Streifens, der gemalt wird
+
+    def __init__(self, image: Image, screen_size: tuple[int, int], tile_size: tuple[int, int], speed: float, scales: Iterable[float] = (1.0,)):
+        self.screen_size = screen_size
+        self.strips = {}
+        self.periods = {}
+        for scale in scales:
+            width, height = _scale_size(screen_size, scale)
+            tile = pygame.transform.scale(image, _scale_size(tile_size, scale))
+            tile_width, tile_height = tile.get_size()
+            rows = math.ceil(height / tile_height) + (1 if speed else 0)
+            strip = pygame.Surface((width, rows * tile_height), tile.get_flags() & pygame.SRCALPHA)
+            strip.blits([(tile, (x, y)) for y in range(0, rows * tile_height, tile_height) for x in range(0, width, tile_width)], False)
+            self.strips[scale], self.opaque = _convert_layer(strip)
+            self.periods[scale] = tile_height
+        self.period = tile_size[1]
+        self.speed = speed
+        self.offset = 0.0
+        self.set_scale(next(iter(self.strips)))
+
+    def set_scale(self, scale: float) -> None:
+        self.scale = scale
+        self.area = pygame.Rect((0, self._get_top()), _scale_size(self.screen_size, scale))
+
+    def _get_top(self) -> int:
+        return -int(self.offset * self.scale) % self.periods[self.scale]
+
+    def update(self) -> bool:
+        """
+        Scrollt weiter. Gibt zurück, ob sich das Bild auf dem Bildschirm dadurch verändert hat.
+        """
+        if not self.speed:
+            return False
+        self.offset = (self.offset + self.speed) % self.period
+        top = self._get_top()
+        if top == self.area.y:
+            return False
+        self.area.y = top
+        return True
+
+class Background:
+    """
+    Der Hintergrund aus mehreren Parallax-Layern, von hinten nach vorne gemalt. Ist der hinterste Layer deckend,
+    muss der Bildschirm vorher nicht gelöscht werden. Mit set_scale wird er in einer der beim Erstellen angegebenen
+    kleineren Auflösungen gemalt (siehe renderer.DynamicResolution).
+    changed_rects enthält die Bereiche, die sich seit dem letzten Frame verändert haben, für den DirtyRectRenderer.
+    Ein scrollender Sternenhimmel verändert fast in jedem Frame den ganzen Bildschirm. Mit scrolling=False bleiben
+    die Layer deshalb stehen, dann muss der DirtyRectRenderer nur die bemalten Bereiche übergeben.
+    """
+    screen_size: tuple[int, int]
+    screen_rect: pygame.Rect # In der aktuellen Auflösung
+    scrolling: bool
+    layers: list[ParallaxLayer]
+    changed_rects: list[pygame.Rect]
+    _image: Optional[Image] # Alle Layer zusammen, zum Wiederherstellen einzelner Bereiche
+
+    def __init__(self, screen_size: tuple[int, int], layers: Iterable[LayerDetails] = consts.BACKGROUND_LAYERS, scales: Iterable[float] = (1.0,), scrolling: bool = True):
+        scales = tuple(scales)
+        self.screen_size = screen_size
+        self.scrolling = scrolling
+        self.layers = [
+            ParallaxLayer(load_image(path), screen_size, tile_size or screen_size, speed, scales)
+            for path, tile_size, speed in layers
+        ]
+        self.changed_rects = []
+        self.set_scale(scales[0])
+
+    def set_scale(self, scale: float) -> None:
+        for layer in self.layers:
+            layer.set_scale(scale)
+        self.screen_rect = pygame.Rect((0, 0), _scale_size(self.screen_size, scale))
+        self.changed_rects = [self.screen_rect]
+        self._image = None
+
+    def update(self) -> None:
+        if not self.scrolling:
+            self.changed_rects = []
+            return
+        moved = [layer.update() for layer in self.layers] # Alle Layer scrollen, auch wenn sich schon einer bewegt hat.
+        if any(moved):
+            self.changed_rects = [self.screen_rect]
+            self._image = None
+        else:
+            self.changed_rects = []
+
+    def draw(self, canvas: pygame.Surface, rects: Optional[list[pygame.Rect]] = None) -> None:
+        """
+        Malt den Hintergrund ganz oder, falls rects angegeben sind, nur in diesen Bereichen.
+        """
+        if rects is not None:
+            image = self.get_image()
+            canvas.blits([(image, rect, rect) for rect in rects], False)
+            return
+        if not self.layers or not self.layers[0].opaque:
+            canvas.fill((0, 0, 0))
+        canvas.blits([(layer.strips[layer.scale], (0, 0), layer.area) for layer in self.layers], False)
+
+    def get_image(self) -> Image:
+        if self._image is None:
+            self._image = convert_for_display(pygame.Surface(self.screen_rect.size), alpha=False)
+            self.draw(self._image)
+        return self._image
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import deque
+import time
+import pygame
+
+class GameClockType(ABC):
+    """
+    Taktgeber der Hauptschleife. pygame.time.Clock erfüllt diese Schnittstelle ebenfalls.
+    """
+    @abstractmethod
+    def tick(self, framerate: int = 0) -> int:
+        """
+        Wird einmal pro Frame aufgerufen. Gibt die Millisekunden seit dem letzten Aufruf zurück.
+        """
+
+    @abstractmethod
+    def get_fps(self) -> float:
+        """
+        Wie viele Frames pro Sekunde zuletzt tatsächlich berechnet wurden.
+        """
+
+GameClockType.register(pygame.time.Clock)
+
+class VirtualClock(GameClockType):
+    """
+    Uhr für Simulationen ohne Fenster. tick() wartet nicht, die Frames laufen also so schnell, wie die CPU es erlaubt.
+    Nach außen gibt tick() trotzdem die Zeit zurück, die ein Frame bei der gewünschten Bildrate dauern würde.
+    """
+    ticks: int
+    start_time: float
+    recent_tick_times: deque[float] # Echte Zeitpunkte der letzten Ticks, für get_fps()
+
+    def __init__(self, fps_window: int = 60):
+        self.ticks = 0
+        self.start_time = time.perf_counter()
+        self.recent_tick_times = deque([self.start_time], maxlen=fps_window + 1)
+
+    def tick(self, framerate: int = 0) -> int:
+        self.ticks += 1
+        self.recent_tick_times.append(time.perf_counter())
+        return round(1000 / framerate) if framerate else 0
+
+    def get_fps(self) -> float:
+        duration = self.recent_tick_times[-1] - self.recent_tick_times[0]
+        if duration <= 0:
+            return 0.0
+        return (len(self.recent_tick_times) - 1) / duration
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Echte Sekunden seit dem Erstellen der Uhr.
+        """
+        return time.perf_counter() - self.start_time
+
+    @property
+    def ticks_per_second(self) -> float:
+        """
+        Durchschnittliche Ticks pro echter Sekunde über den gesamten Lauf.
+        """
+        elapsed = self.recent_tick_times[-1] - self.start_time
+        if elapsed <= 0:
+            return 0.0
+        return self.ticks / elapsed
@@ -1,19 +1,38 @@
 from __future__ import annotations
-from abc import ABC, abstractmethod
-from itertools import combinations, product
+from abc import ABC
 from dataclasses import dataclass, field
-from typing import Optional
-from collections.abc import Iterable
+from typing import Any, Optional
+from collections.abc import Callable, Iterable, Sequence
 import math
+import numpy as np
+
+number = float | int
+Bounds = tuple[number, number, number, number] # min_x, min_y, max_x, max_y
+
+CollisionFunction = Callable[[Any, Any], bool]
 
 class Collider(ABC):
-    @abstractmethod
+    """
+    Alle Collider haben __slots__, damit die vielen kleinen Collider ohne eigenes __dict__ auskommen.
+    collides() sucht die passende Funktion in einer Tabelle (siehe register_collision) statt in isinstance-Ketten.
+    """
+    __slots__ = ()
+    
     def collides(self, other: Collider) -> bool:
-        pass
-
-number = float | int
+        try:
+            function = _resolved_collision_functions[type(self), type(other)]
+        except KeyError:
+            function = _resolve_collision_function(type(self), type(other))
+        return function(self, other)
+    
+    def get_bounds(self) -> Optional[Bounds]:
+        """
+        Achsenparallele Hülle des Colliders, None falls er nichts treffen kann.
+        """
+        return None
 
 class PositionedCollider(Collider):
+    __slots__ = ("pos_x", "pos_y")
     pos_x: number
     pos_y: number
     @property
@@ -26,6 +45,7 @@ class PositionedCollider(Collider):
         self.pos_y = value[1]
 
 class BoxCollider(PositionedCollider):
+    __slots__ = ("width", "height")
     width: number
     height: number
     @property
@@ -35,17 +55,11 @@ class BoxCollider(PositionedCollider):
     def __init__(self, width: number, height: number, position: tuple[number, number] = (0, 0)):
         self.width = width
         self.height = height
-        self.position = position
-    
-    def collides(self, other):
-        if isinstance(other, BoxCollider):
-            return self.collide_box_collider(other)
-        if isinstance(other, CircleCollider):
-            return other.collide_box_collider(self)
-        if isinstance(other, RotatedRectangleCollider):
-            return other.collide_box_collider(self)
-        return False # Falls es ein anderer Typ ist
-        
+        self.pos_x, self.pos_y = position
+    
+    def get_bounds(self) -> Optional[Bounds]:
+        return (self.pos_x - self.width / 2, self.pos_y - self.height / 2, self.pos_x + self.width / 2, self.pos_y + self.height / 2)
+    
     def collide_box_collider(self, other: BoxCollider):
         if abs(self.pos_x - other.pos_x) > (self.width + other.width) / 2:
             return False
@@ -54,72 +68,63 @@ class BoxCollider(PositionedCollider):
         return True
 
 class CircleCollider(PositionedCollider):
+    __slots__ = ("radius",)
     radius: number
     def __init__(self, radius: number, position: tuple[number, number] = (0, 0)):
         self.radius = radius
-        self.position = position
-    
-    def collides(self, other):
-        if isinstance(other, CircleCollider):
-            return self.collide_circle_collider(other)
-        if isinstance(other, BoxCollider):
-            return self.collide_box_collider(other)
-        if isinstance(other, RotatedRectangleCollider):
-            return other.collide_circle_collider(self)
-        return False
+        self.pos_x, self.pos_y = position
+    
+    def get_bounds(self) -> Optional[Bounds]:
+        return (self.pos_x - self.radius, self.pos_y - self.radius, self.pos_x + self.radius, self.pos_y + self.radius)
     
     def collide_circle_collider(self, other: CircleCollider):
-        return math.sqrt((self.pos_x - other.pos_x) ** 2 + (self.pos_y - other.pos_y) ** 2) <= self.radius + other.radius
+        return (self.pos_x - other.pos_x) ** 2 + (self.pos_y - other.pos_y) ** 2 <= (self.radius + other.radius) ** 2
     
     def collide_box_collider(self, other: BoxCollider):
         dx, dy = other.pos_x - self.pos_x, other.pos_y - self.pos_y
         reduced_dx, reduced_dy = max(abs(dx) - other.width / 2, 0), max(abs(dy) - other.height / 2, 0)
-        return math.sqrt(reduced_dx ** 2 + reduced_dy ** 2) <= self.radius
+        return reduced_dx ** 2 + reduced_dy ** 2 <= self.radius ** 2
 
 
 
 class PolyPositionedCollider(PositionedCollider):
+    __slots__ = ("colliders",)
     colliders: list[PositionedCollider]
     def __init__(self, colliders: Iterable[PositionedCollider], position: tuple[number, number] = (0, 0)):
         self.colliders = list(colliders)
-        self.position = position
+        self.pos_x, self.pos_y = position
     
-    def collides(self, other):
+    def get_bounds(self) -> Optional[Bounds]:
+        bounds = None
         for collider in self.colliders:
-            collider.position = self.position
+            collider.pos_x, collider.pos_y = self.pos_x, self.pos_y
+            collider_bounds = collider.get_bounds()
+            if collider_bounds is None:
+                continue
+            if bounds is None:
+                bounds = collider_bounds
+                continue
+            bounds = (
+                min(bounds[0], collider_bounds[0]), min(bounds[1], collider_bounds[1]),
+                max(bounds[2], collider_bounds[2]), max(bounds[3], collider_bounds[3])
+            )
+        return bounds
+    
+    def collide_any(self, other: Collider) -> bool:
+        for collider in self.colliders:
+            collider.pos_x, collider.pos_y = self.pos_x, self.pos_y
             if collider.collides(other):
                 return True
         return False
 
 class EmptyCollider(PositionedCollider):
+    __slots__ = ()
     def __init__(self, position: tuple[number, number] = (0, 0)):
-        self.position = position
-        
-    def collides(self, other):
-        return False
-
-def line_collision(
-    a_g: number, b_g: number, e_g: number, f_g: number, # XY of first and second position of line a
-    a_f: number, b_f: number, e_f: number, f_f: number  # XY of first and second position of line b
-    ) -> bool:
-    c_g = e_g - a_g
-    d_g = f_g - b_g
-    c_f = e_f - a_f
-    d_f = f_f - b_f
-    try:
-        t_f = (a_f - a_g + (c_g / d_g) * (b_g - b_f)) / ((d_f * c_g) / d_g - c_f)
-        t_g = (b_f + t_f * d_f - b_g) / d_g
-    except ZeroDivisionError:
-        return False
-    if not (0 <= t_g <= 1):
-        return False
-    if not (0 <= t_f <= 1):
-        return False
-    return True
-
+        self.pos_x, self.pos_y = position
 
 class RotatedRectangleCollider(BoxCollider):
-    @dataclass
+    __slots__ = ("rotation", "_bounding_box_cache", "_rotation_cache")
+    @dataclass(slots=True)
     class BoundingBoxCache:
         pos_x: Optional[number] = field(default=None)
         pos_y: Optional[number] = field(default=None)
@@ -127,13 +132,23 @@ class RotatedRectangleCollider(BoxCollider):
         height: Optional[number] = field(default=None)
         rotation: Optional[number] = field(default=None)
         bounding_box: Optional[BoxCollider] = field(default=None)
+    @dataclass(slots=True)
+    class RotationCache:
+        width: Optional[number] = field(default=None)
+        height: Optional[number] = field(default=None)
+        rotation: Optional[number] = field(default=None)
+        sin: number = field(default=0.0)
+        cos: number = field(default=1.0)
+        relative_corners: tuple[tuple[number, number], tuple[number, number]] = field(default=((0, 0), (0, 0)))
     rotation: number
     _bounding_box_cache: BoundingBoxCache
+    _rotation_cache: RotationCache
     
     def __init__(self, width: number, height: number, position: tuple[number, number] = (0, 0), rotation: number = 0):
         super().__init__(width, height, position)
         self.rotation = rotation
         self._bounding_box_cache = self.BoundingBoxCache()
+        self._rotation_cache = self.RotationCache()
     
     @staticmethod
     def _rotate_position(pos_x: number, pos_y: number, rotation: number) -> tuple[number, number]:
@@ -142,11 +157,27 @@ class RotatedRectangleCollider(BoxCollider):
             pos_y * math.cos(rotation) - pos_x * math.sin(rotation)
         )
     
+    def _get_rotation_cache(self) -> RotationCache:
+        """
+        Sinus, Kosinus und Ecken werden nur neu berechnet, wenn sich Größe oder Drehung ändern.
+        Die Achsen des Rechtecks sind (cos, -sin) für die Breite und (sin, cos) für die Höhe.
+        """
+        cache = self._rotation_cache
+        if cache.rotation != self.rotation or cache.width != self.width or cache.height != self.height:
+            cache.sin = math.sin(self.rotation)
+            cache.cos = math.cos(self.rotation)
+            cache.relative_corners = (
+                ((self.height * cache.sin + self.width * cache.cos) / 2, (self.height * cache.cos - self.width * cache.sin) / 2),
+                ((self.height * cache.sin - self.width * cache.cos) / 2, (self.height * cache.cos + self.width * cache.sin) / 2)
+            )
+            cache.width = self.width
+            cache.height = self.height
+            cache.rotation = self.rotation
+        return cache
+    
     @property
     def _two_relative_corners(self) -> tuple[tuple[number, number], tuple[number, number]]:
-        dx_a, dy_a = self._rotate_position(self.width, self.height, self.rotation)
-        dx_b, dy_b = self._rotate_position(-self.width, self.height, self.rotation)
-        return ((dx_a / 2, dy_a / 2), (dx_b / 2, dy_b / 2))
+        return self._get_rotation_cache().relative_corners
     
     @property
     def bounding_box(self) -> BoxCollider:
@@ -165,7 +196,7 @@ class RotatedRectangleCollider(BoxCollider):
                 dy = dy_a * 2
             else:
                 dy = dy_b * 2
-            self._bounding_box_cache.bounding_box = BoxCollider(abs(dx), abs(dy), self.position)
+            self._bounding_box_cache.bounding_box = BoxCollider(abs(dx), abs(dy), (self.pos_x, self.pos_y))
             self._bounding_box_cache.pos_x = self.pos_x
             self._bounding_box_cache.pos_y = self.pos_y
             self._bounding_box_cache.width = self.width
@@ -174,48 +205,211 @@ class RotatedRectangleCollider(BoxCollider):
         if self._bounding_box_cache.pos_x != self.pos_x or self._bounding_box_cache.pos_y != self.pos_y:
             self._bounding_box_cache.pos_x = self.pos_x
             self._bounding_box_cache.pos_y = self.pos_y
-            self._bounding_box_cache.bounding_box.position = self.position
+            self._bounding_box_cache.bounding_box.pos_x = self.pos_x
+            self._bounding_box_cache.bounding_box.pos_y = self.pos_y
         return self._bounding_box_cache.bounding_box
     
-    def collides(self, other: Collider):
-        if isinstance(other, CircleCollider):
-            return self.collide_circle_collider(other)
-        elif isinstance(other, BoxCollider):
-            return self.collide_box_collider(other)
-        elif isinstance(other, RotatedRectangleCollider):
-            return self.collide_rotated_rectangle_collider(other)
-        return False
+    def get_bounds(self) -> Optional[Bounds]:
+        return self.bounding_box.get_bounds()
     
     def collide_circle_collider(self, other: CircleCollider) -> bool:
-        rotated_circle_position = self._rotate_position(other.pos_x - self.pos_x, other.pos_y - self.pos_y, -self.rotation)
-        new_circle = CircleCollider(other.radius, (rotated_circle_position[0] + self.pos_x, rotated_circle_position[1] + self.pos_y))
-        return new_circle.collide_box_collider(self)
+        cache = self._get_rotation_cache()
+        dx, dy = other.pos_x - self.pos_x, other.pos_y - self.pos_y
+        local_x = dx * cache.cos - dy * cache.sin # Position des Kreises im System des Rechtecks
+        local_y = dx * cache.sin + dy * cache.cos
+        reduced_dx, reduced_dy = max(abs(local_x) - self.width / 2, 0), max(abs(local_y) - self.height / 2, 0)
+        return reduced_dx ** 2 + reduced_dy ** 2 <= other.radius ** 2
     
     def collide_box_collider(self, other: BoxCollider) -> bool:
-        if not self.bounding_box.collides(other):
+        # Separating Axis Theorem: Die Rechtecke kollidieren, falls es keine der vier Kantenachsen gibt,
+        # auf der sich ihre Projektionen nicht überlappen.
+        cache = self._get_rotation_cache()
+        abs_sin, abs_cos = abs(cache.sin), abs(cache.cos)
+        dx, dy = other.pos_x - self.pos_x, other.pos_y - self.pos_y
+        half_width, half_height = self.width / 2, self.height / 2
+        other_half_width, other_half_height = other.width / 2, other.height / 2
+        if abs(dx) > abs_cos * half_width + abs_sin * half_height + other_half_width:
             return False
-        rotated_box_position = self._rotate_position(other.pos_x - self.pos_x, other.pos_y - self.pos_y, -self.rotation)
-        new_box = BoxCollider(0, 0, (rotated_box_position[0] + self.pos_x, rotated_box_position[1] + self.pos_y))
-        if new_box.collide_box_collider(self):
-            return True
-        ((dx_a, dy_a), (dx_b, dy_b)) = self._two_relative_corners
-        points_a = [
-            (self.pos_x + dx_a, self.pos_y + dy_a), (self.pos_x + dx_b, self.pos_y + dy_b),
-            (self.pos_x - dx_a, self.pos_y - dy_a), (self.pos_x - dx_b, self.pos_y - dy_b)
-        ]
-        lines_a = list(combinations(points_a, 2))
-        points_b = [
-            (other.pos_x + other.width / 2, other.pos_y + other.height / 2), (other.pos_x + other.width / 2, other.pos_y - other.height / 2),
-            (other.pos_x - other.width / 2, other.pos_y + other.height / 2), (other.pos_x - other.width / 2, other.pos_y - other.height / 2)
-        ]
-        lines_b = list(combinations(points_b, 2))
-        for (((a_g, b_g), (e_g, f_g)), ((a_f, b_f), (e_f, f_f))) in product(lines_a, lines_b):
-            if line_collision(a_g, b_g, e_g, f_g, a_f, b_f, e_f, f_f):
-                return True
-        return False
+        if abs(dy) > abs_sin * half_width + abs_cos * half_height + other_half_height:
+            return False
+        if abs(dx * cache.cos - dy * cache.sin) > half_width + abs_cos * other_half_width + abs_sin * other_half_height:
+            return False
+        if abs(dx * cache.sin + dy * cache.cos) > half_height + abs_sin * other_half_width + abs_cos * other_half_height:
+            return False
+        return True
     
     def collide_rotated_rectangle_collider(self, other: RotatedRectangleCollider) -> bool:
-        rotated_rect_position = self._rotate_position(other.pos_x - self.pos_x, other.pos_y - self.pos_y, -other.rotation)
-        new_box = BoxCollider(other.width, other.height, (rotated_rect_position[0] + self.pos_x, rotated_rect_position[1] + self.pos_y))
-        new_self = RotatedRectangleCollider(self.width, self.height, self.position, self.rotation - other.rotation)
-        return new_self.collide_box_collider(new_box)
+        cache = self._get_rotation_cache()
+        other_cache = other._get_rotation_cache()
+        dx, dy = other.pos_x - self.pos_x, other.pos_y - self.pos_y
+        for axis_x, axis_y in (
+            (cache.cos, -cache.sin), (cache.sin, cache.cos),
+            (other_cache.cos, -other_cache.sin), (other_cache.sin, other_cache.cos)
+        ):
+            self_extent = (
+                abs(axis_x * cache.cos - axis_y * cache.sin) * self.width / 2
+                + abs(axis_x * cache.sin + axis_y * cache.cos) * self.height / 2
+            )
+            other_extent = (
+                abs(axis_x * other_cache.cos - axis_y * other_cache.sin) * other.width / 2
+                + abs(axis_x * other_cache.sin + axis_y * other_cache.cos) * other.height / 2
+            )
+            if abs(dx * axis_x + dy * axis_y) > self_extent + other_extent:
+                return False
+        return True
+
+# Tabelle für collides(): (Typ von self, Typ von other) -> Funktion(self, other).
+# Für Unterklassen wird der nächste eingetragene Eintrag entlang der MROs gesucht und zwischengespeichert.
+# Paare ohne Eintrag kollidieren nie.
+
+_collision_functions: dict[tuple[type, type], CollisionFunction] = {}
+_resolved_collision_functions: dict[tuple[type, type], CollisionFunction] = {}
+
+def _no_collision(a: Collider, b: Collider) -> bool:
+    return False
+
+def _swapped(function: CollisionFunction) -> CollisionFunction:
+    def swapped_function(a: Collider, b: Collider) -> bool:
+        return function(b, a)
+    return swapped_function
+
+def register_collision(type_a: type[Collider], type_b: type[Collider], function: CollisionFunction, symmetric: bool = True) -> None:
+    """
+    Trägt function(a, b) für a vom Typ type_a und b vom Typ type_b ein, bei symmetric auch umgekehrt.
+    """
+    _collision_functions[type_a, type_b] = function
+    if symmetric and type_a is not type_b:
+        _collision_functions[type_b, type_a] = _swapped(function)
+    _resolved_collision_functions.clear()
+
+def _resolve_collision_function(type_a: type, type_b: type) -> CollisionFunction:
+    function = _no_collision
+    for base_a in type_a.__mro__:
+        for base_b in type_b.__mro__:
+            if (base_a, base_b) in _collision_functions:
+                function = _collision_functions[base_a, base_b]
+                break
+        else:
+            continue
+        break
+    _resolved_collision_functions[type_a, type_b] = function
+    return function
+
+register_collision(BoxCollider, BoxCollider, BoxCollider.collide_box_collider)
+register_collision(CircleCollider, CircleCollider, CircleCollider.collide_circle_collider)
+register_collision(CircleCollider, BoxCollider, CircleCollider.collide_box_collider)
+register_collision(RotatedRectangleCollider, RotatedRectangleCollider, RotatedRectangleCollider.collide_rotated_rectangle_collider)
+register_collision(RotatedRectangleCollider, BoxCollider, RotatedRectangleCollider.collide_box_collider)
+register_collision(RotatedRectangleCollider, CircleCollider, RotatedRectangleCollider.collide_circle_collider)
+# Wie bisher prüft nur der PolyPositionedCollider selbst gegen andere Collider, nicht umgekehrt.
+register_collision(PolyPositionedCollider, Collider, PolyPositionedCollider.collide_any, symmetric=False)
+
+
+# Gebündelte Kollisionsabfragen. Die Funktionen rechnen genauso wie die collide_*-Methoden,
+# aber für alle Paare aus a und b auf einmal, und geben eine Matrix der Form (len(a), len(b)) zurück.
+
+ArrayLike = Sequence[number] | np.ndarray | number
+
+def _column(values: ArrayLike) -> np.ndarray:
+    return np.atleast_1d(np.asarray(values, dtype=float))[:, None]
+
+def _row(values: ArrayLike) -> np.ndarray:
+    return np.atleast_1d(np.asarray(values, dtype=float))[None, :]
+
+def batch_collide_box_box(
+    a_pos_x: ArrayLike, a_pos_y: ArrayLike, a_width: ArrayLike, a_height: ArrayLike,
+    b_pos_x: ArrayLike, b_pos_y: ArrayLike, b_width: ArrayLike, b_height: ArrayLike
+    ) -> np.ndarray:
+    hits = np.abs(_column(a_pos_x) - _row(b_pos_x)) <= (_column(a_width) + _row(b_width)) / 2
+    hits &= np.abs(_column(a_pos_y) - _row(b_pos_y)) <= (_column(a_height) + _row(b_height)) / 2
+    return hits
+
+def batch_collide_circle_box(
+    a_pos_x: ArrayLike, a_pos_y: ArrayLike, a_radius: ArrayLike,
+    b_pos_x: ArrayLike, b_pos_y: ArrayLike, b_width: ArrayLike, b_height: ArrayLike
+    ) -> np.ndarray:
+    reduced_dx = np.maximum(np.abs(_row(b_pos_x) - _column(a_pos_x)) - _row(b_width) / 2, 0)
+    reduced_dy = np.maximum(np.abs(_row(b_pos_y) - _column(a_pos_y)) - _row(b_height) / 2, 0)
+    return reduced_dx ** 2 + reduced_dy ** 2 <= _column(a_radius) ** 2
+
+def batch_collide_circle_circle(
+    a_pos_x: ArrayLike, a_pos_y: ArrayLike, a_radius: ArrayLike,
+    b_pos_x: ArrayLike, b_pos_y: ArrayLike, b_radius: ArrayLike
+    ) -> np.ndarray:
+    return (_column(a_pos_x) - _row(b_pos_x)) ** 2 + (_column(a_pos_y) - _row(b_pos_y)) ** 2 <= (_column(a_radius) + _row(b_radius)) ** 2
+
+def batch_collide_box_rotated(
+    a_pos_x: ArrayLike, a_pos_y: ArrayLike, a_width: ArrayLike, a_height: ArrayLike,
+    b_pos_x: ArrayLike, b_pos_y: ArrayLike, b_width: ArrayLike, b_height: ArrayLike, b_rotation: ArrayLike
+    ) -> np.ndarray:
+    """
+    Wie RotatedRectangleCollider.collide_box_collider, mit den BoxCollidern in a und den gedrehten Rechtecken in b.
+    """
+    sin, cos = np.sin(_row(b_rotation)), np.cos(_row(b_rotation))
+    abs_sin, abs_cos = np.abs(sin), np.abs(cos)
+    dx, dy = _column(a_pos_x) - _row(b_pos_x), _column(a_pos_y) - _row(b_pos_y)
+    half_width, half_height = _row(b_width) / 2, _row(b_height) / 2
+    other_half_width, other_half_height = _column(a_width) / 2, _column(a_height) / 2
+    hits = np.abs(dx) <= abs_cos * half_width + abs_sin * half_height + other_half_width
+    hits &= np.abs(dy) <= abs_sin * half_width + abs_cos * half_height + other_half_height
+    hits &= np.abs(dx * cos - dy * sin) <= half_width + abs_cos * other_half_width + abs_sin * other_half_height
+    hits &= np.abs(dx * sin + dy * cos) <= half_height + abs_sin * other_half_width + abs_cos * other_half_height
+    return hits
+
+def batch_collide_circle_rotated(
+    a_pos_x: ArrayLike, a_pos_y: ArrayLike, a_radius: ArrayLike,
+    b_pos_x: ArrayLike, b_pos_y: ArrayLike, b_width: ArrayLike, b_height: ArrayLike, b_rotation: ArrayLike
+    ) -> np.ndarray:
+    sin, cos = np.sin(_row(b_rotation)), np.cos(_row(b_rotation))
+    dx, dy = _column(a_pos_x) - _row(b_pos_x), _column(a_pos_y) - _row(b_pos_y)
+    reduced_dx = np.maximum(np.abs(dx * cos - dy * sin) - _row(b_width) / 2, 0)
+    reduced_dy = np.maximum(np.abs(dx * sin + dy * cos) - _row(b_height) / 2, 0)
+    return reduced_dx ** 2 + reduced_dy ** 2 <= _column(a_radius) ** 2
+
+def _box_arrays(colliders: Sequence[BoxCollider]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    values = np.array([(c.pos_x, c.pos_y, c.width, c.height) for c in colliders], dtype=float).reshape(-1, 4)
+    return values[:, 0], values[:, 1], values[:, 2], values[:, 3]
+
+def _circle_arrays(colliders: Sequence[CircleCollider]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    values = np.array([(c.pos_x, c.pos_y, c.radius) for c in colliders], dtype=float).reshape(-1, 3)
+    return values[:, 0], values[:, 1], values[:, 2]
+
+def batch_collides(colliders_a: Sequence[Collider], colliders_b: Sequence[Collider]) -> np.ndarray:
+    """
+    Prüft alle Paare aus colliders_a und colliders_b. BoxCollider und CircleCollider werden mit NumPy geprüft,
+    alle anderen Collider einzeln mit collides().
+    """
+    hits = np.zeros((len(colliders_a), len(colliders_b)), dtype=bool)
+    groups_a = _group_colliders(colliders_a)
+    groups_b = _group_colliders(colliders_b)
+    for type_a, indices_a in groups_a.items():
+        for type_b, indices_b in groups_b.items():
+            block = np.ix_(indices_a, indices_b)
+            group_a = [colliders_a[i] for i in indices_a]
+            group_b = [colliders_b[i] for i in indices_b]
+            if type_a is BoxCollider and type_b is BoxCollider:
+                hits[block] = batch_collide_box_box(*_box_arrays(group_a), *_box_arrays(group_b))
+            elif type_a is CircleCollider and type_b is BoxCollider:
+                hits[block] = batch_collide_circle_box(*_circle_arrays(group_a), *_box_arrays(group_b))
+            elif type_a is BoxCollider and type_b is CircleCollider:
+                hits[block] = batch_collide_circle_box(*_circle_arrays(group_b), *_box_arrays(group_a)).T
+            elif type_a is CircleCollider and type_b is CircleCollider:
+                hits[block] = batch_collide_circle_circle(*_circle_arrays(group_a), *_circle_arrays(group_b))
+            else:
+                hits[block] = [[a.collides(b) for b in group_b] for a in group_a]
+    return hits
+
+def _group_colliders(colliders: Sequence[Collider]) -> dict[Optional[type], list[int]]:
+    groups: dict[Optional[type], list[int]] = {}
+    for idx, collider in enumerate(colliders):
+        collider_type = type(collider) if type(collider) in (BoxCollider, CircleCollider) else None
+        if collider_type not in groups:
+            groups[collider_type] = []
+        groups[collider_type].append(idx)
+    return groups
+
+def hit_pairs(hits: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Wandelt eine Treffermatrix in eine Liste von Indexpaaren (a, b) um.
+    """
+    return [(a, b) for a, b in np.argwhere(hits).tolist()]
@@ -1,4 +1,4 @@
-from enum import Flag, auto
+from enum import IntEnum
 from pathlib import Path
 import pygame
 from .user_input import KeyboardKey as key
@@ -48,6 +48,8 @@ PROJECTILE_HITBOX_WIDTH = PROJECTILE_WIDTH
 PROJECTILE_HITBOX_HEIGHT = PROJECTILE_HEIGHT
 PROJECTILE_SPEED = 240 / SECOND
 PROJECILE_MULTISHOT_ANGLE = degrees_to_radians(15)
+PROJECTILE_CULLING_MARGIN = 20
+PROJECTILE_START_CAPACITY = 256
 
 FIRE_PROJECTILE_WIDTH = 24
 FIRE_PROJECTILE_HEIGHT = 36
@@ -96,10 +98,14 @@ HEALTH_BAR_SLICE_WIDTH = 2
 
 ARC_COOLDOWN_RADIUS = 16
 ARC_COOLDOWN_COLOR = (200, 200, 200)
+ARC_COOLDOWN_STEPS = 120 # Der Bogen wird auf so viele Stufen gerundet und nur neu gerendert, wenn sich die Stufe ändert.
+HUD_WIDGET_CACHE_SIZE = 512 # Gerenderte Lebensbalken und Bögen im Cache
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 400
 
+SPATIAL_HASH_CELL_SIZE = max(STONE_BASE_RADIUS * 2, ENEMY_WIDTH)
+
 POS_SCORE = (SCREEN_WIDTH / 2, 12)
 TEXT_SIZE_SCORE = 32
 TEXT_COLOR_SCORE = (200, 200, 200)
@@ -113,6 +119,22 @@ STONE_SPAWNING_PROPABILITY_INCREASE = 0.000001
 STONE_SPAWNING_PROPABILITY_INCREASE_DECREASE = 5
 STONE_TURNING_SPEED_MIN = -6 / SECOND # Degrees
 STONE_TURNING_SPEED_MAX = 6 / SECOND
+STONE_ROTATION_STEPS = 128 # Stufen pro Umdrehung im Cache der gedrehten Steinbilder
+STONE_ROTATION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+SPRITE_ATLAS_SHEET_SIZE = (512, 512)
+SPRITE_ATLAS_PADDING = 1
+# Im Browser gibt es keine Kommandozeile für --dirty-rects. Mit dem DirtyRectRenderer wird dort das Übergeben des Bildes
+# billiger, dafür scrollt der Hintergrund nicht mehr (siehe background.Background). Standardmässig scrollt er.
+BROWSER_DIRTY_RECTS = False
+DIRTY_RECT_MAX_RECTS = 48 # Bleiben mehr Bereiche übrig, wird der ganze Bildschirm übergeben.
+DIRTY_RECT_MERGE_LIMIT = 256 # Ab so vielen gemeldeten Bereichen wird gar nicht erst zusammengefasst.
+RENDER_SCALES = (1.0, 0.75, 0.5) # Auflösungen der Spielwelt bei dynamischer Auflösung, die erste ist die normale
+RENDER_SCALE_WINDOW = SECOND // 2 # Über so viele Frames wird die Frame-Zeit gemittelt
+RENDER_SCALE_DOWN_THRESHOLD = 0.9 # Anteil am Budget, ab dem die Auflösung verringert wird
+RENDER_SCALE_UP_THRESHOLD = 0.5 # Anteil am Budget, unter dem die Auflösung wieder erhöht wird
+RENDER_SCALE_CACHE_SIZE = 1024 # Verkleinerte Bilder im Cache
+TEXT_CACHE_SIZE = 256 # Gerenderte Texte im Cache
+TEXT_GLYPHS = "0123456789 :.-_ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz" # Zeichen, aus denen Texte zusammengesetzt werden können
 
 START_POWERUP_SPAWNING_PROBABILITY = 0.001 / FRAME
 POWERUP_SPAWNING_PROPABILITY_INCREASE = 0.0000000
@@ -128,15 +150,50 @@ LIFE_ICON_DISTANCE = 8
 
 GAME_OVER_LINE_HEIGHT = 24
 
+PROFILER_SAMPLE_COUNT = 10 * SECOND # So viele Frames werden für die Statistik behalten.
+PROFILER_REFRESH_INTERVAL = SECOND // 4 # So oft wird das Overlay neu berechnet.
+PROFILER_TEXT_SIZE = 16
+PROFILER_LINE_HEIGHT = 13
+PROFILER_WIDTH = 240
+PROFILER_BAR_WIDTH = 100
+PROFILER_HISTOGRAM_HEIGHT = 32
+PROFILER_HISTOGRAM_BUCKETS = 40
+PROFILER_BACKGROUND_COLOR = (0, 0, 0, 180)
+PROFILER_TEXT_COLOR = (230, 230, 230)
+PROFILER_BUDGET_COLOR = (255, 80, 80)
+PROFILER_PHASE_COLORS = {
+    "events": (120, 120, 255),
+    "spawn": (120, 255, 255),
+    "update": (120, 255, 120),
+    "draw": (255, 200, 80),
+    "top_layer": (255, 140, 60),
+    "hud": (255, 120, 255),
+    "display": (200, 200, 200),
+}
+
+STORAGE_URL = "https://tlds1.warp.thecommcraft.de/storage/file/"
+STORAGE_TIMEOUT = 10 # Sekunden pro HTTP-Anfrage
+STORAGE_POOL_SIZE = 4 # So viele Verbindungen bleiben offen (Keep-Alive) und so viele Anfragen laufen gleichzeitig.
+STORAGE_CHANNEL_CAPACITY = 64 # So viele Befehle dürfen auf den Speicher-Thread warten.
+STORAGE_LATENCY_SAMPLES = 256 # Für die Statistik behaltene Antwortzeiten
+STORAGE_FLUSH_WINDOW = 0.5 # Sekunden, in denen weitere Schreibvorgänge auf denselben Schlüssel zu einem zusammengefasst werden
+STORAGE_BATCH_URL = None # Endpunkt für mehrere Schlüssel in einer Anfrage, falls der Server einen anbietet
+STORAGE_DEFAULT_TTL = 5 * 60 # Sekunden, so lange gilt ein Eintrag im lokalen Cache ohne Nachfrage beim Server als aktuell
+STORAGE_TTLS = {"highscores": 30} # Abweichende Gültigkeit für einzelne Schlüssel
+STORAGE_COMPLETIONS_PER_FRAME = 32 # So viele Ergebnisse des Speicher-Threads werden höchstens pro Frame an das Spiel übergeben.
+
 # Paths
 
 GAME_PATH = Path(__file__).parent
 IMAGES_PATH = GAME_PATH / "images"
 SOUNDS_PATH = GAME_PATH / "sounds"
 FONTS_PATH = GAME_PATH / "fonts"
+STORAGE_CACHE_PATH = GAME_PATH / "storage" # Lokaler Cache der Speicherdaten, wie bei old_save_data
+STORAGE_JOURNAL_PATH = STORAGE_CACHE_PATH / "journal.jsonl" # Schreibvorgänge, die der Server noch nicht bestätigt hat
 
 HEART_IMAGE_PATH = IMAGES_PATH / "heart.png"
 BACKGROUND_IMAGE_PATH = IMAGES_PATH / "pixel_background_1.jpeg"
+STARS_IMAGE_PATH = IMAGES_PATH / "stars.png"
 SPACESHIP_IMAGE_PATH = IMAGES_PATH / "ship_2.png"
 ENEMY_IMAGE_PATH = IMAGES_PATH / "ship_3.png"
 PIERCING_ENEMY_IMAGE_PATH = IMAGES_PATH / "ship_1.png"
@@ -150,6 +207,14 @@ POWERUP_INVINCIBILITY_IMAGE_PATH = IMAGES_PATH / "invincibility_star.png"
 POWERUP_STRIKE_IMAGE_PATH = IMAGES_PATH / "penetration_star.png"
 STONE_IMAGE_PATH = IMAGES_PATH / "stone.png"
 
+# background_stars.png ist deckend und nicht nahtlos kachelbar: Als hinterster Layer würde es das Hintergrundbild des Spiels
+# ersetzen, weiter vorne alles dahinter verdecken. Die Sterne kommen deshalb aus dem durchsichtigen stars.png.
+BACKGROUND_LAYERS = ( # (Bild, Grösse einer Kachel oder None für den ganzen Bildschirm, Pixel pro Frame nach unten), von hinten nach vorne
+    (BACKGROUND_IMAGE_PATH, None, 0.0),
+    (STARS_IMAGE_PATH, (200, 200), 0.15),
+    (STARS_IMAGE_PATH, (300, 300), 0.4),
+)
+
 SHOOT_SOUND_PATH = SOUNDS_PATH / "shoot.ogg"
 HIT_SOUND_PATH = SOUNDS_PATH / "hit.ogg"
 EXPLOSION_SOUND_PATH = SOUNDS_PATH / "explosion.ogg"
@@ -159,6 +224,12 @@ FONT_NAME = FONTS_PATH / "8bitoperator_jve.ttf"
 
 # Unique message values
 
-class DrawDetails(Flag):
-    NONE = 0
-    TOP_LAYER = auto()
+class RenderLayer(IntEnum):
+    """
+    Die Layer werden in dieser Reihenfolge gemalt, innerhalb eines Layers in der Reihenfolge, in der die Objekte hinzugefügt wurden.
+    """
+    BACKGROUND = 0
+    ENTITIES = 1
+    PROJECTILES = 2
+    HUD = 3
+    OVERLAY = 4
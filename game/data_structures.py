@@ -1,45 +1,98 @@
 from __future__ import annotations
 from collections.abc import Iterable, Iterator
-from typing import Generic, TypeVar
+from typing import Generic, TypeVar, Optional
+import math
 from . import objects as module_objects
+from . import collider as module_collider
+from . import consts
 
 T = TypeVar("T")
-class ReferenceToObject(Generic[T]):
-    obj: T
-    def __init__(self, obj: T):
-        self.obj = obj
-    
-    def __eq__(self, other) -> bool:
-        if type(self) != type(other):
-            return False
-        return id(self.obj) == id(other.obj)
-    
-    def __hash__(self) -> int:
-        return hash(id(self.obj))
-
 O = TypeVar("O", bound="module_objects.Object2D")
 V = TypeVar("V")
 class ObjectContainerBase(Generic[O]):
-    objects: set[ReferenceToObject[O]]
+    """
+    Speichert Objekte nach ihrer Identität in Einfügereihenfolge.
+    add_object, remove_object und remove_all werden gepuffert und erst bei sync() übernommen.
+    Dadurch kann ohne Kopie über den Container iteriert werden, während sich die Objekte verändern.
+    """
+    objects: dict[int, O]
+    objects_by_type: dict[type, dict[int, O]] # Für jede Klasse in der MRO eines Objekts
+    objects_by_layer: dict[consts.RenderLayer, dict[int, O]] # Der Layer wird beim Hinzufügen einmal gelesen.
+    pending: list[tuple[bool, Optional[O]]] # (hinzufügen, Objekt); (False, None) entfernt alle Objekte
     def __init__(self, start_value: Iterable[O] = ()):
-        self.objects = {ReferenceToObject(obj) for obj in start_value}
+        self.objects = {}
+        self.objects_by_type = {}
+        self.objects_by_layer = {layer: {} for layer in consts.RenderLayer}
+        self.pending = []
+        for obj in start_value:
+            self._add(obj)
+    
+    def _add(self, value: O) -> None:
+        key = id(value)
+        if key in self.objects:
+            return
+        self.objects[key] = value
+        for cls in type(value).__mro__:
+            if cls not in self.objects_by_type:
+                self.objects_by_type[cls] = {}
+            self.objects_by_type[cls][key] = value
+        self.objects_by_layer[value.render_layer][key] = value
+    
+    def _remove(self, value: O) -> None:
+        key = id(value)
+        if key not in self.objects:
+            return
+        del self.objects[key]
+        for cls in type(value).__mro__:
+            del self.objects_by_type[cls][key]
+        del self.objects_by_layer[value.render_layer][key]
     
     def add_object(self, value: O) -> None:
-        self.objects.add(ReferenceToObject(value))
+        self.pending.append((True, value))
 
     def remove_object(self, value: O) -> None:
-        if value not in self:
-            return
-        self.objects.remove(ReferenceToObject(value))
+        self.pending.append((False, value))
     
     def remove_all(self) -> None:
-        self.objects.clear()
+        self.pending.append((False, None))
+    
+    def sync(self) -> None:
+        """
+        Übernimmt alle gepufferten Änderungen in der Reihenfolge, in der sie gemacht wurden.
+        Darf nicht aufgerufen werden, während über den Container iteriert wird.
+        """
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = []
+        for add, value in pending:
+            if value is None:
+                self.objects.clear()
+                self.objects_by_type.clear()
+                for layer_objects in self.objects_by_layer.values():
+                    layer_objects.clear()
+            elif add:
+                self._add(value)
+            else:
+                self._remove(value)
+    
+    def of_type(self, cls: type[T]) -> Iterator[T]:
+        """
+        Iteriert nur über die Objekte, die Instanzen von cls sind.
+        """
+        return iter(self.objects_by_type.get(cls, {}).values())
+    
+    def of_layer(self, layer: consts.RenderLayer) -> Iterator[O]:
+        return iter(self.objects_by_layer[layer].values())
+    
+    def count_of_type(self, cls: type) -> int:
+        return len(self.objects_by_type.get(cls, ()))
     
     def __iter__(self) -> Iterator[O]:
-        return iter(obj.obj for obj in self.objects.copy())
+        return iter(self.objects.values())
     
     def __contains__(self, value: object) -> bool:
-        return ReferenceToObject(value) in self.objects
+        return id(value) in self.objects
     
     def __len__(self) -> int:
         return len(self.objects)
@@ -48,34 +101,36 @@ class ObjectContainer(ObjectContainerBase["module_objects.Object2D"]):
     pass
 
 class ObjectDictBase(Generic[O, V]):
-    objects: dict[ReferenceToObject[O], V]
+    """
+    Ordnet Objekten nach ihrer Identität Werte zu. Während über das Dictionary iteriert wird, darf es nicht verändert werden.
+    """
+    objects: dict[int, tuple[O, V]]
     def __init__(self, start_value: Iterable[tuple[O, V]] | None = None):
-        self.objects = {ReferenceToObject(obj): val for obj, val in start_value} if start_value else {}
+        self.objects = {id(obj): (obj, val) for obj, val in start_value} if start_value else {}
 
     def __getitem__(self, obj: O) -> V:
-        return self.objects[ReferenceToObject(obj)]
+        return self.objects[id(obj)][1]
 
     def __setitem__(self, obj: O, value: V) -> None:
-        self.objects[ReferenceToObject(obj)] = value
+        self.objects[id(obj)] = (obj, value)
 
     def pop(self, obj: O) -> V:
-        return self.objects.pop(ReferenceToObject(obj))
+        return self.objects.pop(id(obj))[1]
 
     def popitem(self) -> tuple[O, V]:
-        obj, value = self.objects.popitem()
-        return (obj.obj, value)
+        return self.objects.popitem()[1]
 
     def clear(self) -> None:
         self.objects.clear()
     
     def __iter__(self) -> Iterator[O]:
-        return iter(obj.obj for obj in self.objects.copy())
+        return iter(obj for obj, _ in self.objects.values())
     
     def items(self) -> Iterator[tuple[O, V]]:
-        return iter((obj.obj, val) for obj, val in self.objects.copy().items())
+        return iter(self.objects.values())
     
     def __contains__(self, obj: object) -> bool:
-        return ReferenceToObject(obj) in self.objects
+        return id(obj) in self.objects
     
     def __len__(self) -> int:
         return len(self.objects)
@@ -84,4 +139,112 @@ class ObjectDictBase(Generic[O, V]):
         self.pop(obj)
 
 class ObjectDict(Generic[V], ObjectDictBase["module_objects.Object2D", V]):
-    pass
\ No newline at end of file
+    pass
+
+CellRange = tuple[int, int, int, int]
+class SpatialHashBase(Generic[O]):
+    """
+    Gleichmäßiges Gitter über dem Spielfeld, das als Broadphase für Kollisionsabfragen dient.
+    Die Spalten wiederholen sich horizontal, da Objekte am Bildschirmrand auf die andere Seite wechseln.
+    """
+    cell_size: module_collider.number
+    columns: int
+    cells: dict[tuple[int, int], dict[int, O]]
+    object_ranges: dict[int, CellRange]
+    def __init__(self, cell_size: module_collider.number, width: module_collider.number):
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(width / cell_size))
+        self.cells = {}
+        self.object_ranges = {}
+    
+    def _get_cell_range(self, collider: Optional[module_collider.Collider]) -> Optional[CellRange]:
+        if collider is None:
+            return None
+        bounds = collider.get_bounds()
+        if bounds is None:
+            return None
+        min_x, min_y, max_x, max_y = bounds
+        return (
+            math.floor(min_x / self.cell_size), math.floor(min_y / self.cell_size),
+            math.floor(max_x / self.cell_size), math.floor(max_y / self.cell_size)
+        )
+    
+    def _iter_cells(self, cell_range: CellRange) -> Iterator[tuple[int, int]]:
+        cell_x_0, cell_y_0, cell_x_1, cell_y_1 = cell_range
+        if cell_x_1 - cell_x_0 + 1 >= self.columns:
+            cell_x_0, cell_x_1 = 0, self.columns - 1
+        for cell_x in range(cell_x_0, cell_x_1 + 1):
+            for cell_y in range(cell_y_0, cell_y_1 + 1):
+                yield (cell_x % self.columns, cell_y)
+    
+    def _insert(self, obj: O, cell_range: CellRange) -> None:
+        self.object_ranges[id(obj)] = cell_range
+        for cell in self._iter_cells(cell_range):
+            if cell not in self.cells:
+                self.cells[cell] = {}
+            self.cells[cell][id(obj)] = obj
+    
+    def _remove(self, obj: O, cell_range: CellRange) -> None:
+        del self.object_ranges[id(obj)]
+        for cell in self._iter_cells(cell_range):
+            cell_objects = self.cells[cell]
+            del cell_objects[id(obj)]
+            if not cell_objects:
+                del self.cells[cell]
+    
+    def add_object(self, obj: O) -> None:
+        if id(obj) in self.object_ranges:
+            self.update_object(obj)
+            return
+        cell_range = self._get_cell_range(getattr(obj, "collider", None))
+        if cell_range is not None:
+            self._insert(obj, cell_range)
+    
+    def update_object(self, obj: O) -> None:
+        """
+        Aktualisiert die Zellen eines Objekts, nachdem es sich bewegt hat. Nicht enthaltene Objekte werden ignoriert.
+        """
+        old_range = self.object_ranges.get(id(obj))
+        if old_range is None:
+            return
+        new_range = self._get_cell_range(getattr(obj, "collider", None))
+        if new_range == old_range:
+            return
+        self._remove(obj, old_range)
+        if new_range is not None:
+            self._insert(obj, new_range)
+    
+    def remove_object(self, obj: O) -> None:
+        cell_range = self.object_ranges.get(id(obj))
+        if cell_range is not None:
+            self._remove(obj, cell_range)
+    
+    def remove_all(self) -> None:
+        self.cells.clear()
+        self.object_ranges.clear()
+    
+    def query(self, collider: module_collider.Collider, types: tuple[type, ...] = ()) -> list[O]:
+        """
+        Gibt alle Objekte zurück, die sich eine Zelle mit dem Collider teilen. Die eigentliche Kollision muss noch geprüft werden.
+        Falls types angegeben ist, werden nur Instanzen dieser Klassen zurückgegeben.
+        """
+        cell_range = self._get_cell_range(collider)
+        if cell_range is None:
+            return []
+        found: dict[int, O] = {}
+        for cell in self._iter_cells(cell_range):
+            cell_objects = self.cells.get(cell)
+            if cell_objects:
+                found.update(cell_objects)
+        if types:
+            return [obj for obj in found.values() if isinstance(obj, types)]
+        return list(found.values())
+    
+    def __contains__(self, obj: object) -> bool:
+        return id(obj) in self.object_ranges
+    
+    def __len__(self) -> int:
+        return len(self.object_ranges)
+
+class SpatialHash(SpatialHashBase["module_objects.Object2D"]):
+    pass
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from functools import lru_cache
+from itertools import accumulate
+from pathlib import Path
+from typing import Optional
+import pygame
+from . import consts
+from .images import Image, SurfaceCache
+
+Color = tuple[int, int, int]
+TextKey = tuple[str | Path, int, Color, str] # Schrift, Grösse, Farbe, Text
+
+@lru_cache(256)
+def load_font(name: str | Path, size: int) -> pygame.font.FontType:
+    return pygame.font.Font(name, size)
+
+class GlyphAtlas:
+    """
+    Einzeln gerenderte Zeichen einer Schrift in einer Grösse und Farbe. Texte aus diesen Zeichen werden zusammengesetzt
+    statt neu gerastert. Das funktioniert nur bei Schriften ohne Kerning und ohne überlappende Zeichen (wie der 8-Bit-Schrift),
+    deshalb wird beim Erstellen geprüft, ob das Ergebnis genau gleich aussieht wie font.render. Sonst ist usable False.
+    Zeichen, die unter die Unterlänge der Schrift reichen (g, j, _ ...), werden höher gerendert; die zusätzlichen Zeilen liegen
+    unten, die Grundlinie bleibt. Ein Text ist deshalb so hoch wie sein höchstes Zeichen, alle Zeichen stehen bei y = 0.
+    """
+    font: pygame.font.FontType
+    color: Color
+    usable: bool
+    glyphs: dict[str, Image]
+    widths: dict[str, int]
+    heights: dict[str, int]
+
+    def __init__(self, font: pygame.font.FontType, color: Color):
+        self.font = font
+        self.color = color
+        self.glyphs = {}
+        self.widths = {}
+        self.heights = {}
+        for char in consts.TEXT_GLYPHS:
+            glyph = font.render(char, True, color)
+            self.glyphs[char] = glyph
+            self.widths[char], self.heights[char] = glyph.get_size()
+        # Einmal mit allen Zeichen und einmal nur mit den niedrigen, damit auch die Höhe ohne Unterlängen stimmt
+        low = "".join(char for char in consts.TEXT_GLYPHS if self.heights[char] == min(self.heights.values()))
+        self.usable = self._matches_font(consts.TEXT_GLYPHS) and self._matches_font(low)
+
+    def _matches_font(self, text: str) -> bool:
+        expected = self.font.render(text, True, self.color)
+        composed = self.compose(text)
+        if expected.get_size() != composed.get_size():
+            return False
+        return pygame.image.tobytes(expected, "RGBA") == pygame.image.tobytes(composed, "RGBA")
+
+    def can_compose(self, text: str) -> bool:
+        return self.usable and bool(text) and all(char in self.glyphs for char in text)
+
+    def compose(self, text: str) -> Image:
+        positions = [0, *accumulate(self.widths[char] for char in text)]
+        surface = pygame.Surface((positions[-1], max(self.heights[char] for char in text)), pygame.SRCALPHA)
+        # font.render füllt den Hintergrund mit der durchsichtigen Textfarbe, darauf kopiert BLEND_RGBA_MAX die Pixel genau.
+        surface.fill((*self.color, 0))
+        surface.blits([(self.glyphs[char], (x, 0), None, pygame.BLEND_RGBA_MAX) for char, x in zip(text, positions)], False)
+        return surface
+
+class TextCache:
+    """
+    Gerenderte Texte nach (Schrift, Grösse, Farbe, Text), in einem SurfaceCache mit höchstens max_entries Einträgen.
+    """
+    surfaces: SurfaceCache # Schlüssel sind TextKey
+    composed: int # Wie viele Texte aus Zeichen zusammengesetzt statt gerastert wurden
+    _glyph_atlases: dict[tuple[str | Path, int, Color], GlyphAtlas]
+
+    def __init__(self, max_entries: int = consts.TEXT_CACHE_SIZE):
+        self.surfaces = SurfaceCache(max_entries, "texts")
+        self.composed = 0
+        self._glyph_atlases = {}
+
+    def get_glyph_atlas(self, name: str | Path, size: int, color: Color) -> GlyphAtlas:
+        atlas = self._glyph_atlases.get((name, size, color))
+        if atlas is None:
+            atlas = self._glyph_atlases[(name, size, color)] = GlyphAtlas(load_font(name, size), color)
+        return atlas
+
+    def render(self, name: str | Path, size: int, text: str, color: Color, use_glyphs: bool = False) -> Image:
+        key: TextKey = (name, size, color, text)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            return surface
+        atlas: Optional[GlyphAtlas] = self.get_glyph_atlas(name, size, color) if use_glyphs else None
+        if atlas is not None and atlas.can_compose(text):
+            surface = atlas.compose(text)
+            self.composed += 1
+        else:
+            surface = load_font(name, size).render(text, True, color)
+        return self.surfaces.put(key, surface)
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+    def describe(self) -> str:
+        return f"{self.surfaces.describe()} composed {self.composed}"
+
+text_cache = TextCache()
+
+def render_text(name: str | Path, size: int, text: str, color: Color, use_glyphs: bool = False) -> Image:
+    return text_cache.render(name, size, text, color, use_glyphs)
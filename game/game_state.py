@@ -2,9 +2,9 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from collections.abc import Collection
 from typing import TypeVar
-import random
-import time
 import math
+import hashlib
+import time
 import sys
 import asyncio
 import pygame
@@ -12,7 +12,14 @@ from . import consts
 from . import objects
 from . import user_input as module_user_input
 from . import data_structures
-from .storage import save_data, read_data, run_async_in_thread, execute_http_tasks, exit_executor
+from . import collider as module_collider
+from . import projectiles as module_projectiles
+from . import clock as module_clock
+from . import rng as module_rng
+from . import profiler as module_profiler
+from . import renderer as module_renderer
+from . import background as module_background
+from .storage import StorageFuture, save_data_async, read_data, read_data_async, deliver_completions, run_async_in_thread, execute_http_tasks, exit_executor
 from . import sound as module_sound
 from . import images as modules_images
 
@@ -43,8 +50,18 @@ class AndromedaClashGameState(GameStateType):
     Die Hauptschleife sollte sich auch hier befinden.
     """
     current_objects: data_structures.ObjectContainer
-    clock: pygame.time.Clock # Wird für Bildrate verwendet.
+    spatial_hash: data_structures.SpatialHash # Broadphase für Kollisionsabfragen
+    projectiles: module_projectiles.ProjectileSystem # Projektile sind nicht in current_objects
+    clock: module_clock.GameClockType # Wird für Bildrate verwendet.
     fps: int # Bildrate
+    render: bool # Ohne Rendern wird nur simuliert, nichts gemalt und das Display nicht aktualisiert.
+    profiler: module_profiler.FrameProfiler # F3 zeigt die Zeiten der Phasen eines Frames an.
+    renderer: module_renderer.RendererType # Löscht den Bildschirm und übergibt ihn an das Display.
+    render_queue: module_renderer.RenderQueue # Malt die Objekte eines Layers zusammen.
+    world_queue: module_renderer.RenderQueue # Wie render_queue, aber für die Spielwelt, die in einer kleineren Auflösung gemalt werden kann.
+    resolution: module_renderer.DynamicResolution # Wählt die Auflösung der Spielwelt, das HUD bleibt immer in voller Auflösung.
+    hud: module_renderer.RetainedLayer # Der HUD-Layer wird nur nach invalidate_hud neu gemalt.
+    rng: module_rng.RandomStreams # Alle Zufallszahlen der Simulation kommen von hier.
     player: objects.SpaceShip
     user_input: module_user_input.UserInputType
     stonemin_y_vel: float
@@ -56,7 +73,7 @@ class AndromedaClashGameState(GameStateType):
     score: int
     score_object: objects.Score
     lives_object: objects.LifeDisplay
-    background_image: modules_images.Image
+    background: module_background.Background
     active_powerups: data_structures.ObjectContainerBase["objects.PowerUp"]
     currently_game_over: bool
     current_wave: list[objects.CommonEnemy]
@@ -65,6 +82,10 @@ class AndromedaClashGameState(GameStateType):
     credits: int
     username_input: objects.Text
     username: str
+    highscores: list[tuple[str, int]] # Die zuletzt bekannte Bestenliste
+    highscores_request: StorageFuture[str] | None # Die laufende Anfrage nach der Bestenliste
+    position_text: objects.GameOverText
+    leaderboard_texts: list[objects.GameOverText]
     current_tick: int
     
     @property
@@ -74,19 +95,41 @@ class AndromedaClashGameState(GameStateType):
     @lives.setter
     def lives(self, value):
         self.lives_object.lives = value
+        self.invalidate_hud()
     
-    def __init__(self, canvas: objects.Canvas, user_input: module_user_input.UserInputType) -> None:
+    def __init__(
+        self,
+        canvas: objects.Canvas,
+        user_input: module_user_input.UserInputType,
+        clock: module_clock.GameClockType | None = None,
+        render: bool = True,
+        seed: int | None = None,
+        dirty_rects: bool = False,
+        adaptive_resolution: bool = False
+        ) -> None:
         pygame.mixer.music.load(consts.SOUNDS_PATH / "ruder_buster.ogg")
         pygame.mixer.music.play(-1)
         self.canvas = canvas
         self.current_objects = data_structures.ObjectContainer()
-        self.clock = pygame.time.Clock()
+        self.spatial_hash = data_structures.SpatialHash(consts.SPATIAL_HASH_CELL_SIZE, consts.SCREEN_WIDTH)
+        self.projectiles = module_projectiles.ProjectileSystem()
+        self.clock = clock or pygame.time.Clock()
         self.fps = consts.SECOND
+        self.render = render
+        self.rng = module_rng.RandomStreams(seed)
+        self.profiler = module_profiler.FrameProfiler()
+        self.renderer = module_renderer.DirtyRectRenderer(GAME_SIZE) if dirty_rects else module_renderer.FullFrameRenderer()
+        self.render_queue = module_renderer.RenderQueue(canvas, self.renderer.tracks_rects)
+        self.world_queue = module_renderer.RenderQueue(canvas, self.renderer.tracks_rects)
+        self.resolution = module_renderer.DynamicResolution(GAME_SIZE, self.fps, adaptive_resolution)
+        self.hud = module_renderer.RetainedLayer(GAME_SIZE)
         self.user_input = user_input
-        self.background_image = pygame.transform.scale(modules_images.load_image(consts.BACKGROUND_IMAGE_PATH), GAME_SIZE)
+        self.background = module_background.Background(GAME_SIZE, scales=self.resolution.scales, scrolling=not dirty_rects)
         
         self.credits = 0
         self.current_tick = 0
+        self.highscores = self.parse_highscores(read_data("highscores"))
+        self.highscores_request = None
         
         self.start_game()
     
@@ -124,17 +167,56 @@ class AndromedaClashGameState(GameStateType):
         self.username_input = objects.Text((0, 0), "", 1, (0, 0, 0))
                         
     def add_object(self, obj: objects.Object2D):
+        if isinstance(obj, objects.Projectile):
+            obj.game_state = self # Projektile werden nicht in der Hauptschleife aktualisiert, die den Spielzustand sonst setzt.
+            self.projectiles.add_projectile(obj)
+            return
         self.current_objects.add_object(obj)
+        self.spatial_hash.add_object(obj)
+        if obj.render_layer == consts.RenderLayer.HUD:
+            self.invalidate_hud()
     
     def add_player(self):
         self.player = objects.SpaceShip((consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT - consts.SPACESHIP_HEIGHT + 8), (0, 0))
         self.add_object(self.player)
     
     def remove_object(self, obj: objects.Object2D):
+        if isinstance(obj, objects.Projectile):
+            self.projectiles.remove_projectile(obj)
+            return
         self.current_objects.remove_object(obj)
+        self.spatial_hash.remove_object(obj)
+        if obj.render_layer == consts.RenderLayer.HUD:
+            self.invalidate_hud()
     
     def remove_all_objects(self):
         self.current_objects.remove_all()
+        self.spatial_hash.remove_all()
+        self.projectiles.remove_all()
+        self.invalidate_hud()
+    
+    def get_time(self) -> float:
+        """
+        Spielzeit in Sekunden. Sie wird aus den Ticks berechnet, damit sie auch ohne Echtzeit (z.B. ohne Fenster) stimmt.
+        """
+        return self.current_tick / consts.SECOND
+    
+    def get_checksum(self) -> str:
+        """
+        Kurze Prüfsumme über den simulierten Zustand. Aufnahme und Wiedergabe vergleichen sie, um Abweichungen zu finden.
+        Positionen werden gerundet, damit andere Rundungsfehler (z.B. durch NumPy) nicht als Abweichung zählen.
+        """
+        values: list[object] = [self.current_tick, self.score, self.lives, self.currently_game_over, len(self.projectiles)]
+        for object2d in self.current_objects:
+            pos = getattr(object2d, "pos", None)
+            values.append((type(object2d).__name__, None if pos is None else (round(pos[0], 2), round(pos[1], 2))))
+        return hashlib.sha1(repr(values).encode()).hexdigest()[:16]
+    
+    def get_nearby_objects(self, collider: module_collider.Collider, *types: type) -> list[objects.Object2D]:
+        """
+        Gibt nur die Objekte (der angegebenen Typen) zurück, die mit dem Collider kollidieren könnten.
+        """
+        return self.spatial_hash.query(collider, types)
     
     def activate_powerup(self, power_up: objects.PowerUp):
         '''
@@ -154,102 +236,184 @@ class AndromedaClashGameState(GameStateType):
                 self.active_powerups.remove_object(other_power_up)
                 continue
             if other_power_up > power_up:
+                self.active_powerups.sync()
                 return
             if power_up > other_power_up:
                 other_power_up.deactivate_power()
                 other_power_up.activated = False
                 self.active_powerups.remove_object(other_power_up)
         power_up.activate_power()
-        power_up.end_time = time.time() + power_up.effect_time
+        power_up.end_time = self.get_time() + power_up.effect_time
         power_up.activated = True
         power_up.arc_cooldown = objects.ArcCooldown(power_up.pos, power_up.end_time, power_up.effect_time, power_up)
         self.active_powerups.add_object(power_up)
+        self.active_powerups.sync()
         
     def loop(self) -> None:
         if sys.platform == "emscripten":
             execution_task = asyncio.create_task(execute_http_tasks()) # For browser support
         else:
             execution_task = run_async_in_thread(execute_http_tasks())
-        self.get_highscores() # Makes the execution_task fetch the highscores immediately
+        self.refresh_highscores() # Makes the execution_task fetch the highscores immediately
         running = True
         while running:
-            self.current_tick += 1
-            self.canvas.fill((0, 0, 0))
-            self.canvas.blit(self.background_image, (0, 0)) # Hintergrund wird mit Bild gefüllt
-            self.user_input.process_tick()
-            for event in pygame.event.get():
-                self.user_input.process_event(event)
-                if event.type == pygame.QUIT: # Falls Schliessen-Knopf gedruckt wird, wird das Programm beendet. 
-                    self.register_score()
-                    running = False
-                    exit_executor()
-            self.spawn_stone()
-            self.spawn_powerup()
-            self.spawn_enemy()
-            for object2d in self.current_objects:
-                if not hasattr(object2d, "game_state"):
-                    object2d.game_state = self
-                object2d.update()
-            top_layered = []
-            for object2d in self.current_objects:
-                draw_details = object2d.get_draw_details()
-                if consts.DrawDetails.TOP_LAYER in draw_details:
-                    top_layered.append(object2d)
-                    continue
-                object2d.draw(self.canvas)
-            for object2d in top_layered:
-                object2d.draw(self.canvas)
-            index = 0
-            for power_up in self.active_powerups:
-                if power_up.end_time <= time.time():
-                    power_up.deactivate_power()
-                    power_up.activated = False
-                    self.active_powerups.remove_object(power_up)
-                    continue
-                power_up.pos = (consts.SCREEN_WIDTH - (consts.POWERUP_HITBOX_RADIUS + 8) * (2 * index + 1), consts.SCREEN_HEIGHT - (consts.POWERUP_HITBOX_RADIUS + 8))
-                power_up.draw(self.canvas)
-                power_up.arc_cooldown.pos = power_up.pos
-                power_up.arc_cooldown.draw(self.canvas)
-                index += 1
-                power_up.update_activated()
-            if self.user_input.get_key_down_now(consts.key.RETURN) and self.currently_game_over:
-                self.register_score()
-                self.start_game()
-            pygame.display.update() # Änderungen werden umgesetzt.
+            running = self.step()
             self.clock.tick(self.fps)
+    
+    def step(self) -> bool:
+        """
+        Berechnet einen Frame und malt ihn, falls gerendert wird.
+        Gibt False zurück, sobald das Spiel beendet werden soll.
+        """
+        running = True
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.begin_frame()
+        if self.resolution.enabled:
+            frame_start = time.perf_counter()
+        self.current_tick += 1
+        if self.render:
+            self.background.update()
+            self.renderer.begin_frame(self.world_queue.canvas, self.background)
+            if self.world_queue.scale != 1.0:
+                self.renderer.add(None) # Die vergrösserte Spielwelt bedeckt den ganzen Bildschirm.
+        if profiler.active:
+            profiler.mark("draw")
+        self.user_input.process_tick()
+        if self.user_input.checks_state and self.current_tick % consts.SECOND == 0:
+            self.user_input.check_state(self.current_tick, self.get_checksum())
+        for event in pygame.event.get():
+            self.user_input.process_event(event)
+            if event.type == pygame.QUIT: # Falls Schliessen-Knopf gedruckt wird, wird das Programm beendet. 
+                self.register_score()
+                running = False
+                exit_executor()
+        if self.user_input.get_key_down_now(consts.key.F3):
+            profiler.toggle()
+        if profiler.enabled and self.user_input.get_key_down_now(consts.key.F4):
+            profiler.dump_csv()
+        deliver_completions() # Ergebnisse des Speicher-Threads, ihre Callbacks laufen hier zwischen den Frames.
+        if profiler.active:
+            profiler.mark("events")
+        self.spawn_stone()
+        self.spawn_powerup()
+        self.spawn_enemy()
+        if profiler.active:
+            profiler.mark("spawn")
+        self.current_objects.sync() # Neue Objekte werden noch in diesem Frame aktualisiert.
+        self.projectiles.update()
+        for object2d in self.current_objects:
+            if not hasattr(object2d, "game_state"):
+                object2d.game_state = self
+            object2d.update()
+            self.spatial_hash.update_object(object2d)
+        self.current_objects.sync() # Änderungen aus den Updates werden vor dem Malen übernommen.
+        self.projectiles.sync()
+        if profiler.active:
+            profiler.mark("update")
+        if self.render:
+            self.draw_objects()
+        index = 0
+        for power_up in self.active_powerups:
+            if power_up.end_time <= self.get_time():
+                power_up.deactivate_power()
+                power_up.activated = False
+                self.active_powerups.remove_object(power_up)
+                continue
+            power_up.pos = (consts.SCREEN_WIDTH - (consts.POWERUP_HITBOX_RADIUS + 8) * (2 * index + 1), consts.SCREEN_HEIGHT - (consts.POWERUP_HITBOX_RADIUS + 8))
+            power_up.arc_cooldown.pos = power_up.pos
+            index += 1
+            power_up.update_activated()
+        self.active_powerups.sync()
+        if self.render:
+            self.draw_active_powerups()
+        if self.user_input.get_key_down_now(consts.key.RETURN) and self.currently_game_over:
+            self.register_score()
+            self.start_game()
+        if profiler.active:
+            profiler.mark("hud")
+        if self.render:
+            self.draw_layer(consts.RenderLayer.OVERLAY)
+            if profiler.enabled:
+                self.renderer.add(profiler.draw(self.canvas, self)) # Zählt zu keiner Phase.
+            self.renderer.present()
+        if profiler.active:
+            profiler.mark("display")
+            profiler.end_frame(self.current_tick)
+        if self.resolution.enabled and self.resolution.add_frame_time(time.perf_counter() - frame_start):
+            self.apply_render_scale()
+        return running
+
+    def apply_render_scale(self) -> None:
+        """
+        Malt die Spielwelt ab dem nächsten Frame in der Auflösung, die resolution gewählt hat.
+        """
+        scale = self.resolution.scale
+        self.world_queue.canvas = self.resolution.surfaces.get(scale, self.canvas)
+        self.world_queue.scale = scale
+        self.background.set_scale(scale)
+        self.renderer.invalidate()
+
+    def draw_layer(self, layer: consts.RenderLayer) -> None:
+        queue = self.world_queue if layer < consts.RenderLayer.HUD else self.render_queue
+        for object2d in self.current_objects.of_layer(layer):
+            object2d.render(queue)
+        self.renderer.add_all(queue.flush())
+
+    def draw_objects(self) -> None:
+        self.draw_layer(consts.RenderLayer.BACKGROUND)
+        self.draw_layer(consts.RenderLayer.ENTITIES)
+        self.renderer.add_all(self.projectiles.draw(self.world_queue.canvas, self.world_queue.scale))
+        self.draw_layer(consts.RenderLayer.PROJECTILES)
+        if self.world_queue.canvas is not self.canvas:
+            pygame.transform.scale(self.world_queue.canvas, GAME_SIZE, self.canvas)
+        if self.profiler.active:
+            self.profiler.mark("draw")
+        self.renderer.add_all(self.hud.draw(self.canvas, self.current_objects.of_layer(consts.RenderLayer.HUD)))
+        if self.profiler.active:
+            self.profiler.mark("top_layer")
+
+    def draw_active_powerups(self) -> None:
+        for power_up in self.active_powerups:
+            power_up.render(self.render_queue)
+            power_up.arc_cooldown.render(self.render_queue)
+        self.renderer.add_all(self.render_queue.flush())
 
     def spawn_stone(self):
-        if random.random() < self.stone_spawn_probability: # Wahrscheinlichkeit. dass ein Stein entsteht
+        rng = self.rng.stone
+        if rng.random() < self.stone_spawn_probability: # Wahrscheinlichkeit. dass ein Stein entsteht
             
-            size = random.choice(consts.STONE_SIZES)
-            upwards = random.random() < 0.5
-            on_the_left = random.random() < 0.5
+            size = rng.choice(consts.STONE_SIZES)
+            upwards = rng.random() < 0.5
+            on_the_left = rng.random() < 0.5
             pos_y = self.player.pos[1] - consts.SPACESHIP_HITBOX_HEIGHT * 6
             if self.player.pos[1] < consts.SCREEN_HEIGHT / 2:
                 pos_y = consts.SCREEN_HEIGHT / 2 - consts.SPACESHIP_HITBOX_HEIGHT
             pos = (-size * consts.STONE_BASE_RADIUS if on_the_left else consts.SCREEN_WIDTH + size * consts.STONE_BASE_RADIUS, pos_y)
-            vel_y = (-1 if upwards else 1) * (self.stone_min_y_vel + random.random() * (self.stone_max_vel - self.stone_min_y_vel))   # Stellt sicher, dass die vertikale Bewegung im Intervall von min_y_vel_stone bis max_vel_stone liegt.
+            vel_y = (-1 if upwards else 1) * (self.stone_min_y_vel + rng.random() * (self.stone_max_vel - self.stone_min_y_vel))   # Stellt sicher, dass die vertikale Bewegung im Intervall von min_y_vel_stone bis max_vel_stone liegt.
             vel_x = (1 if on_the_left else -1) * math.sqrt(self.stone_max_vel - vel_y**2)   # Stellt sicher, dass die absolute Geschwindigkeit der Maximalen entspricht. Die random Funktion am Ende macht, dass der Stein sich zufällig nach rechts oder links bewegt.
             vel = (vel_x, vel_y)
-            turning_speed = consts.STONE_TURNING_SPEED_MIN + random.random() * (consts.STONE_TURNING_SPEED_MAX - consts.STONE_TURNING_SPEED_MIN)
+            turning_speed = consts.STONE_TURNING_SPEED_MIN + rng.random() * (consts.STONE_TURNING_SPEED_MAX - consts.STONE_TURNING_SPEED_MIN)
             
             self.add_object(objects.Stone(pos, vel, size, turning_speed))
         self.stone_spawn_probability += consts.STONE_SPAWNING_PROPABILITY_INCREASE / (1 + self.stone_spawn_probability * consts.STONE_SPAWNING_PROPABILITY_INCREASE_DECREASE)
     
     def spawn_powerup(self):
-        if random.random() < self.powerup_spawn_probability:
-            pos = [random.random() * GAME_SIZE[0], -consts.POWERUP_HITBOX_RADIUS]
+        rng = self.rng.powerup
+        if rng.random() < self.powerup_spawn_probability:
+            pos = [rng.random() * GAME_SIZE[0], -consts.POWERUP_HITBOX_RADIUS]
             vel = (0, consts.POWERUP_SPEED)
-            powerup_type = random.choice(objects.POWERUP_TYPES)
+            powerup_type = rng.choice(objects.POWERUP_TYPES)
             self.add_object(powerup_type(pos, vel))
         self.powerup_spawn_probability += consts.POWERUP_SPAWNING_PROPABILITY_INCREASE / (1 + self.powerup_spawn_probability * consts.POWERUP_SPAWNING_PROPABILITY_INCREASE_DECREASE)
 
     def create_enemy(self, enemy_type: type[E]) -> E:
-        vel_y = self.enemy_min_y_vel + random.random() * (self.enemy_max_vel - self.enemy_min_y_vel) / 2   # Stellt sicher, dass die vertikale Bewegung im Intervall von min_y_vel_stone bis max_vel_stone liegt.
-        vel_x = math.sqrt(self.enemy_max_vel**2 - vel_y**2) * random.randrange(-1, 2, 2)   # Stellt sicher, dass die absolute Geschwindigkeit der Maximalen entspricht. Die random Funktion am Ende macht, dass der Stein sich zufällig nach rechts oder links bewegt.
+        rng = self.rng.enemy
+        vel_y = self.enemy_min_y_vel + rng.random() * (self.enemy_max_vel - self.enemy_min_y_vel) / 2   # Stellt sicher, dass die vertikale Bewegung im Intervall von min_y_vel_stone bis max_vel_stone liegt.
+        vel_x = math.sqrt(self.enemy_max_vel**2 - vel_y**2) * rng.randrange(-1, 2, 2)   # Stellt sicher, dass die absolute Geschwindigkeit der Maximalen entspricht. Die random Funktion am Ende macht, dass der Stein sich zufällig nach rechts oder links bewegt.
         vel = (vel_x, vel_y)
-        pos = (random.random() * GAME_SIZE[0], -consts.ENEMY_HEIGHT)
-        target_height = consts.ENEMY_TARGET_HEIGHT_RANGE.start + consts.ENEMY_TARGET_HEIGHT_RANGE.stop - consts.ENEMY_TARGET_HEIGHT_RANGE.start * random.random()
+        pos = (rng.random() * GAME_SIZE[0], -consts.ENEMY_HEIGHT)
+        target_height = consts.ENEMY_TARGET_HEIGHT_RANGE.start + consts.ENEMY_TARGET_HEIGHT_RANGE.stop - consts.ENEMY_TARGET_HEIGHT_RANGE.start * rng.random()
         return enemy_type(pos, vel, target_height)
 
     def create_wave(self):
@@ -284,10 +448,7 @@ class AndromedaClashGameState(GameStateType):
             self.current_wave.append(self.create_enemy(strongest_type))
     
     def has_enemies(self) -> bool:
-        for i in self.current_objects:
-            if isinstance(i, objects.CommonEnemy):
-                return True
-        return False
+        return self.current_objects.count_of_type(objects.CommonEnemy) > 0
 
     def spawn_enemy(self):
         if not self.current_wave and not self.has_enemies():
@@ -297,31 +458,76 @@ class AndromedaClashGameState(GameStateType):
             self.add_object(self.current_wave.pop(0))
             self.current_wave_cooldown = consts.ENEMY_SPAWN_COOLDOWN
 
+    @staticmethod
+    def parse_highscores(data: str) -> list[tuple[str, int]]:
+        return [(line.split(",", 1)[0], int(line.split(",", 1)[1])) for line in data.split(";") if line.strip()]
+    
+    def refresh_highscores(self) -> None:
+        """
+        Fragt die Bestenliste neu an, ohne auf die Antwort zu warten. Sie wird in einem der nächsten Frames übernommen.
+        """
+        if self.highscores_request is not None and not self.highscores_request.done():
+            return
+        request = read_data_async("highscores")
+        def on_highscores(data: str) -> None:
+            if request is self.highscores_request: # Sonst wurde inzwischen ein Score eingetragen, den die Antwort noch nicht kennt.
+                self.set_highscores(self.parse_highscores(data))
+        self.highscores_request = request
+        request.add_done_callback(on_highscores)
+    
+    def set_highscores(self, highscores: list[tuple[str, int]]) -> None:
+        if highscores == self.highscores:
+            return
+        self.highscores = highscores
+        if self.currently_game_over:
+            self.show_highscores()
+    
     def get_highscores(self, own_score: int = 0) -> tuple[list[tuple[str, int]], int]:
-        highscores = [(line.split(",", 1)[0], int(line.split(",", 1)[1])) for line in read_data("highscores").split(";") if line.strip()]
+        highscores = list(self.highscores)
         highest_position = (max(enumerate(highscores + [("", -1)]), key=lambda x: (x[1][1] < own_score, -x[0])))[0] if highscores else 0
         return highscores, highest_position
     
-    def register_score(self):
+    def register_score(self) -> StorageFuture[bool]:
+        """
+        Trägt den Score sofort in die eigene Bestenliste ein. Gespeichert wird im Hintergrund, das Ergebnis kommt über das Future.
+        """
         self.username = self.username or "NO_USERNAME_GIVEN"
         highscores, highest_position = self.get_highscores(self.score)
         highscores.insert(highest_position, (self.username, self.score))
-        return save_data("highscores", ";".join(i + "," + str(j) for i, j in highscores[:consts.LEADERBOARD_MAX_ENTRIES]))
+        self.highscores = highscores[:consts.LEADERBOARD_MAX_ENTRIES]
+        self.highscores_request = None # Antworten auf ältere Anfragen werden ignoriert.
+        return save_data_async("highscores", ";".join(i + "," + str(j) for i, j in self.highscores))
 
-    def _add_game_over_text(self, text: str, pos: tuple[objects.number, objects.number], size: int = 16, color: tuple[int, int, int] = (255, 255, 255), justify: float = 0.5) -> None:
-        self.add_object(objects.GameOverText(pos, text, size, color, justify=justify))
+    def _add_game_over_text(self, text: str, pos: tuple[objects.number, objects.number], size: int = 16, color: tuple[int, int, int] = (255, 255, 255), justify: float = 0.5) -> objects.GameOverText:
+        text_object = objects.GameOverText(pos, text, size, color, justify=justify)
+        self.add_object(text_object)
+        return text_object
+    
+    def show_highscores(self) -> None:
+        """
+        Zeigt die Platzierung und die Bestenliste auf dem Game-Over-Bildschirm an, auch wenn sie erst später ankommt.
+        """
+        highscores, highest_position = self.get_highscores(self.score)
+        self.position_text.set_text(f"YOU SCORED #{highest_position + 1}!")
+        self.invalidate_hud()
+        for text_object in self.leaderboard_texts:
+            self.remove_object(text_object)
+        self.leaderboard_texts = [
+            self._add_game_over_text(f"{idx + 1}. {user}: {score}", (8, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT * (idx - 3)), justify=0)
+            for idx, (user, score) in enumerate(highscores + [("...", "...")])
+        ]
 
     def game_over(self):
         self.remove_all_objects()
-        highscores, highest_position = self.get_highscores(self.score)
         self._add_game_over_text("GAME OVER", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 - consts.GAME_OVER_LINE_HEIGHT))
         self._add_game_over_text(f"SCORE: {self.score}", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2))
-        self._add_game_over_text(f"YOU SCORED #{highest_position + 1}!", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT))
+        self.position_text = self._add_game_over_text("", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT))
         self._add_game_over_text("PRESS ENTER TO RESTART", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT * 2.5), color=(200, 200, 200))
         self._add_game_over_text("TYPE YOUR USERNAME (FOR THE LEADERBOARD):", (consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT * 4))
         self._add_game_over_text("HIGHSCORES:", (8, consts.SCREEN_HEIGHT / 2 - consts.GAME_OVER_LINE_HEIGHT * 4.5), justify=0)
-        for idx, (user, score) in enumerate(highscores + [("...", "...")]):
-            self._add_game_over_text(f"{idx + 1}. {user}: {score}", (8, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT * (idx - 3)), justify=0)
+        self.leaderboard_texts = []
+        self.show_highscores()
+        self.refresh_highscores()
         self.username_input = objects.GameOverText((consts.SCREEN_WIDTH / 2, consts.SCREEN_HEIGHT / 2 + consts.GAME_OVER_LINE_HEIGHT * 5), "", 16, (255, 255, 255))
         self.add_object(self.username_input)
         self.add_object(objects.UsernameInputTracker())
@@ -332,6 +538,14 @@ class AndromedaClashGameState(GameStateType):
     
     def update_score(self):
         self.score_object.set_text(f'SCORE: {self.score}')
+        self.invalidate_hud()
 
     def update_credits(self):
-        self.credits_object.set_text(f'Credits: {self.credits}C') 
\ No newline at end of file
+        self.credits_object.set_text(f'Credits: {self.credits}C')
+        self.invalidate_hud()
+
+    def invalidate_hud(self):
+        """
+        Muss aufgerufen werden, wenn sich ein Objekt im HUD-Layer verändert hat, damit der Layer neu gemalt wird.
+        """
+        self.hud.invalidate() 
\ No newline at end of file
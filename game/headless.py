@@ -0,0 +1,65 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+import os
+import time
+import pygame
+from .game_state import AndromedaClashGameState, GAME_SIZE # Muss vor objects importiert werden (zirkulärer Import).
+from . import consts
+from . import objects
+from . import clock as module_clock
+from . import user_input as module_user_input
+
+@dataclass
+class HeadlessResult:
+    frames: int
+    seconds: float # Echte Zeit
+    game_seconds: float # Simulierte Spielzeit
+    score: int
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """
+        Wie viel schneller als in Echtzeit simuliert wurde.
+        """
+        return self.game_seconds / self.seconds if self.seconds > 0 else 0.0
+
+def init_headless() -> objects.Canvas:
+    """
+    Startet pygame mit den SDL-Dummy-Treibern. Es öffnet sich also kein Fenster und es wird kein Ton ausgegeben.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    return pygame.display.set_mode(GAME_SIZE)
+
+def create_headless_state(
+    user_input: Optional[module_user_input.UserInputType] = None,
+    render: bool = False,
+    seed: Optional[int] = None,
+    dirty_rects: bool = False
+    ) -> AndromedaClashGameState:
+    """
+    Erstellt einen Spielzustand mit virtueller Uhr. Ohne render wird nur simuliert und nichts gemalt.
+    """
+    canvas = init_headless()
+    return AndromedaClashGameState(canvas, user_input or module_user_input.BotUserInput(), module_clock.VirtualClock(), render, seed, dirty_rects)
+
+def run_frames(state: AndromedaClashGameState, frames: int) -> HeadlessResult:
+    """
+    Berechnet bis zu frames Frames so schnell wie möglich. Anders als loop() wird dabei kein Speicher-Thread gestartet.
+    """
+    start_tick = state.current_tick
+    start_time = time.perf_counter()
+    for _ in range(frames):
+        running = state.step()
+        state.clock.tick(state.fps)
+        if not running:
+            break
+    seconds = time.perf_counter() - start_time
+    simulated = state.current_tick - start_tick
+    return HeadlessResult(simulated, seconds, simulated / consts.SECOND, state.score)
@@ -2,9 +2,12 @@ from __future__ import annotations
 from pygame import image
 import pygame
 from functools import cache
+from collections import OrderedDict
 from collections.abc import Callable, Hashable
+from dataclasses import dataclass
 from os import PathLike
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+from . import consts
 if TYPE_CHECKING:
     from _typeshed import FileDescriptorOrPath
 
@@ -18,4 +21,218 @@ def _hashable_path(path: "FileDescriptorOrPath") -> Hashable:
 _load_image = cache(image.load)
 load_image: Callable[["FileDescriptorOrPath"], Image] = lambda x: _load_image(_hashable_path(x))
 
-Image = pygame.Surface
\ No newline at end of file
+Image = pygame.Surface
+
+def get_image_bytes(surface: Image) -> int:
+    return surface.get_pitch() * surface.get_height()
+
+def convert_for_display(surface: Image, alpha: bool = True) -> Image:
+    """
+    Wandelt das Bild ins Format des Bildschirms um, falls dieser schon existiert. Solche Bilder werden viel schneller geblittet.
+    """
+    if pygame.display.get_surface() is None:
+        return surface.copy()
+    return surface.convert_alpha() if alpha else surface.convert()
+
+@dataclass(slots=True)
+class AtlasSheet:
+    surface: Image
+    shelf_x: int = 0
+    shelf_y: int = 0
+    shelf_height: int = 0
+
+    def allocate(self, width: int, height: int) -> Optional[pygame.Rect]:
+        """
+        Sucht Platz für ein Bild. Die Bilder werden in Reihen von links nach rechts eingefügt.
+        """
+        sheet_width, sheet_height = self.surface.get_size()
+        if self.shelf_x + width > sheet_width:
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+        if width > sheet_width or self.shelf_y + height > sheet_height:
+            return None
+        rect = pygame.Rect(self.shelf_x, self.shelf_y, width, height)
+        self.shelf_x += width + consts.SPRITE_ATLAS_PADDING
+        self.shelf_height = max(self.shelf_height, height + consts.SPRITE_ATLAS_PADDING)
+        return rect
+
+SpriteKey = tuple[Hashable, Optional[tuple[int, int]], bool, bool] # Pfad, Grösse, horizontal und vertikal gespiegelt
+
+class SpriteAtlas:
+    """
+    Jede Variante (Pfad, Grösse, Spiegelung) eines Bildes wird nur einmal skaliert und gespiegelt und in ein grosses Blatt
+    im Format des Bildschirms kopiert. Alle Objekte mit dem gleichen Bild teilen sich dieselbe Subsurface davon.
+    So kostet das Erstellen eines Objekts nichts für die Grafik, und beim Blitten muss nichts umgewandelt werden.
+    """
+    sheet_size: tuple[int, int]
+    sheets: list[AtlasSheet]
+    _sprites: dict[SpriteKey, Image]
+
+    def __init__(self, sheet_size: tuple[int, int] = consts.SPRITE_ATLAS_SHEET_SIZE):
+        self.sheet_size = sheet_size
+        self.sheets = []
+        self._sprites = {}
+
+    def get(self, path: "FileDescriptorOrPath", size: Optional[tuple[int, int]] = None, flip_x: bool = False, flip_y: bool = False) -> Image:
+        key = (_hashable_path(path), None if size is None else (int(size[0]), int(size[1])), flip_x, flip_y)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = self._add(self._render(path, key[1], flip_x, flip_y))
+        return sprite
+
+    @staticmethod
+    def _render(path: "FileDescriptorOrPath", size: Optional[tuple[int, int]], flip_x: bool, flip_y: bool) -> Image:
+        image = load_image(path)
+        if size is not None and size != image.get_size():
+            image = pygame.transform.scale(image, size)
+        if flip_x or flip_y:
+            image = pygame.transform.flip(image, flip_x, flip_y)
+        return image
+
+    def _add(self, image: Image) -> Image:
+        width, height = image.get_size()
+        rect = self.sheets[-1].allocate(width, height) if self.sheets else None
+        if rect is None:
+            if width > self.sheet_size[0] or height > self.sheet_size[1]:
+                return convert_for_display(image) # Zu gross für ein Blatt
+            self.sheets.append(AtlasSheet(convert_for_display(pygame.Surface(self.sheet_size, pygame.SRCALPHA))))
+            rect = self.sheets[-1].allocate(width, height)
+            assert rect is not None
+        sheet = self.sheets[-1].surface
+        sheet.fill((0, 0, 0, 0), rect)
+        # Mit BLEND_RGBA_MAX auf durchsichtigen Hintergrund werden die Pixel genau kopiert, auch die halbdurchsichtigen.
+        sheet.blit(image, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        return sheet.subsurface(rect)
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def describe(self) -> str:
+        sheet_bytes = sum(get_image_bytes(sheet.surface) for sheet in self.sheets)
+        return f"{len(self)} sprites {len(self.sheets)} sheets {sheet_bytes / 1024:.0f} KiB"
+
+atlas = SpriteAtlas()
+
+def load_sprite(path: "FileDescriptorOrPath", size: Optional[tuple[int, int]] = None, flip_x: bool = False, flip_y: bool = False) -> Image:
+    """
+    Das Bild in der gewünschten Grösse und Spiegelung aus dem gemeinsamen Atlas. Es darf nicht verändert werden.
+    """
+    return atlas.get(path, size, flip_x, flip_y)
+
+@dataclass(slots=True)
+class RotatedImage:
+    image: Image
+    offset: tuple[int, int] # Abstand von der linken oberen Ecke zum Drehpunkt
+
+class RotationCache:
+    """
+    Vorgedrehte Bilder, gespeichert nach (Schlüssel, Winkelstufe). Der Winkel wird auf steps Stufen pro Umdrehung gerundet,
+    das Bild also höchstens einmal pro Stufe gedreht. Die Bilder werden erst gedreht, wenn sie gebraucht werden.
+    Werden mehr als max_bytes belegt, werden die am längsten nicht gebrauchten Bilder entfernt.
+    """
+    steps: int
+    max_bytes: int
+    bytes_used: int
+    hits: int
+    misses: int
+    evictions: int
+    _load_source: Callable[[Hashable], Image]
+    _sources: dict[Hashable, Image]
+    _images: OrderedDict[tuple[Hashable, int], RotatedImage]
+
+    def __init__(self, load_source: Callable[[Hashable], Image], steps: int, max_bytes: int):
+        self.steps = steps
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_source = load_source
+        self._sources = {}
+        self._images = OrderedDict()
+
+    def get_source(self, key: Hashable) -> Image:
+        source = self._sources.get(key)
+        if source is None:
+            source = self._sources[key] = self._load_source(key)
+        return source
+
+    def get(self, key: Hashable, angle: float) -> RotatedImage:
+        """
+        Das Bild gedreht um angle Grad (gegen den Uhrzeigersinn, wie pygame.transform.rotate).
+        """
+        step = round(angle * self.steps / 360) % self.steps
+        images = self._images
+        rotated = images.get((key, step))
+        if rotated is not None:
+            self.hits += 1
+            images.move_to_end((key, step))
+            return rotated
+        self.misses += 1
+        rotated = self._rotate(self.get_source(key), step * 360 / self.steps)
+        images[(key, step)] = rotated
+        self.bytes_used += get_image_bytes(rotated.image)
+        while self.bytes_used > self.max_bytes and len(images) > 1:
+            _, evicted = images.popitem(last=False)
+            self.bytes_used -= get_image_bytes(evicted.image)
+            self.evictions += 1
+        return rotated
+
+    @staticmethod
+    def _rotate(source: Image, angle: float) -> RotatedImage:
+        # Gedrehte Bilder sind grösser als das Original. Der durchsichtige Rand wird abgeschnitten, um Speicher zu sparen.
+        rotated = pygame.transform.rotate(source, angle)
+        bounds = rotated.get_bounding_rect()
+        center_x, center_y = rotated.get_width() // 2, rotated.get_height() // 2
+        return RotatedImage(convert_for_display(rotated.subsurface(bounds)), (center_x - bounds.x, center_y - bounds.y))
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def describe(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"{len(self)} images {self.bytes_used / 1024:.0f}/{self.max_bytes / 1024:.0f} KiB hits {hit_rate:.0%}"
+
+class SurfaceCache:
+    """
+    Gerenderte Bilder nach einem beliebigen Schlüssel, der den Zustand beschreibt, aus dem sie gerendert wurden.
+    Die am längsten nicht gebrauchten werden entfernt, sobald es mehr als max_entries sind.
+    Die Bilder werden geteilt und dürfen nicht verändert werden.
+    """
+    max_entries: int
+    unit: str # Wie die Einträge in describe heissen
+    hits: int
+    misses: int
+    _surfaces: OrderedDict[Hashable, Image]
+
+    def __init__(self, max_entries: int, unit: str = "images"):
+        self.max_entries = max_entries
+        self.unit = unit
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Image]:
+        surface = self._surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._surfaces.move_to_end(key)
+        return surface
+
+    def put(self, key: Hashable, surface: Image) -> Image:
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def describe(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"{len(self)}/{self.max_entries} {self.unit} hits {hit_rate:.0%}"
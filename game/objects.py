@@ -1,11 +1,8 @@
 from __future__ import annotations # Das sorgt dafür, dass Typannotationen besser funktionieren.
 from abc import ABC, abstractmethod
-from typing import Literal, Self
-import random
-import time
+from typing import Literal, Optional, Self
 import math
 from pathlib import Path
-from functools import lru_cache
 from enum import Enum
 from pygame import SurfaceType
 import pygame
@@ -14,7 +11,10 @@ from . import sound as module_sound
 from . import collider as module_collider
 from . import consts
 from . import data_structures
-from .images import load_image, Image
+from . import projectiles as module_projectiles
+from . import renderer as module_renderer
+from . import fonts as module_fonts
+from .images import load_sprite, convert_for_display, Image, RotationCache, SurfaceCache
 # Das ist ein Kommentar, er wird nicht als Code interpretiert.
 
 
@@ -39,23 +39,44 @@ class Object2D(ABC):
     """
     game_state: module_game_state.GameStateType
     collider: module_collider.Collider
+    render_layer: consts.RenderLayer = consts.RenderLayer.ENTITIES # Wird beim Hinzufügen einmal gelesen und darf sich danach nicht ändern.
     
     @property
     def user_input(self):
         return self.game_state.user_input
     
-    def get_draw_details(self) -> consts.DrawDetails:
-        return consts.DrawDetails.NONE
-    
     @abstractmethod # Das ist eine abstrakte Methode, also eine von den erwähnten, nicht implementierten Methoden.
-    def draw(self, canvas: Canvas) -> None:
+    def draw(self, canvas: Canvas) -> Optional[pygame.Rect]:
+        """
+        Gibt den bemalten Bereich zurück, damit der Dirty-Rect-Renderer nur diesen erneuern muss. None bedeutet unbekannt.
+        """
         pass
     
+    def render(self, queue: module_renderer.RenderQueue) -> None:
+        """
+        Übergibt das Objekt der Render-Queue seines Layers.
+        """
+        queue.draw(self.draw)
+    
     @abstractmethod
     def update(self) -> None:
         pass
 
-class SpaceShip(Object2D):
+class Sprite(Object2D):
+    """
+    Ein Objekt, das hauptsächlich aus Bildern besteht. Es übergibt seine Bilder in render mit queue.blit,
+    damit alle Bilder eines Layers zusammen mit Surface.blits gemalt werden. draw malt dieselben Befehle sofort.
+    """
+    @abstractmethod
+    def render(self, queue: module_renderer.RenderQueue) -> None:
+        pass
+    
+    def draw(self, canvas):
+        queue = module_renderer.RenderQueue(canvas)
+        self.render(queue)
+        return module_renderer.union_rects(queue.flush())
+
+class SpaceShip(Sprite):
     '''
     Die Klasse SpaceShip definiert das Raumschiff, welches der Spieler steuert.
     Er kann es bewegen und schießen lassen.
@@ -95,17 +116,17 @@ class SpaceShip(Object2D):
         self.shot_cooldown_timer = 0
         self.shoot_sound = module_sound.load_sound(consts.SHOOT_SOUND_PATH)
         self.damage_sound = module_sound.load_sound(consts.HIT_SOUND_PATH)
-        self.image = pygame.transform.scale(load_image(consts.SPACESHIP_IMAGE_PATH), (consts.SPACESHIP_WIDTH, consts.SPACESHIP_HEIGHT))
+        self.image = load_sprite(consts.SPACESHIP_IMAGE_PATH, (consts.SPACESHIP_WIDTH, consts.SPACESHIP_HEIGHT))
         self.invincible = False
         self.point_multiplier = 1
         self.damage_multiplier = 1
         self.piercing = False
         self.multishot = False
 
-    def draw(self, canvas):
+    def render(self, queue):
         if self.invincible:
-            pygame.draw.circle(canvas, consts.SPACESHIP_SHIELD_COLOR, self.pos, consts.SPACESHIP_HEIGHT / 2)
-        canvas.blit(self.image, (self.pos[0] - consts.SPACESHIP_WIDTH / 2, self.pos[1] - consts.SPACESHIP_HEIGHT / 2))
+            queue.circle(consts.SPACESHIP_SHIELD_COLOR, self.pos, consts.SPACESHIP_HEIGHT / 2)
+        queue.blit(self.image, (self.pos[0] - consts.SPACESHIP_WIDTH / 2, self.pos[1] - consts.SPACESHIP_HEIGHT / 2))
     
     def update(self):
         self.pos = (
@@ -133,22 +154,26 @@ class SpaceShip(Object2D):
         self.handle_shooting()
         self.collider.position = self.pos
         if not self.invincible:
-            for obj in self.game_state.current_objects:
-                if not isinstance(obj, Stone) and not isinstance(obj, Projectile) and not isinstance(obj, CommonEnemy):
-                    continue
-                if isinstance(obj, PiercingProjectile) and obj.has_hit_enemy(self):
-                    continue
-                if obj.collider.collides(self.collider):
-                    if isinstance(obj, Projectile) and obj.owner != ProjectileOwner.ENEMY:
-                        continue
-                    self.lives -= 1
-                    self.damage_sound.play()
-                    if isinstance(obj, PiercingProjectile):
-                        obj.register_enemy(self)
-                    else:
-                        self.game_state.remove_object(obj)
-                    if self.lives <= 0:
-                        self.game_state.game_over()
+            self.collision()
+    
+    def collision(self):
+        for obj in self.game_state.get_nearby_objects(self.collider, Stone, CommonEnemy):
+            if obj.collider.collides(self.collider):
+                self.handle_hit(obj)
+        for projectile in self.game_state.projectiles.get_colliding(self.collider, ProjectileOwner.ENEMY):
+            if isinstance(projectile, PiercingProjectile) and projectile.has_hit_enemy(self):
+                continue
+            self.handle_hit(projectile)
+    
+    def handle_hit(self, obj: Object2D):
+        self.lives -= 1
+        self.damage_sound.play()
+        if isinstance(obj, PiercingProjectile):
+            obj.register_enemy(self)
+        else:
+            self.game_state.remove_object(obj)
+        if self.lives <= 0:
+            self.game_state.game_over()
     
     def handle_shooting(self):
         self.shot_cooldown_timer -= 1
@@ -172,45 +197,97 @@ class SpaceShip(Object2D):
         self.shoot_sound.play()
 
 class Projectile(Object2D):
+    """
+    Projektile werden vom ProjectileSystem des Spielzustands bewegt, getroffen und gemalt.
+    Solange ein Projektil dort eingetragen ist, liegt sein Zustand in dessen Arrays.
+    Der Collider wird beim ersten Zugriff erstellt und danach nur noch aus den Arrays aktualisiert. Kollisionen aller
+    Projektile prüft man trotzdem besser mit ProjectileSystem.get_colliding.
+    """
     owner: ProjectileOwner
-    pos: tuple[number, number]
-    vel: tuple[number, number]
     color: tuple[int, int, int] = (255, 0, 0)
     direction: number
-    collider: module_collider.BoxCollider
     game_state: module_game_state.AndromedaClashGameState
     width = consts.PROJECTILE_WIDTH
     height = consts.PROJECTILE_HEIGHT
     hitbox_width = consts.PROJECTILE_HITBOX_WIDTH
     hitbox_height = consts.PROJECTILE_HITBOX_HEIGHT
+    growth_rate: number = 0 # Wie viel breiter das Projektil pro Frame wird
+    system: Optional[module_projectiles.ProjectileSystem]
+    index: int
+    _pos: tuple[number, number]
+    _vel: tuple[number, number]
+    _collider: Optional[module_collider.BoxCollider]
     def __init__(self, pos: tuple[number, number], vel: tuple[number, number], direction: number, owner: ProjectileOwner):
-        self.pos = pos
-        self.vel = vel
+        self._pos = pos
+        self._vel = vel
         self.direction = direction
-        self.collider = self.get_collider()
         self.owner = owner
+        self.system = None
+        self.index = -1
+        self._collider = None
     
-    def get_collider(self):
-        return module_collider.BoxCollider(self.hitbox_width, self.hitbox_height, self.pos)
+    @property
+    def pos(self) -> tuple[number, number]:
+        if self.system is None:
+            return self._pos
+        return (self.system.pos.item(self.index, 0), self.system.pos.item(self.index, 1))
+    
+    @property
+    def vel(self) -> tuple[number, number]:
+        if self.system is None:
+            return self._vel
+        return (self.system.vel.item(self.index, 0), self.system.vel.item(self.index, 1))
+    
+    @property
+    def collider(self) -> module_collider.BoxCollider:
+        return self.get_collider()
+    
+    def detach(self, pos: tuple[number, number], vel: tuple[number, number]) -> None:
+        """
+        Wird vom ProjectileSystem aufgerufen, wenn das Projektil entfernt wird.
+        """
+        self._pos = pos
+        self._vel = vel
+        self.system = None
+        self.index = -1
+    
+    def get_collider(self) -> module_collider.BoxCollider:
+        system = self.system
+        if system is None:
+            hitbox_width, hitbox_height = self.hitbox_width, self.hitbox_height
+        else:
+            hitbox_width, hitbox_height = system.hitbox_size.item(self.index, 0), system.hitbox_size.item(self.index, 1)
+        collider = self._collider
+        if collider is None:
+            if self.direction:
+                # Schräge Projektile (Multishot) werden entlang ihrer gemalten Linie gedreht.
+                collider = module_collider.RotatedRectangleCollider(hitbox_width, hitbox_height, self.pos, -self.direction)
+            else:
+                collider = module_collider.BoxCollider(hitbox_width, hitbox_height, self.pos)
+            self._collider = collider
+            return collider
+        collider.width = hitbox_width
+        collider.height = hitbox_height
+        if system is None:
+            collider.pos_x, collider.pos_y = self._pos
+        else:
+            collider.pos_x, collider.pos_y = system.pos.item(self.index, 0), system.pos.item(self.index, 1)
+        return collider
     
     def draw(self, canvas):
-        offset = (math.sin(self.direction) * self.height, -math.cos(self.direction) * self.height)
-        pygame.draw.line(
+        width, height = (self.width, self.height) if self.system is None else self.system.size[self.index].tolist()
+        pos = self.pos
+        offset = (math.sin(self.direction) * height, -math.cos(self.direction) * height)
+        return pygame.draw.line(
             canvas,
             self.color,
-            (self.pos[0] - offset[0] / 2, self.pos[1] - offset[1] / 2),
-            (self.pos[0] + offset[0] / 2, self.pos[1] + offset[1] / 2),
-            int(self.width)
+            (pos[0] - offset[0] / 2, pos[1] - offset[1] / 2),
+            (pos[0] + offset[0] / 2, pos[1] + offset[1] / 2),
+            int(width)
         )
     
     def update(self):
-        if self.pos[1] < -20 or self.pos[1] > consts.SCREEN_HEIGHT + 20:
-            self.game_state.remove_object(self)
-        self.pos = (
-            self.pos[0] + self.vel[0],
-            self.pos[1] + self.vel[1]
-        )
-        self.collider.position = self.pos
+        pass # Übernimmt das ProjectileSystem für alle Projektile auf einmal.
 
 class PiercingProjectile(Projectile):
     _hit_enemies: data_structures.ObjectDict[float]
@@ -220,12 +297,13 @@ class PiercingProjectile(Projectile):
         self._hit_enemies = data_structures.ObjectDict()
     
     def register_enemy(self, enemy: Object2D):
-        self._hit_enemies[enemy] = time.time() + consts.PIERCING_PROJECTILE_ENEMY_COOLDOWN
+        self._hit_enemies[enemy] = self.game_state.get_time() + consts.PIERCING_PROJECTILE_ENEMY_COOLDOWN
     
     def _clean(self):
-        for obj, __time in self._hit_enemies.items():
-            if __time < time.time():
-                self._hit_enemies.pop(obj)
+        now = self.game_state.get_time()
+        expired = [obj for obj, __time in self._hit_enemies.items() if __time < now]
+        for obj in expired:
+            self._hit_enemies.pop(obj)
     
     def has_hit_enemy(self, enemy: Object2D):
         self._clean()
@@ -244,14 +322,9 @@ class WaveProjectile(PiercingProjectile):
     hitbox_width = consts.WAVE_PROJECTILE_HITBOX_WIDTH
     hitbox_height = consts.WAVE_PROJECTILE_HITBOX_HEIGHT
     color = (0, 255, 255)
-    
-    def update(self):
-        self.width += consts.WAVE_GROW_RATE
-        self.hitbox_width += consts.WAVE_GROW_RATE
-        self.collider.width = self.hitbox_width
-        return super().update()
+    growth_rate = consts.WAVE_GROW_RATE
 
-class PowerUp(Object2D):
+class PowerUp(Sprite):
     '''
     PowerUps verbessern die Eigenschaften des Raumschiffes oder machen die Rahmenbedingungen einfacher. Sie fallen senkrecht nach unten und müssen eingesammelt werden.
     '''
@@ -274,7 +347,7 @@ class PowerUp(Object2D):
         self.vel = vel
         self.size = consts.POWERUP_HITBOX_RADIUS
         self.collider = module_collider.CircleCollider(consts.POWERUP_HITBOX_RADIUS, pos)
-        self.image = pygame.transform.scale(load_image(self.IMAGE_FILE), (consts.POWERUP_HEIGHT, consts.POWERUP_WIDTH))
+        self.image = load_sprite(self.IMAGE_FILE, (consts.POWERUP_HEIGHT, consts.POWERUP_WIDTH))
 
     @classmethod
     @abstractmethod
@@ -292,8 +365,8 @@ class PowerUp(Object2D):
         if self.collider.collides(self.game_state.player.collider):
             self.game_state.activate_powerup(self)
     
-    def draw(self, canvas):
-        canvas.blit(self.image, (self.pos[0] - consts.POWERUP_WIDTH / 2, self.pos[1] - consts.POWERUP_HEIGHT / 2))
+    def render(self, queue):
+        queue.blit(self.image, (self.pos[0] - consts.POWERUP_WIDTH / 2, self.pos[1] - consts.POWERUP_HEIGHT / 2))
 
     @abstractmethod
     def activate_power(self):
@@ -552,7 +625,7 @@ class MultishotPowerUp(PowerUp):
     
 POWERUP_TYPES: list[type[PowerUp]] = [DoubleSpeedPowerUp, InvincibilityPowerUp, DoublePointsPowerUp, DoubleDamagePowerUp, StrikePowerUp, MultishotPowerUp] # Ansonsten funnktioniert es nicht. (wenn nicht in dieser Datei)
 
-class Stone(Object2D):
+class Stone(Sprite):
     pos: tuple[number, number]
     vel: tuple[number, number]
     collider: module_collider.CircleCollider
@@ -563,6 +636,12 @@ class Stone(Object2D):
     image: Image
     turning_speed: float
     exist_time: int
+    # Gemeinsam für alle Steine, nach Radius. So muss nicht jeder Stein in jedem Frame sein Bild drehen.
+    rotation_cache: RotationCache = RotationCache(
+        lambda size: load_sprite(consts.STONE_IMAGE_PATH, (size * 2, size * 2)),
+        consts.STONE_ROTATION_STEPS,
+        consts.STONE_ROTATION_CACHE_MAX_BYTES
+    )
     
     def __init__(self, pos: tuple[number, number], vel: tuple[number, number], size: Literal[1, 2, 3, 4], turning_speed: float = 0.002):
         self.pos = pos
@@ -573,7 +652,7 @@ class Stone(Object2D):
         self.lives = consts.STONE_LIVES
         self.color = consts.STONE_COLOR
         self.health_bar = HealthBar(self.pos, self.lives, self.lives, self)
-        self.image = pygame.transform.scale(load_image(consts.STONE_IMAGE_PATH), (self.size * 2, self.size * 2))
+        self.image = self.rotation_cache.get_source(self.size)
         self.turning_speed = turning_speed
         self.exist_time = 0
 
@@ -589,27 +668,25 @@ class Stone(Object2D):
         self.collision()
         
     def collision(self):
-        for g in self.game_state.current_objects:
-            if not isinstance(g, Projectile):
+        for g in self.game_state.projectiles.get_colliding(self.collider):
+            if isinstance(g, PiercingProjectile) and g.has_hit_enemy(self):
                 continue
-            elif isinstance(g, PiercingProjectile) and g.has_hit_enemy(self):
-                pass
-            elif self.collider.collides(g.collider):
-                if isinstance(g, PiercingProjectile):
-                    g.register_enemy(self)
-                else:
-                    self.game_state.remove_object(g)
-                self.lives -= self.game_state.player.attack_damage
-                self.health_bar.lives = self.lives
-                if self.lives > 0:
-                    continue
-                if self.size / consts.STONE_BASE_RADIUS >= consts.STONE_SIZES[1]:
-                    self.split_stone()
-                self.game_state.remove_object(self)
-                self.death_sound.play()
-                if g.owner != ProjectileOwner.ENEMY:
-                    self.game_state.score += consts.SCORE_STONE * self.game_state.player.point_multiplier
-                self.game_state.update_score()
+            if isinstance(g, PiercingProjectile):
+                g.register_enemy(self)
+            else:
+                self.game_state.remove_object(g)
+            self.lives -= self.game_state.player.attack_damage
+            self.health_bar.lives = self.lives
+            if self.lives > 0:
+                continue
+            if self.size / consts.STONE_BASE_RADIUS >= consts.STONE_SIZES[1]:
+                self.split_stone()
+            self.game_state.remove_object(self)
+            self.death_sound.play()
+            if g.owner != ProjectileOwner.ENEMY:
+                self.game_state.score += consts.SCORE_STONE * self.game_state.player.point_multiplier
+            self.game_state.update_score()
+            break # Ein zerstörter Stein teilt sich nur einmal, auch wenn ihn mehrere Projektile gleichzeitig treffen.
 
 
     def split_stone(self):
@@ -618,7 +695,7 @@ class Stone(Object2D):
         '''
         
         # Magic Numbers vermeiden, und Kommentare zu den Operationen
-        weight_a = random.random() * 0.25 + 0.375
+        weight_a = self.game_state.rng.split.random() * 0.25 + 0.375
         vel_x = self.vel[0] * 2.5
         vel_y = self.vel[1] * 2.2
         self.game_state.add_object(
@@ -628,11 +705,12 @@ class Stone(Object2D):
             Stone(self.pos, (-vel_x * (1 - weight_a), vel_y * (1 - weight_a)), (self.size // consts.STONE_BASE_RADIUS) - 1, -self.turning_speed)
         )
 
-    def draw(self, canvas):
+    def render(self, queue):
         if self.health_bar.lives < self.health_bar.max_lives:
             self.health_bar.pos = (self.pos[0], self.pos[1] - self.size - consts.HEALTH_BAR_HEIGHT - 2)
-            self.health_bar.draw(canvas)
-        canvas.blit(pygame.transform.rotate(self.image, self.turning_speed * (self.exist_time + 1000)), (self.pos[0] - self.size, self.pos[1] - self.size))
+            self.health_bar.render(queue)
+        rotated = self.rotation_cache.get(self.size, self.turning_speed * (self.exist_time + 1000))
+        queue.blit(rotated.image, (self.pos[0] - rotated.offset[0], self.pos[1] - rotated.offset[1]))
 
     def set_pos(self, new_pos):
         self.pos = new_pos
@@ -640,7 +718,7 @@ class Stone(Object2D):
     def set_vel(self, new_vel):
         self.vel = new_vel  
         
-class CommonEnemy(Object2D):
+class CommonEnemy(Sprite):
     pos: tuple[number, number]
     vel: tuple[number, number]
     size: tuple[number, number] = (consts.ENEMY_WIDTH, consts.ENEMY_HEIGHT)
@@ -675,12 +753,7 @@ class CommonEnemy(Object2D):
         return HealthBar(self.pos, self.lives, self.lives, self)
         
     def get_image(self) -> Image:
-        return pygame.transform.flip(
-            pygame.transform.scale(
-                load_image(consts.ENEMY_IMAGE_PATH), self.size
-            ),
-            False, True
-        )
+        return load_sprite(consts.ENEMY_IMAGE_PATH, self.size, flip_y=True)
 
     def update(self):
         if (self.pos[1] > consts.SCREEN_HEIGHT + self.size[1]):
@@ -709,15 +782,11 @@ class CommonEnemy(Object2D):
         self.shot_sound.play()
 
     def collision(self):
-        for g in self.game_state.current_objects:
-            if not isinstance(g, Projectile) and not isinstance(g, Stone):
-                continue
-            if isinstance(g, Projectile) and g.owner != ProjectileOwner.PLAYER:
-                continue
+        hits: list[Stone | Projectile] = [g for g in self.game_state.get_nearby_objects(self.collider, Stone) if self.collider.collides(g.collider)]
+        hits += self.game_state.projectiles.get_colliding(self.collider, ProjectileOwner.PLAYER)
+        for g in hits:
             if isinstance(g, PiercingProjectile) and g.has_hit_enemy(self):
                 continue
-            if not self.collider.collides(g.collider):
-                continue
             
             if isinstance(g, PiercingProjectile):
                 g.register_enemy(self)
@@ -735,11 +804,12 @@ class CommonEnemy(Object2D):
             self.game_state.remove_object(self)
             self.game_state.score += death_score * self.game_state.player.point_multiplier
             self.game_state.update_score()
+            break # Punkte gibt es nur einmal, auch wenn mehrere Treffer gleichzeitig kommen.
 
-    def draw(self, canvas):
+    def render(self, queue):
         self.health_bar.pos = (self.pos[0], self.pos[1] - self.size[1] / 2 - self.health_bar.height - 2)
-        self.health_bar.draw(canvas)
-        canvas.blit(self.image, (self.pos[0] - self.size[0] / 2, self.pos[1] - self.size[1] / 2))
+        self.health_bar.render(queue)
+        queue.blit(self.image, (self.pos[0] - self.size[0] / 2, self.pos[1] - self.size[1] / 2))
         
     def set_pos(self, new_pos):
         self.pos = new_pos
@@ -754,12 +824,7 @@ class PiercingProjectileEnemy(CommonEnemy):
         self.shot_sound.play()
     
     def get_image(self) -> Image:
-        return pygame.transform.flip(
-            pygame.transform.scale(
-                load_image(consts.PIERCING_ENEMY_IMAGE_PATH), (consts.ENEMY_WIDTH, consts.ENEMY_HEIGHT)
-            ),
-            False, True
-        )
+        return load_sprite(consts.PIERCING_ENEMY_IMAGE_PATH, (consts.ENEMY_WIDTH, consts.ENEMY_HEIGHT), flip_y=True)
 
 class FireEnemy(CommonEnemy):
     shot_cooldown = consts.FIRE_ENEMY_SHOT_COOLDOWN
@@ -770,12 +835,7 @@ class FireEnemy(CommonEnemy):
         self.shot_sound.play()
     
     def get_image(self) -> Image:
-        return pygame.transform.flip(
-            pygame.transform.scale(
-                load_image(consts.FIRE_ENEMY_IMAGE_PATH), self.size
-            ),
-            False, True
-        )
+        return load_sprite(consts.FIRE_ENEMY_IMAGE_PATH, self.size, flip_y=True)
 
 class BossEnemy(CommonEnemy):
     shot_cooldown = consts.BOSS_ENEMY_SHOT_COOLDOWN
@@ -812,21 +872,20 @@ class BossEnemy(CommonEnemy):
         self.shot_sound.play()
 
     def get_image(self) -> Image:
-        return pygame.transform.scale(
-            load_image(consts.BOSS_ENEMY_IMAGE_PATH), (consts.BOSS_ENEMY_WIDTH, consts.BOSS_ENEMY_HEIGHT)
-        )
+        return load_sprite(consts.BOSS_ENEMY_IMAGE_PATH, (consts.BOSS_ENEMY_WIDTH, consts.BOSS_ENEMY_HEIGHT))
 
 ENEMY_TYPES: list[type[CommonEnemy]] = [CommonEnemy, FireEnemy, PiercingProjectileEnemy, BossEnemy, BossEnemy]
 ENEMY_COSTS: dict[type[CommonEnemy], int] = {CommonEnemy: 1, FireEnemy: 3, PiercingProjectileEnemy: 8, BossEnemy: 16}
 ENEMY_THRESHOLDS: dict[type[CommonEnemy], int] = {CommonEnemy: 1, FireEnemy: 8, PiercingProjectileEnemy: 14, BossEnemy: 22}
 
-class LifeDisplay(Object2D):
+class LifeDisplay(Sprite):
+    render_layer = consts.RenderLayer.HUD
     image: Image
     pos: tuple[number, number]
     lives: int
     image_width: number
     def __init__(self, lives: int = 3):
-        self.image = load_image(consts.HEART_IMAGE_PATH)
+        self.image = load_sprite(consts.HEART_IMAGE_PATH)
         self.image_width = self.image.get_width()
         self.lives = lives
         self.pos = consts.POS_LIVES
@@ -834,14 +893,11 @@ class LifeDisplay(Object2D):
     def update(self):
         pass
     
-    def get_draw_details(self):
-        return consts.DrawDetails.TOP_LAYER
-
-    def draw(self, canvas):
+    def render(self, queue):
         for i in range(self.lives):
-            canvas.blit(self.image, (self.pos[0] + (self.image_width + consts.LIFE_ICON_DISTANCE) * i, self.pos[1]))
+            queue.blit(self.image, (self.pos[0] + (self.image_width + consts.LIFE_ICON_DISTANCE) * i, self.pos[1]))
 
-class Text(Object2D): 
+class Text(Sprite):
     BLACK = (0, 0, 0)
     RED = (255, 0, 0)
     GREEN = (0, 255, 0)
@@ -854,6 +910,7 @@ class Text(Object2D):
     text_size: int
     font: pygame.font.FontType
     justify: float
+    use_glyphs: bool = False # Ob der Text aus einzeln gerenderten Zeichen zusammengesetzt werden darf (für oft wechselnde Zahlen)
     
     def __init__(self, pos: tuple[number, number], text: str, text_size: int, text_color: tuple[int, int, int], justify: float = 0.5):
         self.pos = pos
@@ -863,11 +920,11 @@ class Text(Object2D):
     def update(self):
         pass
         
-    def draw(self, canvas):
+    def render(self, queue):
         rect = self.img.get_rect()
         pos_x = self.pos[0] - rect.width * self.justify
         pos_y = self.pos[1] - rect.height * self.justify
-        canvas.blit(self.img, (pos_x, pos_y))       # Zeichnen des Textes
+        queue.blit(self.img, (pos_x, pos_y))       # Zeichnen des Textes
         
     def set_all(self, text: str, text_size: int, text_color: tuple[int, int, int]):               # Setter-Methoden
         self.text = text
@@ -875,36 +932,38 @@ class Text(Object2D):
         self.set_text_size(text_size)
         
     def set_text(self, text: str):
+        if text == self.text:
+            return
         self.text = text
-        self.img = self.font.render(self.text, True, self.text_color)       
+        self.render_text()
         
     def set_text_size(self, text_size: int):
         self.text_size = text_size
         self.font = self.load_font(consts.FONT_NAME, text_size)       # Font aktualisieren/erstellen
-        self.img = self.font.render(self.text, True, self.text_color)       # Text aktualisieren/erstellen
+        self.render_text()       # Text aktualisieren/erstellen
         
     def set_text_color(self, text_color: tuple[int, int, int]):
         self.text_color = text_color
-        self.img = self.font.render(self.text, True, self.text_color)
+        self.render_text()
     
-    @staticmethod
-    @lru_cache(256)
-    def load_font(name: str | Path, size: int) -> pygame.font.FontType:
-        return pygame.font.Font(name, size)
+    def render_text(self):
+        # Gleiche Texte teilen sich ein Bild aus dem Cache, es darf also nicht verändert werden.
+        self.img = module_fonts.render_text(consts.FONT_NAME, self.text_size, self.text, self.text_color, self.use_glyphs)
+    
+    load_font = staticmethod(module_fonts.load_font)
 
 class GameOverText(Text):
-    def get_draw_details(self):
-        return consts.DrawDetails.TOP_LAYER
+    render_layer = consts.RenderLayer.HUD
 
 class Score(Text):
-    def get_draw_details(self):
-        return consts.DrawDetails.TOP_LAYER
+    render_layer = consts.RenderLayer.HUD
+    use_glyphs = True
 
 class Credits(Text):
-    def get_draw_details(self):
-        return consts.DrawDetails.TOP_LAYER
+    render_layer = consts.RenderLayer.HUD
+    use_glyphs = True
     
-class HealthBar(Object2D):
+class HealthBar(Sprite):
     max_lives: int
     lives: int
     pos: tuple[number, number]
@@ -914,6 +973,9 @@ class HealthBar(Object2D):
     color: tuple[int, int, int] = consts.HEALTH_BAR_COLOR
     background_color: tuple[int, int, int] = consts.HEALTH_BAR_BACKGROUND_COLOR
     slice_color: tuple[int, int, int] = consts.HEALTH_BAR_SLICE_COLOR
+    # Gemeinsam für alle Balken. Ein Balken wird nur neu gerendert, wenn sich Leben, maximale Leben oder der Schaden des Spielers ändern.
+    surface_cache: SurfaceCache = SurfaceCache(consts.HUD_WIDGET_CACHE_SIZE)
+    margin: int = math.ceil(consts.HEALTH_BAR_SLICE_WIDTH / 2) # Die Striche können über den Rand des Balkens hinausragen.
     
     def __init__(self, pos: tuple[number, number], lives: int, max_lives: int, parent: Object2D):
         self.pos = pos
@@ -929,28 +991,37 @@ class HealthBar(Object2D):
     def update(self):
         pass
 
-    def draw(self, canvas):
-        pos_x = self.pos[0]
-        pos_y = self.pos[1]
-        pygame.draw.rect(canvas, self.background_color, (pos_x - self.width / 2, pos_y, self.width, self.height))
-        pygame.draw.rect(canvas, self.color, (pos_x - self.width / 2, pos_y, self.width * (self.lives / self.max_lives), self.height))
+    def render(self, queue):
         player_attack_damage = self.parent_game_state.player.attack_damage
+        key = (self.width, self.height, self.color, self.background_color, self.slice_color, self.lives, self.max_lives, player_attack_damage)
+        surface = self.surface_cache.get(key)
+        if surface is None:
+            surface = self.surface_cache.put(key, self.render_surface(player_attack_damage))
+        queue.blit(surface, (self.pos[0] - self.width / 2 - self.margin, self.pos[1]))
+
+    def render_surface(self, player_attack_damage: number) -> Image:
+        surface = pygame.Surface((self.width + 2 * self.margin, self.height), pygame.SRCALPHA)
+        left = self.margin
+        pygame.draw.rect(surface, self.background_color, (left, 0, self.width, self.height))
+        pygame.draw.rect(surface, self.color, (left, 0, self.width * (self.lives / self.max_lives), self.height))
         for i in range(0, math.ceil(self.lives / player_attack_damage)):
             health_step = self.lives - i * player_attack_damage
-            pygame.draw.rect(canvas, self.slice_color, (pos_x - self.width / 2 - consts.HEALTH_BAR_SLICE_WIDTH / 2 + self.width * (health_step / self.max_lives), pos_y, consts.HEALTH_BAR_SLICE_WIDTH, self.height))
+            pygame.draw.rect(surface, self.slice_color, (left - consts.HEALTH_BAR_SLICE_WIDTH / 2 + self.width * (health_step / self.max_lives), 0, consts.HEALTH_BAR_SLICE_WIDTH, self.height))
+        return convert_for_display(surface)
 
 class BossBar(HealthBar):
     width = consts.BOSS_BAR_WIDTH
     color = consts.BOSS_BAR_COLOR
     slice_color = consts.BOSS_BAR_COLOR
 
-class ArcCooldown(Object2D):
+class ArcCooldown(Sprite):
     max_time: float
     end_time: float
     pos: tuple[number, number]
     radius: int = consts.ARC_COOLDOWN_RADIUS
     parent: Object2D
     color: tuple[int, int, int] = consts.ARC_COOLDOWN_COLOR
+    surface_cache: SurfaceCache = SurfaceCache(consts.HUD_WIDGET_CACHE_SIZE) # Nach Radius, Farbe und gerundetem Anteil
     
     def __init__(self, pos: tuple[number, number], end_time: float, max_time: float, parent: Object2D):
         self.pos = pos
@@ -966,11 +1037,16 @@ class ArcCooldown(Object2D):
     def update(self):
         pass
     
-    def draw(self, canvas):
-        pos_x = self.pos[0]
-        pos_y = self.pos[1]
-        fraction = (self.end_time - time.time()) / self.max_time
-        pygame.draw.arc(canvas, self.color, (pos_x - self.radius, pos_y - self.radius, self.radius * 2, self.radius * 2), -math.pi / 2, (fraction - 0.25) * math.pi * 2)
+    def render(self, queue):
+        fraction = (self.end_time - self.parent_game_state.get_time()) / self.max_time
+        step = round(fraction * consts.ARC_COOLDOWN_STEPS)
+        key = (self.radius, self.color, step)
+        surface = self.surface_cache.get(key)
+        if surface is None:
+            surface = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
+            pygame.draw.arc(surface, self.color, (0, 0, self.radius * 2, self.radius * 2), -math.pi / 2, (step / consts.ARC_COOLDOWN_STEPS - 0.25) * math.pi * 2)
+            surface = self.surface_cache.put(key, convert_for_display(surface))
+        queue.blit(surface, (self.pos[0] - self.radius, self.pos[1] - self.radius))
 
 class UsernameInputTracker(Object2D):
     username: str
@@ -1021,7 +1097,7 @@ class UsernameInputTracker(Object2D):
         self.username = ""
     
     def draw(self, canvas):
-        pass
+        return pygame.Rect(0, 0, 0, 0)
     
     def update(self):
         for key, value in self.keys.items():
@@ -1031,6 +1107,9 @@ class UsernameInputTracker(Object2D):
             self.username = self.username[:-1]
         self.username = self.username[:32]
         text = self.username + ("_" if self.game_state.current_tick % 20 < 10 else "")
-        self.game_state.username_input.justify = 0.0
-        self.game_state.username_input.set_text(text)
+        username_input = self.game_state.username_input
+        if username_input.text != text or username_input.justify != 0.0:
+            username_input.justify = 0.0
+            username_input.set_text(text)
+            self.game_state.invalidate_hud()
         self.game_state.username = self.username
\ No newline at end of file
@@ -0,0 +1,176 @@
+from __future__ import annotations
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional
+import csv
+import statistics
+import time
+import pygame
+from . import consts
+from . import objects
+from . import images as module_images
+from . import fonts as module_fonts
+from . import storage as module_storage
+from . import game_state as module_game_state
+
+PHASES = ("events", "spawn", "update", "draw", "top_layer", "hud", "display")
+
+class FrameProfiler:
+    """
+    Misst, wie lange die Phasen eines Frames dauern, und zeigt sie als Overlay an (F3, mit F4 werden die Messwerte als CSV gespeichert).
+    Die Hauptschleife misst nur, wenn active gesetzt ist. Ist der Profiler aus, kostet er also nur ein paar if-Abfragen pro Frame.
+    """
+    enabled: bool # Ob der Profiler eingeschaltet ist
+    active: bool # Ob der aktuelle Frame gemessen wird
+    samples: deque[tuple[float, ...]] # (Tick, Frame, *Phasen), Zeiten in Sekunden
+    last_dump: Optional[Path]
+    _phase_times: dict[str, float]
+    _last_time: float
+    _overlay: Optional[pygame.Surface]
+    _frames_since_refresh: int
+
+    def __init__(self, sample_count: int = consts.PROFILER_SAMPLE_COUNT):
+        self.enabled = False
+        self.active = False
+        self.samples = deque(maxlen=sample_count)
+        self.last_dump = None
+        self._phase_times = dict.fromkeys(PHASES, 0.0)
+        self._last_time = 0.0
+        self._overlay = None
+        self._frames_since_refresh = 0
+
+    def toggle(self) -> None:
+        self.enabled = not self.enabled
+        self._overlay = None
+
+    def begin_frame(self) -> None:
+        self.active = True
+        self._phase_times = dict.fromkeys(PHASES, 0.0)
+        self._last_time = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """
+        Schreibt die Zeit seit der letzten Markierung der Phase zu.
+        """
+        now = time.perf_counter()
+        self._phase_times[phase] += now - self._last_time
+        self._last_time = now
+
+    def end_frame(self, tick: int) -> None:
+        self.active = False
+        phase_times = [self._phase_times[phase] for phase in PHASES]
+        self.samples.append((tick, sum(phase_times), *phase_times))
+
+    def get_frame_percentiles(self) -> tuple[float, float, float]:
+        """
+        p50, p95 und p99 der Frame-Zeiten in Millisekunden.
+        """
+        if len(self.samples) < 2:
+            return (0.0, 0.0, 0.0)
+        cuts = statistics.quantiles([sample[1] * 1000 for sample in self.samples], n=100, method="inclusive")
+        return (cuts[49], cuts[94], cuts[98])
+
+    def get_phase_means(self) -> dict[str, float]:
+        """
+        Durchschnittliche Zeit der Phasen in Millisekunden.
+        """
+        if not self.samples:
+            return dict.fromkeys(PHASES, 0.0)
+        return {phase: statistics.fmean(sample[index + 2] for sample in self.samples) * 1000 for index, phase in enumerate(PHASES)}
+
+    def dump_csv(self, path: Optional[Path] = None) -> Path:
+        if path is None:
+            path = Path(f"profile-{time.strftime('%Y%m%d-%H%M%S')}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["tick", "frame_ms", *(f"{phase}_ms" for phase in PHASES)])
+            for tick, *times in self.samples:
+                writer.writerow([int(tick), *(f"{value * 1000:.4f}" for value in times)])
+        self.last_dump = path
+        self._overlay = None
+        return path
+
+    def draw(self, canvas: objects.Canvas, game_state: module_game_state.AndromedaClashGameState) -> pygame.Rect:
+        """
+        Malt das Overlay. Es wird nur alle PROFILER_REFRESH_INTERVAL Frames neu erstellt, und die Zeit dafür wird keiner Phase zugerechnet.
+        """
+        self._frames_since_refresh += 1
+        if self._overlay is None or self._frames_since_refresh >= consts.PROFILER_REFRESH_INTERVAL:
+            self._overlay = self._render_overlay(game_state)
+            self._frames_since_refresh = 0
+        rect = canvas.blit(self._overlay, (0, 0))
+        self._last_time = time.perf_counter()
+        return rect
+
+    def _render_overlay(self, game_state: module_game_state.AndromedaClashGameState) -> pygame.Surface:
+        font = module_fonts.load_font(consts.FONT_NAME, consts.PROFILER_TEXT_SIZE)
+        budget = 1000 / game_state.fps
+        counts = Counter(type(object2d).__name__ for object2d in game_state.current_objects)
+        counts.update({kind.__name__: count for kind, count in game_state.projectiles.count_by_kind().items()})
+        count_lines = []
+        line = ""
+        for name, count in counts.most_common():
+            entry = f"{name} {count}"
+            if line and len(line) + len(entry) > 34:
+                count_lines.append(line)
+                line = ""
+            line = f"{line}  {entry}" if line else entry
+        if line:
+            count_lines.append(line)
+        lines = 7 + len(PHASES) + len(count_lines) + 1
+        line_height = consts.PROFILER_LINE_HEIGHT
+        height = lines * line_height + consts.PROFILER_HISTOGRAM_HEIGHT + 12
+        overlay = pygame.Surface((consts.PROFILER_WIDTH, height), pygame.SRCALPHA)
+        overlay.fill(consts.PROFILER_BACKGROUND_COLOR)
+        p50, p95, p99 = self.get_frame_percentiles()
+        y = 4
+        def write(text: str, x: int = 4) -> None:
+            overlay.blit(font.render(text, False, consts.PROFILER_TEXT_COLOR), (x, y))
+        write(f"FRAME p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms")
+        y += line_height
+        write(f"FPS {game_state.clock.get_fps():.0f}  BUDGET {budget:.1f} ms  F4: CSV")
+        y += line_height
+        for phase, mean in self.get_phase_means().items():
+            write(f"{phase} {mean:.2f}")
+            bar_length = min(1.0, mean / budget) * consts.PROFILER_BAR_WIDTH
+            pygame.draw.rect(overlay, consts.PROFILER_PHASE_COLORS[phase], (consts.PROFILER_WIDTH - consts.PROFILER_BAR_WIDTH - 4, y + 3, max(1, bar_length), line_height - 5))
+            y += line_height
+        y += 4
+        self._draw_histogram(overlay, pygame.Rect(4, y, consts.PROFILER_WIDTH - 8, consts.PROFILER_HISTOGRAM_HEIGHT), budget)
+        y += consts.PROFILER_HISTOGRAM_HEIGHT + 4
+        for count_line in count_lines:
+            write(count_line)
+            y += line_height
+        write(f"Stone cache {objects.Stone.rotation_cache.describe()}")
+        y += line_height
+        write(f"Atlas {module_images.atlas.describe()}")
+        y += line_height
+        write(f"Text {module_fonts.text_cache.describe()}")
+        y += line_height
+        write(f"Storage {module_storage.service.describe()}")
+        y += line_height
+        resolution = game_state.resolution
+        write(f"World {resolution.scale:.0%}" + (f"  adaptive, {resolution.changes} changes" if resolution.enabled else ""))
+        y += line_height
+        if self.last_dump is not None:
+            write(f"saved {self.last_dump.name}")
+        return overlay
+
+    def _draw_histogram(self, overlay: pygame.Surface, rect: pygame.Rect, budget: float) -> None:
+        """
+        Verteilung der Frame-Zeiten im Fenster, von 0 bis zum doppelten Budget (der letzte Balken enthält alles darüber).
+        """
+        buckets = [0] * consts.PROFILER_HISTOGRAM_BUCKETS
+        bucket_width = 2 * budget / len(buckets)
+        for sample in self.samples:
+            buckets[min(len(buckets) - 1, int(sample[1] * 1000 / bucket_width))] += 1
+        highest = max(buckets) or 1
+        bar_width = rect.width / len(buckets)
+        for index, count in enumerate(buckets):
+            if not count:
+                continue
+            bar_height = max(1, rect.height * count / highest)
+            color = consts.PROFILER_BUDGET_COLOR if index * bucket_width >= budget else consts.PROFILER_TEXT_COLOR
+            pygame.draw.rect(overlay, color, (rect.x + index * bar_width, rect.bottom - bar_height, max(1, bar_width - 1), bar_height))
+        budget_x = rect.x + rect.width / 2
+        pygame.draw.line(overlay, consts.PROFILER_BUDGET_COLOR, (budget_x, rect.y), (budget_x, rect.bottom))
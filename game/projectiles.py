@@ -0,0 +1,188 @@
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+import pygame
+from . import objects as module_objects
+from . import collider as module_collider
+from . import consts
+
+class ProjectileSystem:
+    """
+    Verwaltet alle Projektile in vorab angelegten NumPy-Arrays (Structure of Arrays).
+    Bewegung, Wachstum und das Entfernen außerhalb des Bildschirms passieren für alle Projektile auf einmal.
+    Die Projectile-Objekte sind nur noch Griffe, die auf ihren Index in den Arrays zeigen.
+    """
+    capacity: int
+    count: int
+    pos: np.ndarray # (capacity, 2)
+    vel: np.ndarray # (capacity, 2)
+    direction: np.ndarray
+    size: np.ndarray # (capacity, 2): Breite und Höhe der gemalten Linie
+    hitbox_size: np.ndarray # (capacity, 2)
+    growth: np.ndarray # Breitenwachstum pro Frame
+    owner: np.ndarray
+    kind: np.ndarray # Index in kinds
+    alive: np.ndarray
+    handles: list[module_objects.Projectile]
+    kinds: list[type[module_objects.Projectile]]
+    kind_ids: dict[type[module_objects.Projectile], int]
+    has_removed: bool
+
+    def __init__(self, capacity: int = consts.PROJECTILE_START_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.direction = np.zeros(capacity)
+        self.size = np.zeros((capacity, 2))
+        self.hitbox_size = np.zeros((capacity, 2))
+        self.growth = np.zeros(capacity)
+        self.owner = np.zeros(capacity, dtype=np.int8)
+        self.kind = np.zeros(capacity, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.handles = []
+        self.kinds = []
+        self.kind_ids = {}
+        self.has_removed = False
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        for name in ("pos", "vel", "direction", "size", "hitbox_size", "growth", "owner", "kind", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((self.capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add_projectile(self, projectile: module_objects.Projectile) -> None:
+        if projectile.system is not None:
+            return
+        if self.count == self.capacity:
+            self._grow()
+        projectile_type = type(projectile)
+        if projectile_type not in self.kind_ids:
+            self.kind_ids[projectile_type] = len(self.kinds)
+            self.kinds.append(projectile_type)
+        index = self.count
+        self.pos[index] = projectile.pos
+        self.vel[index] = projectile.vel
+        self.direction[index] = projectile.direction
+        self.size[index] = (projectile.width, projectile.height)
+        self.hitbox_size[index] = (projectile.hitbox_width, projectile.hitbox_height)
+        self.growth[index] = projectile.growth_rate
+        self.owner[index] = projectile.owner.value
+        self.kind[index] = self.kind_ids[projectile_type]
+        self.alive[index] = True
+        self.handles.append(projectile)
+        projectile.system = self
+        projectile.index = index
+        self.count += 1
+
+    def remove_projectile(self, projectile: module_objects.Projectile) -> None:
+        """
+        Das Projektil wird sofort nicht mehr getroffen, aus den Arrays entfernt wird es aber erst bei sync().
+        """
+        if projectile.system is not self:
+            return
+        self.alive[projectile.index] = False
+        self.has_removed = True
+
+    def remove_all(self) -> None:
+        for index, projectile in enumerate(self.handles):
+            projectile.detach(tuple(self.pos[index].tolist()), tuple(self.vel[index].tolist()))
+        self.handles.clear()
+        self.alive[:self.count] = False
+        self.count = 0
+        self.has_removed = False
+
+    def sync(self) -> None:
+        """
+        Entfernt entfernte Projektile, indem das jeweils letzte Projektil an ihre Stelle geschoben wird.
+        """
+        if not self.has_removed:
+            return
+        self.has_removed = False
+        for index in np.flatnonzero(~self.alive[:self.count])[::-1].tolist():
+            last = self.count - 1
+            self.handles[index].detach(tuple(self.pos[index].tolist()), tuple(self.vel[index].tolist()))
+            if index != last:
+                for array in (self.pos, self.vel, self.direction, self.size, self.hitbox_size, self.growth, self.owner, self.kind, self.alive):
+                    array[index] = array[last]
+                self.handles[index] = self.handles[last]
+                self.handles[index].index = index
+            self.alive[last] = False
+            self.handles.pop()
+            self.count -= 1
+
+    def update(self) -> None:
+        count = self.count
+        if not count:
+            return
+        pos = self.pos[:count]
+        # Wie bisher wird zuerst gewachsen, dann entfernt und trotzdem noch bewegt.
+        self.size[:count, 0] += self.growth[:count]
+        self.hitbox_size[:count, 0] += self.growth[:count]
+        outside = (pos[:, 1] < -consts.PROJECTILE_CULLING_MARGIN) | (pos[:, 1] > consts.SCREEN_HEIGHT + consts.PROJECTILE_CULLING_MARGIN)
+        if outside.any():
+            self.alive[:count] &= ~outside
+            self.has_removed = True
+        pos += self.vel[:count]
+
+    def get_colliding(self, collider: module_collider.Collider, owner: Optional[module_objects.ProjectileOwner] = None) -> list[module_objects.Projectile]:
+        """
+        Gibt alle (noch nicht entfernten) Projektile zurück, die mit dem Collider kollidieren.
+        """
+        count = self.count
+        if not count:
+            return []
+        mask = self.alive[:count].copy()
+        if owner is not None:
+            mask &= self.owner[:count] == owner.value
+        pos_x = self.pos[:count, 0]
+        pos_y = self.pos[:count, 1]
+        width = self.hitbox_size[:count, 0]
+        height = self.hitbox_size[:count, 1]
+        # Schräge Projektile haben eine gedrehte Hitbox (siehe Projectile.get_collider).
+        rotation = -self.direction[:count]
+        straight = rotation == 0
+        if type(collider) is module_collider.BoxCollider:
+            mask &= np.where(
+                straight,
+                module_collider.batch_collide_box_box(collider.pos_x, collider.pos_y, collider.width, collider.height, pos_x, pos_y, width, height)[0],
+                module_collider.batch_collide_box_rotated(collider.pos_x, collider.pos_y, collider.width, collider.height, pos_x, pos_y, width, height, rotation)[0]
+            )
+        elif type(collider) is module_collider.CircleCollider:
+            mask &= np.where(
+                straight,
+                module_collider.batch_collide_circle_box(collider.pos_x, collider.pos_y, collider.radius, pos_x, pos_y, width, height)[0],
+                module_collider.batch_collide_circle_rotated(collider.pos_x, collider.pos_y, collider.radius, pos_x, pos_y, width, height, rotation)[0]
+            )
+        else:
+            return [self.handles[index] for index in np.flatnonzero(mask).tolist() if collider.collides(self.handles[index].collider)]
+        return [self.handles[index] for index in np.flatnonzero(mask).tolist()]
+
+    def draw(self, canvas: module_objects.Canvas, scale: float = 1.0) -> list[pygame.Rect]:
+        """
+        Malt alle Projektile als Linien. Mit scale werden Positionen und Grössen für eine kleinere Fläche umgerechnet.
+        """
+        indices = np.flatnonzero(self.alive[:self.count])
+        if not len(indices):
+            return []
+        pos = self.pos[indices] * scale
+        direction = self.direction[indices]
+        height = self.size[indices, 1] * scale
+        offset = np.column_stack((np.sin(direction) * height, -np.cos(direction) * height)) / 2
+        starts = (pos - offset).tolist()
+        ends = (pos + offset).tolist()
+        widths = (self.size[indices, 0] * scale).astype(int)
+        if scale != 1.0:
+            widths = np.maximum(widths, 1)
+        widths = widths.tolist()
+        colors = [self.kinds[kind].color for kind in self.kind[indices].tolist()]
+        return [pygame.draw.line(canvas, color, start, end, width) for color, start, end, width in zip(colors, starts, ends, widths)]
+
+    def count_by_kind(self) -> dict[type[module_objects.Projectile], int]:
+        counts = np.bincount(self.kind[:self.count][self.alive[:self.count]], minlength=len(self.kinds))
+        return {kind: int(count) for kind, count in zip(self.kinds, counts.tolist()) if count}
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.alive[:self.count]))
@@ -0,0 +1,313 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Optional
+import pygame
+from . import consts
+from .images import Image, SurfaceCache, convert_for_display
+if TYPE_CHECKING:
+    from .objects import Object2D
+    from .background import Background
+
+DrawFunction = Callable[[pygame.Surface], Optional[pygame.Rect]]
+
+scaled_images = SurfaceCache(consts.RENDER_SCALE_CACHE_SIZE) # Verkleinerte Bilder für die dynamische Auflösung
+
+def get_scaled_image(image: Image, scale: float) -> Image:
+    """
+    Das Bild in der Auflösung scale. Es wird nur beim ersten Mal skaliert, die Bilder dürfen also nicht verändert werden.
+    """
+    key = (image, scale)
+    scaled = scaled_images.get(key)
+    if scaled is None:
+        width, height = image.get_size()
+        scaled = scaled_images.put(key, pygame.transform.scale(image, (max(1, round(width * scale)), max(1, round(height * scale)))))
+    return scaled
+
+class RenderQueue:
+    """
+    Nimmt die Malbefehle der Objekte eines Layers entgegen. Aufeinanderfolgende Bilder werden gesammelt und mit einem
+    einzigen Surface.blits gemalt. Andere Befehle (pygame.draw) werden dazwischen ausgeführt, die Reihenfolge bleibt also gleich.
+    Ist scale nicht 1, malt die Queue in eine kleinere Fläche: blit, line und circle rechnen die Positionen und Grössen um,
+    mit draw übergebene Funktionen malen aber unverändert.
+    """
+    canvas: pygame.Surface
+    collect_rects: bool # Ob die bemalten Bereiche gebraucht werden
+    scale: float
+    blit_sequence: list[tuple[Image, tuple[float, float]]]
+    rects: list[Optional[pygame.Rect]]
+
+    def __init__(self, canvas: pygame.Surface, collect_rects: bool = True, scale: float = 1.0):
+        self.canvas = canvas
+        self.collect_rects = collect_rects
+        self.scale = scale
+        self.blit_sequence = []
+        self.rects = []
+
+    def blit(self, image: Image, pos: tuple[float, float]) -> None:
+        scale = self.scale
+        if scale != 1.0:
+            image = get_scaled_image(image, scale)
+            pos = (pos[0] * scale, pos[1] * scale)
+        self.blit_sequence.append((image, pos))
+
+    def draw(self, function: DrawFunction) -> None:
+        """
+        Führt function sofort aus, nachdem die bisher gesammelten Bilder gemalt wurden.
+        """
+        self._blit_pending()
+        rect = function(self.canvas)
+        if self.collect_rects:
+            self.rects.append(rect)
+
+    def line(self, color: tuple[int, int, int], start: tuple[float, float], end: tuple[float, float], width: int) -> None:
+        scale = self.scale
+        self.draw(lambda canvas: pygame.draw.line(canvas, color, (start[0] * scale, start[1] * scale), (end[0] * scale, end[1] * scale), max(1, round(width * scale))))
+
+    def circle(self, color: tuple[int, int, int], center: tuple[float, float], radius: float) -> None:
+        scale = self.scale
+        self.draw(lambda canvas: pygame.draw.circle(canvas, color, (center[0] * scale, center[1] * scale), radius * scale))
+
+    def _blit_pending(self) -> None:
+        if not self.blit_sequence:
+            return
+        if self.collect_rects:
+            self.rects.extend(self.canvas.blits(self.blit_sequence))
+        else:
+            self.canvas.blits(self.blit_sequence, False)
+        self.blit_sequence = []
+
+    def flush(self) -> list[Optional[pygame.Rect]]:
+        """
+        Malt die restlichen Bilder und gibt die bemalten Bereiche seit dem letzten flush zurück.
+        """
+        self._blit_pending()
+        rects = self.rects
+        self.rects = []
+        return rects
+
+def union_rects(rects: list[Optional[pygame.Rect]]) -> Optional[pygame.Rect]:
+    if not rects:
+        return pygame.Rect(0, 0, 0, 0)
+    if None in rects:
+        return None
+    return rects[0].unionall(rects[1:])
+
+class RetainedLayer:
+    """
+    Ein Layer, dessen Objekte in eine eigene Fläche gemalt werden, und zwar nur, nachdem er mit invalidate als ungültig
+    markiert wurde. In jedem Frame wird die Fläche dann mit einem einzigen Surface.blits auf den Canvas kopiert.
+    Für Objekte, die sich selten ändern, wie Punktestand und Leben.
+    """
+    surface: Image
+    rects: list[pygame.Rect] # Die bemalten Bereiche der Fläche
+    valid: bool
+    redraws: int # Wie oft der Layer neu gemalt wurde
+
+    def __init__(self, size: tuple[int, int]):
+        self.surface = convert_for_display(pygame.Surface(size, pygame.SRCALPHA))
+        self.surface.fill((0, 0, 0, 0))
+        self.rects = []
+        self.valid = False
+        self.redraws = 0
+
+    def invalidate(self) -> None:
+        self.valid = False
+
+    def draw(self, canvas: pygame.Surface, objects: Iterable[Object2D]) -> list[pygame.Rect]:
+        """
+        Malt die Fläche auf den Canvas, nachdem sie falls nötig aus objects neu gemalt wurde. Gibt die bemalten Bereiche zurück.
+        """
+        if not self.valid:
+            for rect in self.rects:
+                self.surface.fill((0, 0, 0, 0), rect)
+            queue = RenderQueue(self.surface)
+            for object2d in objects:
+                object2d.render(queue)
+            rects = [self.surface.get_rect() if rect is None else rect for rect in queue.flush()]
+            self.rects = merge_rects([rect for rect in rects if rect.width and rect.height], len(rects)) or []
+            self.valid = True
+            self.redraws += 1
+        canvas.blits([(self.surface, rect, rect) for rect in self.rects], False)
+        return self.rects
+
+class DynamicResolution:
+    """
+    Wählt die Auflösung, in der die Spielwelt gemalt wird, anhand der Frame-Zeiten. Ist der Durchschnitt der letzten
+    RENDER_SCALE_WINDOW Frames über dem Budget, wird die nächstkleinere Stufe aus RENDER_SCALES gewählt, liegt er
+    deutlich darunter, die nächstgrössere. Nach einem Wechsel wird erst wieder über ein volles Fenster gemessen (Hysterese).
+    Für jede kleinere Stufe gibt es eine eigene Fläche, die danach auf den Canvas vergrössert wird.
+    """
+    enabled: bool
+    scales: tuple[float, ...]
+    level: int # Index in scales
+    surfaces: dict[float, pygame.Surface]
+    budget: float # Sekunden pro Frame
+    frame_times: deque[float]
+    changes: int # Wie oft die Auflösung gewechselt hat
+
+    def __init__(self, screen_size: tuple[int, int], fps: int, enabled: bool = False, scales: tuple[float, ...] = consts.RENDER_SCALES):
+        self.enabled = enabled
+        self.scales = scales if enabled else scales[:1]
+        self.level = 0
+        self.surfaces = {
+            scale: convert_for_display(pygame.Surface((round(screen_size[0] * scale), round(screen_size[1] * scale))), alpha=False)
+            for scale in self.scales if scale != 1.0
+        }
+        self.budget = 1 / fps
+        self.frame_times = deque(maxlen=consts.RENDER_SCALE_WINDOW)
+        self.changes = 0
+
+    @property
+    def scale(self) -> float:
+        return self.scales[self.level]
+
+    def add_frame_time(self, seconds: float) -> bool:
+        """
+        Meldet, wie lange der letzte Frame gebraucht hat. Gibt zurück, ob sich die Auflösung dadurch ändert.
+        """
+        self.frame_times.append(seconds)
+        if len(self.frame_times) < consts.RENDER_SCALE_WINDOW:
+            return False
+        mean = sum(self.frame_times) / len(self.frame_times)
+        if mean > self.budget * consts.RENDER_SCALE_DOWN_THRESHOLD and self.level < len(self.scales) - 1:
+            self.level += 1
+        elif mean < self.budget * consts.RENDER_SCALE_UP_THRESHOLD and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.frame_times.clear()
+        self.changes += 1
+        return True
+
+class RendererType(ABC):
+    """
+    Entscheidet, welche Teile des Bildschirms zu Beginn eines Frames gelöscht und am Ende an das Display übergeben werden.
+    Die gemalten Objekte melden dazu mit add, welchen Bereich sie bemalt haben.
+    """
+    tracks_rects: bool = True # Ob add die Bereiche überhaupt braucht
+    @abstractmethod
+    def begin_frame(self, canvas: pygame.Surface, background: Background) -> None:
+        pass
+
+    @abstractmethod
+    def add(self, rect: Optional[pygame.Rect]) -> None:
+        """
+        Meldet einen bemalten Bereich. None bedeutet, dass der Bereich unbekannt ist.
+        """
+        pass
+
+    def add_all(self, rects: Iterable[Optional[pygame.Rect]]) -> None:
+        for rect in rects:
+            self.add(rect)
+
+    @abstractmethod
+    def present(self) -> None:
+        pass
+
+    def invalidate(self) -> None:
+        """
+        Im nächsten Frame wird der ganze Bildschirm neu gemalt.
+        """
+        pass
+
+class FullFrameRenderer(RendererType):
+    """
+    Malt in jedem Frame den ganzen Hintergrund und übergibt den ganzen Bildschirm.
+    """
+    tracks_rects = False
+
+    def begin_frame(self, canvas, background):
+        background.draw(canvas) # Hintergrund wird mit Bild gefüllt
+
+    def add(self, rect):
+        pass
+
+    def add_all(self, rects):
+        pass
+
+    def present(self):
+        pygame.display.update() # Änderungen werden umgesetzt.
+
+class DirtyRectRenderer(RendererType):
+    """
+    Stellt zu Beginn eines Frames nur dort den Hintergrund wieder her, wo im letzten Frame gemalt wurde,
+    und übergibt dem Display nur die alten und neuen bemalten Bereiche. Hat sich der Hintergrund selbst bewegt,
+    wird er ganz neu gemalt und seine veränderten Bereiche werden mitübergeben.
+    Sind es zu viele Bereiche, ist ein Bereich unbekannt oder hat sich der ganze Hintergrund verändert, wird wie bei
+    FullFrameRenderer der ganze Bildschirm übergeben. Sind die bemalten Bereiche bekannt, reicht es im nächsten Frame
+    trotzdem, nur sie wiederherzustellen.
+    """
+    screen_rect: pygame.Rect
+    max_rects: int
+    previous: Optional[list[pygame.Rect]] # Die im letzten Frame bemalten Bereiche, None: unbekannt
+    current: list[pygame.Rect]
+    background_rects: list[pygame.Rect] # Die Bereiche, in denen sich der Hintergrund in diesem Frame verändert hat
+    unknown: bool # Ob in diesem Frame ein unbekannter Bereich bemalt wurde
+    full_frame: bool # Ob in diesem Frame der ganze Bildschirm übergeben wird
+    presents: int
+    full_presents: int # Wie oft der ganze Bildschirm übergeben wurde
+
+    def __init__(self, screen_size: tuple[int, int], max_rects: int = consts.DIRTY_RECT_MAX_RECTS):
+        self.screen_rect = pygame.Rect((0, 0), screen_size)
+        self.max_rects = max_rects
+        self.previous = None
+        self.current = []
+        self.background_rects = []
+        self.unknown = False
+        self.full_frame = True
+        self.presents = 0
+        self.full_presents = 0
+
+    def begin_frame(self, canvas, background):
+        self.current = []
+        self.unknown = False
+        self.full_frame = self.previous is None # Was auf dem Bildschirm ist, ist nicht bekannt.
+        if self.previous is None or background.changed_rects:
+            background.draw(canvas)
+            self.background_rects = background.changed_rects
+        else:
+            background.draw(canvas, self.previous)
+            self.background_rects = []
+
+    def add(self, rect):
+        if self.unknown:
+            return
+        if rect is None:
+            self.unknown = True
+            return
+        if rect.width and rect.height:
+            self.current.append(rect)
+            if len(self.current) > consts.DIRTY_RECT_MERGE_LIMIT:
+                self.unknown = True
+
+    def present(self):
+        rects = None if self.unknown else merge_rects(self.current, self.max_rects)
+        self.presents += 1
+        if self.full_frame or rects is None or self.previous is None or self.screen_rect in self.background_rects:
+            pygame.display.update()
+            self.full_presents += 1
+        else:
+            pygame.display.update(self.previous + self.background_rects + rects)
+        self.previous = rects
+
+    def invalidate(self):
+        self.full_frame = True
+        self.unknown = True # Auch nach dem nächsten present wird noch einmal alles neu gemalt.
+        self.previous = None
+
+def merge_rects(rects: list[pygame.Rect], max_rects: int) -> Optional[list[pygame.Rect]]:
+    """
+    Vereinigt sich überschneidende Bereiche. Gibt None zurück, wenn danach noch mehr als max_rects Bereiche übrig sind.
+    """
+    merged: list[pygame.Rect] = []
+    for rect in rects:
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    if len(merged) > max_rects:
+        return None
+    return merged
@@ -0,0 +1,29 @@
+from __future__ import annotations
+from typing import Optional
+import random
+
+class RandomStreams:
+    """
+    Eigene Zufallsgeneratoren für jedes Teilsystem, alle aus einem einzigen Seed abgeleitet.
+    Mit dem gleichen Seed (und den gleichen Eingaben) läuft ein Spiel genau gleich ab.
+    Weil jedes Teilsystem seinen eigenen Generator hat, verschiebt eine zusätzliche Zufallszahl in einem
+    Teilsystem nicht die Zahlen der anderen.
+    """
+    seed: int
+    stone: random.Random # spawn_stone
+    powerup: random.Random # spawn_powerup
+    enemy: random.Random # create_enemy
+    split: random.Random # Stone.split_stone
+
+    def __init__(self, seed: Optional[int] = None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.stone = self._derive("stone")
+        self.powerup = self._derive("powerup")
+        self.enemy = self._derive("enemy")
+        self.split = self._derive("split")
+
+    def _derive(self, name: str) -> random.Random:
+        # Strings werden unabhängig von PYTHONHASHSEED immer gleich in Seeds umgewandelt.
+        return random.Random(f"{self.seed}:{name}")
@@ -1,25 +1,823 @@
+from __future__ import annotations
 import sys
+import time
+import json
+import os
+import threading
+import statistics
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Awaitable, Callable, Coroutine, Generator
+from dataclasses import dataclass, field, replace
+from functools import partial
 from pathlib import Path
-from asyncio import Queue, run
+from typing import Any, Generic, Optional, TypeVar
 import asyncio
 from enum import Enum
 from pygbag.aio.fetch import RequestHandler
+from . import consts
 if sys.platform == "emscripten":
     from platform import window
 else:
     import requests
-    import threading
+    import requests.adapters
+    from concurrent.futures import ThreadPoolExecutor
     from base64 import urlsafe_b64encode as b64encode
 
-storage: dict[str, str] = {}
-http = RequestHandler()
+T = TypeVar("T")
 
 class HttpTask(Enum):
     READ = 0
     WRITE = 1
-    EXIT = 2
 
-http_tasks: Queue[tuple[HttpTask, str, str]] = Queue()
+@dataclass(slots=True)
+class StorageCommand:
+    task_type: HttpTask
+    key: str
+    queued_at: float = field(default_factory=time.perf_counter)
+
+@dataclass(slots=True, frozen=True)
+class Fetched:
+    data: Optional[str] # None: not modified since the ETag that was sent
+    etag: Optional[str] = None
+
+@dataclass(slots=True, frozen=True)
+class CacheEntry:
+    data: str
+    etag: Optional[str] = None
+    confirmed_at: float = 0.0 # time.time() when the server last confirmed the data, or when it was written locally
+
+class LocalCache:
+    """
+    Keeps the storage data between runs: one file per key in STORAGE_CACHE_PATH, named like in old_save_data,
+    or localStorage in the browser. Each entry is saved as JSON together with its ETag and when it was confirmed.
+    Plain data saved by old_save_data is read as an entry that has to be revalidated.
+    Entries are loaded on first use and only written to disk by persist.
+    """
+    directory: Path
+    entries: dict[str, Optional[CacheEntry]]
+
+    def __init__(self, directory: Path = consts.STORAGE_CACHE_PATH):
+        self.directory = directory
+        self.entries = {}
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if key not in self.entries:
+            self.entries[key] = self._load(key)
+        return self.entries[key]
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self.entries[key] = entry
+
+    @staticmethod
+    def get_ttl(key: str) -> float:
+        return consts.STORAGE_TTLS.get(key, consts.STORAGE_DEFAULT_TTL)
+
+    def is_fresh(self, key: str, entry: CacheEntry) -> bool:
+        return time.time() - entry.confirmed_at < self.get_ttl(key)
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        if sys.platform == "emscripten":
+            text = window.localStorage.getItem(key)
+            if text is None:
+                return None
+        else:
+            try:
+                text = self._get_path(key).read_text()
+            except OSError:
+                return None
+        try:
+            saved = json.loads(text)
+            return CacheEntry(saved["data"], saved.get("etag"), saved.get("confirmed_at", 0.0))
+        except (ValueError, TypeError, KeyError):
+            return CacheEntry(text) # Saved by old_save_data
+
+    def persist(self, key: str) -> None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        text = json.dumps({"data": entry.data, "etag": entry.etag, "confirmed_at": entry.confirmed_at})
+        if sys.platform == "emscripten":
+            window.localStorage.setItem(key, text)
+            return
+        path = self._get_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            temporary = path.with_name(path.name + ".tmp")
+            temporary.write_text(text)
+            os.replace(temporary, path) # A crash never leaves a half written entry.
+        except OSError:
+            pass # The cache is only an optimization.
+
+    def _get_path(self, key: str) -> Path:
+        return self.directory / b64encode(key.encode()).decode()
+
+class WriteJournal:
+    """
+    Append-only log of the writes the server has not acknowledged yet, so that a score saved right before quitting,
+    before a crash or while offline is written on the next start. Every write appends {"seq", "key", "data"},
+    an acknowledgement appends {"done": seq, "key"}, which also covers the older entries of that key.
+    Lines are written immediately, but fsync only happens in sync, which the storage thread calls before every flush and
+    when closing, so all writes of one flush window share one fsync. Once nothing is pending, the file is emptied.
+    In the browser, the journal is kept in localStorage under the name of the file.
+    """
+    path: Path
+    pending: dict[str, tuple[int, str]] # Key -> (seq, data) of its newest write that is not acknowledged yet
+    syncs: int # How often fsync was called
+    _loaded: bool
+    _next_seq: int
+    _file: Optional[int] # File descriptor for appending, None if the journal could not be opened
+    _unsynced: bool
+
+    def __init__(self, path: Path = consts.STORAGE_JOURNAL_PATH):
+        self.path = path
+        self.pending = {}
+        self.syncs = 0
+        self._loaded = False
+        self._next_seq = 0
+        self._file = None
+        self._unsynced = False
+
+    def load(self) -> None:
+        """
+        Reads the entries left by earlier runs and rewrites the journal with only them. Only the first call does anything.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        for line in self._read_text().splitlines():
+            try:
+                record = json.loads(line)
+                key = record["key"]
+                if "done" in record:
+                    if key in self.pending and self.pending[key][0] <= record["done"]:
+                        del self.pending[key]
+                else:
+                    self.pending[key] = (record["seq"], record["data"])
+                    self._next_seq = max(self._next_seq, record["seq"] + 1)
+            except (ValueError, TypeError, KeyError):
+                continue # The last line can be cut off by a crash.
+        self._rewrite()
+
+    def append(self, key: str, data: str) -> int:
+        """
+        Only writes one line, the journal has to be loaded already (see StorageService.use_journal).
+        """
+        seq = self._next_seq
+        self._next_seq += 1
+        self.pending[key] = (seq, data)
+        self._write_line({"seq": seq, "key": key, "data": data})
+        return seq
+
+    def get_seq(self, key: str) -> Optional[int]:
+        entry = self.pending.get(key)
+        return None if entry is None else entry[0]
+
+    def acknowledge(self, key: str, seq: int) -> None:
+        """
+        The server has the write seq of key. Newer writes of the key stay pending.
+        """
+        entry = self.pending.get(key)
+        if entry is None or entry[0] > seq:
+            return
+        del self.pending[key]
+        if self.pending:
+            self._write_line({"done": seq, "key": key})
+        else:
+            self._clear()
+
+    def sync(self) -> None:
+        if not self._unsynced or self._file is None:
+            return
+        self._unsynced = False # Lines appended during fsync are synced next time.
+        try:
+            os.fsync(self._file)
+        except OSError:
+            return
+        self.syncs += 1
+
+    def _read_text(self) -> str:
+        if sys.platform == "emscripten":
+            return window.localStorage.getItem(self.path.name) or ""
+        try:
+            return self.path.read_text()
+        except OSError:
+            return ""
+
+    def _rewrite(self) -> None:
+        text = "".join(json.dumps({"seq": seq, "key": key, "data": data}) + "\n" for key, (seq, data) in self.pending.items())
+        if sys.platform == "emscripten":
+            window.localStorage.setItem(self.path.name, text)
+            return
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            temporary = self.path.with_name(self.path.name + ".tmp")
+            with open(temporary, "w") as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.path)
+            self._file = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        except OSError:
+            self._file = None # Writes still go to the server, they just do not survive quitting.
+
+    def _write_line(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        if sys.platform == "emscripten":
+            window.localStorage.setItem(self.path.name, self._read_text() + line)
+            return
+        if self._file is None:
+            return
+        try:
+            os.write(self._file, line.encode())
+        except OSError:
+            return
+        self._unsynced = True
+
+    def _clear(self) -> None:
+        if sys.platform == "emscripten":
+            window.localStorage.removeItem(self.path.name)
+            return
+        if self._file is None:
+            return
+        try:
+            os.ftruncate(self._file, 0)
+        except OSError:
+            pass
+
+class StorageFuture(Generic[T]):
+    """
+    The result of a storage request. It is completed on the game thread by deliver_completions, once per frame,
+    so its callbacks run between frames and may change the game state. In the browser it can also be awaited.
+    """
+    _done: bool
+    _result: Optional[T]
+    _callbacks: list[Callable[[T], None]]
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._callbacks = []
+
+    def done(self) -> bool:
+        return self._done
+
+    def result(self) -> T:
+        if not self._done:
+            raise asyncio.InvalidStateError("the storage request has not completed yet")
+        return self._result # type: ignore[return-value]
+
+    def add_done_callback(self, callback: Callable[[T], None]) -> None:
+        """
+        callback gets the result. If the future is already done, it is called immediately.
+        """
+        if self._done:
+            callback(self._result) # type: ignore[arg-type]
+        else:
+            self._callbacks.append(callback)
+
+    def _set_result(self, result: T) -> None:
+        self._done = True
+        self._result = result
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(result)
+
+    def __await__(self) -> Generator[Any, None, T]:
+        if not self._done:
+            waiter: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+            self.add_done_callback(lambda result: waiter.done() or waiter.set_result(result))
+            yield from waiter.__await__()
+        return self._result # type: ignore[return-value]
+
+class ChannelFull(Exception):
+    pass
+
+class CommandChannel(Generic[T]):
+    """
+    Bounded queue from any thread (usually the game thread) to the event loop of the storage thread.
+    put may be called from every thread and never needs the event loop, get may only be awaited in one event loop.
+    When the channel is full, put waits at most timeout seconds and then raises ChannelFull (backpressure).
+    After close, get still returns the remaining items and then None, so the consumer can finish without polling.
+    """
+    capacity: int
+    closed: bool
+    _items: deque[T]
+    _lock: threading.Lock
+    _not_full: threading.Condition
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _waiter: Optional[asyncio.Future[None]]
+
+    def __init__(self, capacity: int = consts.STORAGE_CHANNEL_CAPACITY):
+        self.capacity = capacity
+        self.closed = False
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._loop = None
+        self._waiter = None
+
+    def put(self, item: T, timeout: float = 0.0) -> None:
+        with self._not_full:
+            if self.closed:
+                raise ChannelFull("channel is closed")
+            if len(self._items) >= self.capacity:
+                if timeout <= 0 or not self._not_full.wait_for(lambda: len(self._items) < self.capacity or self.closed, timeout):
+                    raise ChannelFull(f"{self.capacity} commands are already waiting")
+                if self.closed:
+                    raise ChannelFull("channel is closed")
+            self._items.append(item)
+            self._wake_consumer()
+
+    async def get(self) -> Optional[T]:
+        while True:
+            with self._lock:
+                if self._items:
+                    item = self._items.popleft()
+                    self._not_full.notify()
+                    return item
+                if self.closed:
+                    return None
+                self._loop = asyncio.get_running_loop()
+                waiter = self._waiter = self._loop.create_future()
+            await waiter
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._wake_consumer()
+            self._not_full.notify_all()
+
+    def _wake_consumer(self) -> None:
+        # Called with the lock held. call_soon_threadsafe also works from the event loop's own thread (browser).
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(_resolve, waiter)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class LatencyTracker:
+    """
+    Response times of the last requests, for the profiler overlay.
+    """
+    samples: deque[float] # Seconds
+    requests: int
+    errors: int
+    last_error: str
+
+    def __init__(self, sample_count: int = consts.STORAGE_LATENCY_SAMPLES):
+        self.samples = deque(maxlen=sample_count)
+        self.requests = 0
+        self.errors = 0
+        self.last_error = ""
+
+    def add(self, seconds: float) -> None:
+        self.requests += 1
+        self.samples.append(seconds)
+
+    def add_error(self, error: BaseException) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+    def get_percentiles(self) -> tuple[float, float]:
+        """
+        p50 and p95 in milliseconds.
+        """
+        if len(self.samples) < 2:
+            latency = self.samples[0] * 1000 if self.samples else 0.0
+            return (latency, latency)
+        cuts = statistics.quantiles([sample * 1000 for sample in self.samples], n=20, method="inclusive")
+        return (cuts[9], cuts[18])
+
+    def describe(self) -> str:
+        p50, p95 = self.get_percentiles()
+        return f"p50 {p50:.0f} p95 {p95:.0f} ms  {self.requests} req {self.errors} err"
+
+class StorageBackend(ABC):
+    """
+    Reads and writes keys of the remote storage. The methods are awaited on the storage event loop.
+    Backends with supports_batch can also read or write several keys with one request.
+    """
+    supports_batch: bool = False
+
+    @abstractmethod
+    async def read(self, key: str, etag: Optional[str] = None) -> Fetched:
+        """
+        With an etag, the backend may answer Fetched(None) if the data has not changed since.
+        """
+        pass
+
+    @abstractmethod
+    async def write(self, key: str, data: str) -> None:
+        pass
+
+    async def read_many(self, keys: list[str]) -> dict[str, str]:
+        raise NotImplementedError
+
+    async def write_many(self, items: dict[str, str]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class HttpStorageBackend(StorageBackend):
+    """
+    Desktop backend: one requests.Session, so connections are kept alive and reused (up to pool_size at once).
+    requests blocks, so the requests run in an executor with pool_size threads and the event loop keeps running.
+    Each thread takes connections from the session's pool; a request that hangs ends after timeout seconds.
+    Reads send If-None-Match, so unchanged data is answered with 304 and not downloaded again.
+    With a batch_url, several keys are sent as JSON in one POST: {"read": [keys]} answers {key: data}, {"write": {key: data}}.
+    """
+    base_url: str
+    batch_url: Optional[str]
+    timeout: float
+    session: requests.Session
+    executor: ThreadPoolExecutor
+
+    def __init__(
+        self,
+        base_url: str = consts.STORAGE_URL,
+        pool_size: int = consts.STORAGE_POOL_SIZE,
+        timeout: float = consts.STORAGE_TIMEOUT,
+        batch_url: Optional[str] = consts.STORAGE_BATCH_URL
+        ):
+        self.base_url = base_url
+        self.batch_url = batch_url
+        self.supports_batch = batch_url is not None
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="storage-http")
+
+    def get_url(self, key: str) -> str:
+        return f"{self.base_url}{key}/"
+
+    async def _request(self, method: Callable[..., requests.Response], *args, **kwargs) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, partial(method, *args, timeout=self.timeout, **kwargs))
+        response.raise_for_status()
+        return response
+
+    async def read(self, key, etag=None):
+        response = await self._request(self.session.get, self.get_url(key), headers={"If-None-Match": etag} if etag else None)
+        if response.status_code == 304:
+            return Fetched(None, etag)
+        return Fetched(response.text, response.headers.get("ETag"))
+
+    async def write(self, key, data):
+        await self._request(self.session.post, self.get_url(key), data=data)
+
+    async def read_many(self, keys):
+        return (await self._request(self.session.post, self.batch_url, json={"read": keys})).json()
+
+    async def write_many(self, items):
+        await self._request(self.session.post, self.batch_url, json={"write": items})
+
+    async def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True) # Requests that have not started yet are dropped.
+        self.session.close()
+
+class BrowserStorageBackend(StorageBackend):
+    """
+    Browser backend: pygbag's fetch, the browser keeps its own connection pool.
+    RequestHandler.get takes no headers and only returns the body, so reads cannot send If-None-Match and never see
+    a 304 or the ETag. Every read downloads the data again; in the browser only the TTLs (STORAGE_TTLS) save requests.
+    """
+    base_url: str
+    http: RequestHandler
+
+    def __init__(self, base_url: str = consts.STORAGE_URL):
+        self.base_url = base_url
+        self.http = RequestHandler()
+
+    async def read(self, key, etag=None):
+        return Fetched(await self.http.get(f"{self.base_url}{key}/")) # No ETag, so etag is always None here.
+
+    async def write(self, key, data):
+        await self.http.post(f"{self.base_url}{key}/", data=data)
+
+def create_backend() -> StorageBackend:
+    if sys.platform == "emscripten":
+        return BrowserStorageBackend()
+    return HttpStorageBackend()
+
+class StorageService:
+    """
+    Talks to the remote storage on the storage event loop (see execute_http_tasks), the game thread only calls read and write.
+    write only remembers the latest data of a key. The first write of a key sends a command, and flush_window seconds later
+    all remembered keys are written together, so repeated writes within the window become one request.
+    read sends a command only if no read of that key is already on its way (single-flight), all reads waiting in the channel
+    are sent together. With a backend that supports_batch, these groups become one request each.
+    cache persists the data between runs. read never waits for the network: it returns the cached data, even if it is older
+    than its TTL, and only then revalidates it in the background with its ETag (stale-while-revalidate).
+    Read results are put into cache, unless the key has newer data that is not written yet.
+    read_async and write_async return a StorageFuture instead. It gets the data once the read completed (or the cached data
+    if it is fresh or the request failed), or whether the write was acknowledged. The storage thread only appends finished
+    futures to completions, the game thread completes at most STORAGE_COMPLETIONS_PER_FRAME of them per deliver_completions.
+    With a journal (see use_journal), every write is also appended to it and marked done once the server acknowledged it.
+    run replays what earlier runs left in the journal, and close() then only syncs the journal and stops at once:
+    whatever was not written yet is written on the next start. Without a journal, close() lets the service write
+    the remembered data and finish the requests already sent, and then stop.
+    """
+    channel: CommandChannel[StorageCommand]
+    cache: LocalCache
+    latency: LatencyTracker
+    queue_wait: LatencyTracker # Time commands spent in the channel
+    dropped: int # Commands that did not fit into the channel
+    coalesced: int # Writes that replaced data that was not written yet
+    shared_reads: int # Reads that joined a read already on its way
+    backend_factory: Callable[[], StorageBackend]
+    backend: Optional[StorageBackend]
+    concurrency: int
+    flush_window: float
+    revalidated: int # Reads answered with 304 Not Modified
+    completions: deque[tuple[StorageFuture[Any], Any]] # Filled by the storage thread, emptied by deliver_completions
+    journal: Optional[WriteJournal]
+    replayed: int # Writes replayed from the journal
+    _lock: threading.Lock # Protects cache and the sets below, they are used by both threads.
+    _pending_writes: dict[str, str]
+    _writing: set[str]
+    _reading: set[str]
+    _read_waiters: dict[str, list[StorageFuture[str]]]
+    _write_waiters: dict[str, list[StorageFuture[bool]]]
+    _flush_scheduled: bool
+    _closing: Optional[asyncio.Event]
+
+    def __init__(
+        self,
+        backend_factory: Callable[[], StorageBackend] = create_backend,
+        cache: Optional[LocalCache] = None,
+        capacity: int = consts.STORAGE_CHANNEL_CAPACITY,
+        concurrency: int = consts.STORAGE_POOL_SIZE,
+        flush_window: float = consts.STORAGE_FLUSH_WINDOW
+        ):
+        self.channel = CommandChannel(capacity)
+        self.cache = LocalCache() if cache is None else cache
+        self.latency = LatencyTracker()
+        self.queue_wait = LatencyTracker()
+        self.dropped = 0
+        self.coalesced = 0
+        self.shared_reads = 0
+        self.revalidated = 0
+        self.completions = deque()
+        self.journal = None
+        self.replayed = 0
+        self.backend_factory = backend_factory
+        self.backend = None
+        self.concurrency = concurrency
+        self.flush_window = flush_window
+        self._lock = threading.Lock()
+        self._pending_writes = {}
+        self._writing = set()
+        self._reading = set()
+        self._read_waiters = {}
+        self._write_waiters = {}
+        self._flush_scheduled = False
+        self._closing = None
+
+    def send(self, command: StorageCommand, timeout: float = 0.0) -> bool:
+        """
+        Returns False if the channel stayed full for timeout seconds (the command is dropped) or the service was closed.
+        """
+        try:
+            self.channel.put(command, timeout)
+        except ChannelFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def use_journal(self, journal: WriteJournal) -> None:
+        """
+        Writes from now on survive quitting, crashes and network errors. Call it before the game starts: the journal is read
+        and compacted here (with an fsync), so the game thread only appends lines to it later.
+        """
+        journal.load()
+        with self._lock:
+            self.journal = journal
+
+    def write(self, key: str, data: str) -> None:
+        self._write(key, data, None)
+
+    def write_async(self, key: str, data: str) -> StorageFuture[bool]:
+        future: StorageFuture[bool] = StorageFuture()
+        self._write(key, data, future)
+        return future
+
+    def _write(self, key: str, data: str, waiter: Optional[StorageFuture[bool]]) -> None:
+        with self._lock:
+            self.cache.set(key, CacheEntry(data, None, time.time()))
+            if self.journal is not None:
+                self.journal.append(key, data)
+            if waiter is not None:
+                self._write_waiters.setdefault(key, []).append(waiter)
+            if key in self._pending_writes:
+                self._pending_writes[key] = data
+                self.coalesced += 1
+                return
+            self._pending_writes[key] = data
+            # Sent with the lock held (put does not wait with timeout 0), so no flush takes the key before it is removed again.
+            # A dropped write must not stay pending, later writes would be coalesced into it and never sent.
+            # The next write to the key sends the data again (with a journal it is also replayed on the next start).
+            if not self.send(StorageCommand(HttpTask.WRITE, key)):
+                del self._pending_writes[key]
+                self.completions.extend((future, False) for future in self._write_waiters.pop(key, []))
+
+    def read(self, key: str) -> str:
+        return self._read_cached(key, None)
+
+    def read_async(self, key: str) -> StorageFuture[str]:
+        future: StorageFuture[str] = StorageFuture()
+        self._read_cached(key, future)
+        return future
+
+    def _read_cached(self, key: str, waiter: Optional[StorageFuture[str]]) -> str:
+        with self._lock:
+            entry = self.cache.get(key)
+            data = "" if entry is None else entry.data
+            if entry is not None and self.cache.is_fresh(key, entry):
+                if waiter is not None:
+                    self.completions.append((waiter, data))
+                return data
+            if waiter is not None:
+                self._read_waiters.setdefault(key, []).append(waiter)
+            if key in self._reading:
+                self.shared_reads += 1
+                return data
+            self._reading.add(key)
+        if not self.send(StorageCommand(HttpTask.READ, key)):
+            with self._lock:
+                self._reading.discard(key)
+                self.completions.extend((future, data) for future in self._read_waiters.pop(key, []))
+        return data
+
+    def deliver_completions(self, limit: int = consts.STORAGE_COMPLETIONS_PER_FRAME) -> int:
+        """
+        Completes finished futures on the calling (game) thread. The rest waits for the next call.
+        """
+        delivered = 0
+        while delivered < limit and self.completions:
+            future, result = self.completions.popleft()
+            future._set_result(result)
+            delivered += 1
+        return delivered
+
+    def close(self) -> None:
+        self.channel.close()
+
+    async def run(self) -> None:
+        self.backend = backend = self.backend_factory()
+        slots = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock() # Flushes run one after another, so the writes of a key stay in order.
+        self._closing = asyncio.Event()
+        in_flight: set[asyncio.Task[None]] = set()
+        def start(coroutine: Coroutine[Any, Any, None]) -> None:
+            task = asyncio.create_task(coroutine)
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        try:
+            if self._replay():
+                self._flush_scheduled = True
+                start(self._flush_later(backend, slots, write_lock))
+            while (command := await self.channel.get()) is not None:
+                commands = [command]
+                while len(self.channel) and (command := await self.channel.get()) is not None:
+                    commands.append(command) # Everything that is already waiting is handled together.
+                now = time.perf_counter()
+                read_keys = []
+                for command in commands:
+                    self.queue_wait.add(now - command.queued_at)
+                    if command.task_type is HttpTask.READ and command.key not in read_keys:
+                        read_keys.append(command.key)
+                if read_keys:
+                    start(self._read(backend, read_keys, slots))
+                if not self._flush_scheduled and any(command.task_type is HttpTask.WRITE for command in commands):
+                    self._flush_scheduled = True
+                    start(self._flush_later(backend, slots, write_lock))
+            self._closing.set()
+            if self.journal is not None:
+                self.journal.sync() # Everything is on disk now, the network is not waited for.
+                for task in in_flight:
+                    task.cancel()
+            else:
+                await self._flush(backend, slots, write_lock)
+            while in_flight:
+                await asyncio.wait(set(in_flight))
+        finally:
+            await backend.close()
+
+    def _replay(self) -> bool:
+        """
+        Adds the writes left in the journal to the pending writes, unless the game already wrote the key again.
+        Returns whether there was something to replay.
+        """
+        if self.journal is None:
+            return False
+        with self._lock:
+            now = time.time()
+            replayed = [key for key in self.journal.pending if key not in self._pending_writes]
+            for key in replayed:
+                self._pending_writes[key] = self.journal.pending[key][1]
+                self.cache.set(key, CacheEntry(self._pending_writes[key], None, now))
+            self.replayed += len(replayed)
+            return bool(replayed)
+
+    async def _timed(self, request: Awaitable[T], slots: asyncio.Semaphore) -> tuple[bool, Optional[T]]:
+        """
+        Awaits one request and records its latency. Returns whether it succeeded and its result.
+        """
+        async with slots:
+            start = time.perf_counter()
+            try:
+                result = await request
+            except Exception as error: # The game keeps running with the cached data.
+                self.latency.add_error(error)
+                return (False, None)
+            self.latency.add(time.perf_counter() - start)
+            return (True, result)
+
+    async def _read(self, backend: StorageBackend, keys: list[str], slots: asyncio.Semaphore) -> None:
+        if backend.supports_batch and len(keys) > 1:
+            succeeded, values = await self._timed(backend.read_many(keys), slots)
+            results = {key: Fetched(value) for key, value in values.items()} if succeeded and values is not None else {}
+        else:
+            with self._lock:
+                entries = [self.cache.get(key) for key in keys]
+            etags = [None if entry is None else entry.etag for entry in entries]
+            outcomes = await asyncio.gather(*(self._timed(backend.read(key, etag), slots) for key, etag in zip(keys, etags)))
+            results = {key: fetched for key, (succeeded, fetched) in zip(keys, outcomes) if succeeded and fetched is not None}
+        now = time.time()
+        updated = []
+        with self._lock:
+            self._reading.difference_update(keys)
+            for key, fetched in results.items():
+                if key in self._pending_writes or key in self._writing:
+                    continue
+                entry = self.cache.get(key)
+                if fetched.data is None and entry is not None:
+                    self.revalidated += 1
+                    self.cache.set(key, replace(entry, confirmed_at=now))
+                elif fetched.data is not None:
+                    self.cache.set(key, CacheEntry(fetched.data, fetched.etag, now))
+                else:
+                    continue
+                updated.append(key)
+            for key in keys:
+                waiters = self._read_waiters.pop(key, [])
+                if waiters:
+                    entry = self.cache.get(key)
+                    data = "" if entry is None else entry.data
+                    self.completions.extend((future, data) for future in waiters)
+        for key in updated:
+            self.cache.persist(key)
+
+    async def _flush_later(self, backend: StorageBackend, slots: asyncio.Semaphore, write_lock: asyncio.Lock) -> None:
+        assert self._closing is not None
+        try:
+            await asyncio.wait_for(self._closing.wait(), self.flush_window)
+        except TimeoutError:
+            pass
+        await self._flush(backend, slots, write_lock)
+
+    async def _flush(self, backend: StorageBackend, slots: asyncio.Semaphore, write_lock: asyncio.Lock) -> None:
+        async with write_lock:
+            with self._lock:
+                items, self._pending_writes = self._pending_writes, {}
+                self._writing = set(items)
+                waiters = {key: self._write_waiters.pop(key) for key in items if key in self._write_waiters}
+                seqs = {key: self.journal.get_seq(key) for key in items} if self.journal is not None else {}
+            self._flush_scheduled = False
+            if self.journal is not None:
+                self.journal.sync() # One fsync for all writes of the flush window
+            for key in items:
+                self.cache.persist(key)
+            if backend.supports_batch and len(items) > 1:
+                succeeded, _ = await self._timed(backend.write_many(items), slots)
+                results = dict.fromkeys(items, succeeded)
+            else:
+                outcomes = await asyncio.gather(*(self._timed(backend.write(key, data), slots) for key, data in items.items()))
+                results = {key: succeeded for key, (succeeded, _) in zip(items, outcomes)}
+            with self._lock:
+                self._writing = set()
+                if self.journal is not None:
+                    for key, seq in seqs.items():
+                        if results[key] and seq is not None:
+                            self.journal.acknowledge(key, seq)
+                for key, futures in waiters.items():
+                    self.completions.extend((future, results[key]) for future in futures)
+
+    def describe(self) -> str:
+        journaled = "" if self.journal is None else f" {len(self.journal.pending)} journaled"
+        return f"{self.latency.describe()}  {len(self.channel)} queued {self.coalesced} coalesced {self.shared_reads} shared {self.revalidated} not modified{journaled}"
+
+service = StorageService()
 
 def run_async_in_thread(coro):
     def runner():
@@ -28,45 +826,31 @@ def run_async_in_thread(coro):
         loop.run_until_complete(coro)
         loop.close()
 
-    thread = threading.Thread(target=runner)
+    thread = threading.Thread(target=runner, name="storage")
     thread.start()
     return thread
 
-async def execute_http_tasks() -> None:
-    while True:
-        try:
-            async with asyncio.timeout(1):
-                task_type, key, data = await http_tasks.get()
-        except TimeoutError:
-            continue
-        if task_type is HttpTask.READ:
-            storage[key] = await aread_data(key)
-        elif task_type is HttpTask.WRITE:
-            storage[key] = data
-            await asave_data(key, data)
-        else:
-            break
-
-async def asave_data(key: str, data: str) -> None:
-    if sys.platform != "emscripten":
-        requests.post(f"https://tlds1.warp.thecommcraft.de/storage/file/{key}/", data=data, timeout=10)
-        return
-    await http.post(f"https://tlds1.warp.thecommcraft.de/storage/file/{key}/", data=data)
-    
-async def aread_data(key: str) -> str:
-    if sys.platform != "emscripten":
-        return requests.get(f"https://tlds1.warp.thecommcraft.de/storage/file/{key}/", timeout=10).text
-    return await http.get(f"https://tlds1.warp.thecommcraft.de/storage/file/{key}/")
+def execute_http_tasks():
+    service.use_journal(WriteJournal()) # Only the real game keeps a journal, headless runs never write to the server.
+    return service.run()
 
 def exit_executor():
-    http_tasks.put_nowait((HttpTask.EXIT, "", ""))
+    service.close() # The storage thread syncs the journal and stops, unsent writes are replayed on the next start.
 
 def save_data(key: str, data: str) -> None:
-    http_tasks.put_nowait((HttpTask.WRITE, key, data))
+    service.write(key, data)
 
 def read_data(key: str) -> str:
-    http_tasks.put_nowait((HttpTask.READ, key, ""))
-    return storage.get(key) or ""
+    return service.read(key)
+
+def save_data_async(key: str, data: str) -> StorageFuture[bool]:
+    return service.write_async(key, data)
+
+def read_data_async(key: str) -> StorageFuture[str]:
+    return service.read_async(key)
+
+def deliver_completions() -> int:
+    return service.deliver_completions()
 
 def old_save_data(key: str, data: str) -> None:
     if sys.platform == "emscripten":
@@ -77,7 +861,7 @@ def old_save_data(key: str, data: str) -> None:
             "storage" /
             b64encode(key.encode()).decode() # This way, any string can be accepted. ("/" and others won't cause problems.)
         ).write_text(data)
-        
+
 def old_read_data(key: str) -> str:
     if sys.platform == "emscripten":
         return window.localStorage.getItem(key) or "" # Return "" if nothing is stored
@@ -85,4 +869,4 @@ def old_read_data(key: str) -> str:
         try:
             return (Path(__file__).parent / "storage" / b64encode(key.encode()).decode()).read_text()
         except Exception:
-            return ""
\ No newline at end of file
+            return ""
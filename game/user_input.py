@@ -1,6 +1,11 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
 from enum import Enum
+from os import PathLike
+from typing import IO, Any, Optional
+import gzip
+import json
 import pygame
 
 class MouseButton(Enum):
@@ -16,6 +21,8 @@ class UserInputType(ABC):
     """
     Used for user input.
     """
+    checks_state: bool = False # Ob check_state() regelmäßig aufgerufen werden soll.
+    
     @abstractmethod
     def get_key_pressed(self, key: KeyboardKey) -> bool:
         """
@@ -65,6 +72,17 @@ class UserInputType(ABC):
     
     def get_key_down_now(self, key: KeyboardKey) -> bool:
         return self.get_key_changed(key) and self.get_key_pressed(key)
+    
+    def check_state(self, tick: int, checksum: str) -> None:
+        """
+        Bekommt regelmäßig eine Prüfsumme des Spielzustands, falls checks_state gesetzt ist.
+        Aufnahme und Wiedergabe finden damit Abweichungen der Simulation.
+        """
+    
+    def close(self) -> None:
+        """
+        Wird aufgerufen, wenn das Spiel beendet ist.
+        """
 
 class UserInput(UserInputType):
     changed: set[KeyboardKey | MouseButton]
@@ -98,6 +116,260 @@ class UserInput(UserInputType):
     def process_tick(self):
         self.changed.clear()
 
+class BotUserInput(UserInputType):
+    """
+    Simulierter Spieler für Läufe ohne Fenster: Er schießt dauerhaft, fliegt abwechselnd nach links und rechts
+    und drückt regelmäßig Enter, damit nach einem Game Over neu gestartet wird.
+    """
+    tick: int
+    switch_interval: int # Nach so vielen Ticks wechselt die Flugrichtung.
+    restart_interval: int # Alle so vielen Ticks wird Enter gedrückt.
+    def __init__(self, switch_interval: int = 100, restart_interval: int = 200):
+        self.tick = 0
+        self.switch_interval = switch_interval
+        self.restart_interval = restart_interval
+    
+    def get_key_pressed(self, key):
+        if key in (KeyboardKey.SPACE, KeyboardKey.RETURN):
+            return True
+        moving_left = (self.tick // self.switch_interval) % 2 == 1
+        return key is (KeyboardKey.a if moving_left else KeyboardKey.d)
+    
+    def get_key_changed(self, key):
+        if key is KeyboardKey.RETURN:
+            return self.tick % self.restart_interval == 0
+        if key in (KeyboardKey.a, KeyboardKey.d):
+            return self.tick % self.switch_interval == 0
+        return False
+    
+    def get_mouse_down(self, button = MouseButton.RIGHT):
+        return False
+    
+    def get_mouse_changed(self, button = MouseButton.RIGHT):
+        return False
+    
+    def get_mouse_pos(self):
+        return (0, 0)
+    
+    def get_mouse_movement(self):
+        return (0, 0)
+    
+    def process_event(self, event):
+        pass
+    
+    def process_tick(self):
+        self.tick += 1
+
+@dataclass(frozen=True)
+class InputSnapshot:
+    """
+    Der Eingabezustand in einem Tick. Tasten und Maustasten werden über ihre Enum-Werte gespeichert.
+    """
+    pressed: frozenset[int] = field(default=frozenset())
+    changed: frozenset[int] = field(default=frozenset())
+    mouse_down: frozenset[int] = field(default=frozenset())
+    mouse_changed: frozenset[int] = field(default=frozenset())
+    mouse_pos: tuple[int, int] = field(default=(0, 0))
+    mouse_movement: tuple[int, int] = field(default=(0, 0))
+    
+    def to_json(self) -> dict[str, Any]:
+        data: dict[str, Any] = {}
+        for name, values in (("k", self.pressed), ("c", self.changed), ("b", self.mouse_down), ("bc", self.mouse_changed)):
+            if values:
+                data[name] = sorted(values)
+        if self.mouse_pos != (0, 0):
+            data["m"] = list(self.mouse_pos)
+        if self.mouse_movement != (0, 0):
+            data["r"] = list(self.mouse_movement)
+        return data
+    
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> InputSnapshot:
+        return cls(
+            frozenset(data.get("k", ())), frozenset(data.get("c", ())),
+            frozenset(data.get("b", ())), frozenset(data.get("bc", ())),
+            tuple(data.get("m", (0, 0))), tuple(data.get("r", (0, 0)))
+        )
+
+RECORDING_VERSION = 1
+
+class RecordingUserInput(UserInputType):
+    """
+    Leitet alle Abfragen an eine andere Eingabe weiter und schreibt die Antworten pro Tick in eine Datei
+    (gzip, eine JSON-Zeile pro Tick, in dem sich etwas ändert). Mit ReplayUserInput kann die Sitzung
+    zusammen mit dem Seed Frame für Frame wiederholt werden.
+    Gespeichert werden nur Tasten, nach denen das Spiel auch fragt. Nicht abgefragte Tasten behalten ihren letzten Wert.
+    """
+    checks_state = True
+    inner: UserInputType
+    file: IO[str]
+    tick: int
+    snapshot: InputSnapshot # Zustand des aktuellen Ticks
+    written: InputSnapshot # Zuletzt geschriebener Zustand
+    
+    def __init__(self, inner: UserInputType, path: str | PathLike[str], seed: int):
+        self.inner = inner
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.tick = 0
+        self.snapshot = InputSnapshot()
+        self.written = InputSnapshot()
+        self._write({"version": RECORDING_VERSION, "seed": seed})
+    
+    def _write(self, data: dict[str, Any]) -> None:
+        self.file.write(json.dumps(data, separators=(",", ":")) + "\n")
+    
+    def _flush_tick(self) -> None:
+        if self.snapshot != self.written:
+            self._write({"t": self.tick, **self.snapshot.to_json()})
+            self.written = self.snapshot
+    
+    @staticmethod
+    def _with(values: frozenset[int], value: int, included: bool) -> frozenset[int]:
+        if (value in values) == included:
+            return values
+        return values | {value} if included else values - {value}
+    
+    def get_key_pressed(self, key):
+        pressed = bool(self.inner.get_key_pressed(key))
+        self.snapshot = replace(self.snapshot, pressed=self._with(self.snapshot.pressed, key.value, pressed))
+        return pressed
+    
+    def get_key_changed(self, key):
+        changed = bool(self.inner.get_key_changed(key))
+        self.snapshot = replace(self.snapshot, changed=self._with(self.snapshot.changed, key.value, changed))
+        return changed
+    
+    def get_mouse_down(self, button = MouseButton.RIGHT):
+        down = bool(self.inner.get_mouse_down(button))
+        self.snapshot = replace(self.snapshot, mouse_down=self._with(self.snapshot.mouse_down, button.value, down))
+        return down
+    
+    def get_mouse_changed(self, button = MouseButton.RIGHT):
+        changed = bool(self.inner.get_mouse_changed(button))
+        self.snapshot = replace(self.snapshot, mouse_changed=self._with(self.snapshot.mouse_changed, button.value, changed))
+        return changed
+    
+    def get_mouse_pos(self):
+        pos = tuple(self.inner.get_mouse_pos())
+        self.snapshot = replace(self.snapshot, mouse_pos=pos)
+        return pos
+    
+    def get_mouse_movement(self):
+        movement = tuple(self.inner.get_mouse_movement())
+        self.snapshot = replace(self.snapshot, mouse_movement=movement)
+        return movement
+    
+    def process_event(self, event):
+        self.inner.process_event(event)
+    
+    def process_tick(self):
+        self._flush_tick()
+        self.inner.process_tick()
+        self.tick += 1
+    
+    def check_state(self, tick, checksum):
+        self._write({"t": tick, "s": checksum})
+    
+    def close(self):
+        if self.file.closed:
+            return
+        self._flush_tick()
+        self._write({"end": self.tick})
+        self.file.close()
+        self.inner.close()
+
+class ReplayDivergenceError(Exception):
+    """
+    Der wiederholte Spielzustand weicht von dem der Aufnahme ab.
+    """
+    tick: int
+    def __init__(self, tick: int, expected: str, actual: str):
+        super().__init__(f"Replay diverged at tick {tick}: expected checksum {expected}, got {actual}")
+        self.tick = tick
+
+class ReplayUserInput(UserInputType):
+    """
+    Spielt eine Aufnahme von RecordingUserInput ab. Das Spiel muss dafür mit dem gleichen Seed (seed) gestartet werden.
+    Bei strict wird beim ersten Unterschied der Prüfsummen ein ReplayDivergenceError geworfen,
+    sonst wird nur der erste abweichende Tick in diverged_at gespeichert.
+    """
+    checks_state = True
+    seed: int
+    end_tick: int # Letzter aufgenommener Tick
+    snapshots: dict[int, InputSnapshot]
+    checksums: dict[int, str]
+    tick: int
+    snapshot: InputSnapshot
+    strict: bool
+    diverged_at: Optional[int]
+    
+    def __init__(self, path: str | PathLike[str], strict: bool = True):
+        self.snapshots = {}
+        self.checksums = {}
+        self.end_tick = 0
+        self.tick = 0
+        self.snapshot = InputSnapshot()
+        self.strict = strict
+        self.diverged_at = None
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != RECORDING_VERSION:
+                raise ValueError(f"Unsupported recording version: {header.get('version')}")
+            self.seed = header["seed"]
+            try:
+                for line in file:
+                    self._read_line(json.loads(line))
+            except EOFError:
+                pass # Aufnahme wurde nicht geschlossen (z.B. Absturz), alles bis dahin ist trotzdem gültig.
+    
+    def _read_line(self, data: dict[str, Any]) -> None:
+        if "end" in data:
+            self.end_tick = data["end"]
+            return
+        tick = data.pop("t")
+        self.end_tick = max(self.end_tick, tick)
+        if "s" in data:
+            self.checksums[tick] = data["s"]
+        else:
+            self.snapshots[tick] = InputSnapshot.from_json(data)
+    
+    @property
+    def finished(self) -> bool:
+        return self.tick >= self.end_tick
+    
+    def get_key_pressed(self, key):
+        return key.value in self.snapshot.pressed
+    
+    def get_key_changed(self, key):
+        return key.value in self.snapshot.changed
+    
+    def get_mouse_down(self, button = MouseButton.RIGHT):
+        return button.value in self.snapshot.mouse_down
+    
+    def get_mouse_changed(self, button = MouseButton.RIGHT):
+        return button.value in self.snapshot.mouse_changed
+    
+    def get_mouse_pos(self):
+        return self.snapshot.mouse_pos
+    
+    def get_mouse_movement(self):
+        return self.snapshot.mouse_movement
+    
+    def process_event(self, event):
+        pass
+    
+    def process_tick(self):
+        self.tick += 1
+        self.snapshot = self.snapshots.get(self.tick, self.snapshot)
+    
+    def check_state(self, tick, checksum):
+        expected = self.checksums.get(tick)
+        if expected is None or expected == checksum or self.diverged_at is not None:
+            return
+        self.diverged_at = tick
+        if self.strict:
+            raise ReplayDivergenceError(tick, expected, checksum)
+
 class KeyboardKey(Enum):
     BACKSPACE = pygame.K_BACKSPACE
     TAB = pygame.K_TAB
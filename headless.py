@@ -0,0 +1,40 @@
+import argparse
+import random
+from game import consts
+from game.headless import create_headless_state, run_frames
+from game.renderer import DirtyRectRenderer
+from game.user_input import BotUserInput, RecordingUserInput, ReplayUserInput, UserInputType
+
+parser = argparse.ArgumentParser(description="Runs Andromeda Clash without a window, as fast as possible.")
+parser.add_argument("frames", type=int, nargs="?", default=None, help="number of frames to simulate (default: 10 minutes of game time, or the whole replay)")
+parser.add_argument("--render", action="store_true", help="still draw every frame (into the dummy display)")
+parser.add_argument("--dirty-rects", action="store_true", help="with --render: use the dirty-rect renderer")
+parser.add_argument("--seed", type=int, default=None, help="seed for all random number streams")
+parser.add_argument("--record", metavar="PATH", help="record the (simulated) input to this file")
+parser.add_argument("--replay", metavar="PATH", help="replay a recording instead of using the simulated player")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    frames = args.frames if args.frames is not None else 10 * 60 * consts.SECOND
+    user_input: UserInputType
+    if args.replay:
+        user_input = ReplayUserInput(args.replay)
+        seed = user_input.seed
+        frames = args.frames if args.frames is not None else user_input.end_tick
+    else:
+        user_input = BotUserInput()
+    if args.record:
+        user_input = RecordingUserInput(user_input, args.record, seed)
+    state = create_headless_state(user_input, args.render, seed, args.dirty_rects)
+    try:
+        result = run_frames(state, frames)
+    finally:
+        user_input.close()
+    print(
+        f"{result.frames} frames ({result.game_seconds:.1f} s game time) in {result.seconds:.2f} s: "
+        f"{result.ticks_per_second:.0f} ticks/s, {result.speedup:.1f}x real time, score {result.score}, seed {seed}"
+    )
+    if isinstance(state.renderer, DirtyRectRenderer):
+        print(f"{state.renderer.full_presents} of {state.renderer.presents} frames presented the whole screen")
@@ -1,14 +1,30 @@
+import argparse
 import asyncio
+import random
+import sys
 import pygame
 from game.game_state import AndromedaClashGameState, GAME_SIZE
-from game.user_input import UserInput
+from game import consts
+from game.user_input import UserInput, UserInputType, RecordingUserInput
+
+parser = argparse.ArgumentParser(description="Andromeda Clash")
+parser.add_argument("--seed", type=int, default=None, help="seed for all random number streams")
+parser.add_argument("--record", metavar="PATH", help="record the input of this session (replay it with headless.py --replay)")
+parser.add_argument("--dirty-rects", action="store_true", help="only redraw and present the changed parts of the screen, the background does not scroll")
+parser.add_argument("--adaptive-resolution", action="store_true", help="draw the game world at a lower resolution while frames take too long (the HUD stays sharp)")
+args, _ = parser.parse_known_args()
+seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+dirty_rects = args.dirty_rects or (sys.platform == "emscripten" and consts.BROWSER_DIRTY_RECTS)
 
 pygame.init()
 canvas = pygame.display.set_mode(GAME_SIZE) # Bildschirmgröße festlegen und dabei den Canvas erstellen.
-user_input = UserInput()
+user_input: UserInputType = UserInput()
+if args.record:
+    user_input = RecordingUserInput(user_input, args.record, seed)
 
-state = AndromedaClashGameState(canvas, user_input)
+state = AndromedaClashGameState(canvas, user_input, seed=seed, dirty_rects=dirty_rects, adaptive_resolution=args.adaptive_resolution)
 
 
 if __name__ == "__main__":
     state.loop()
+    user_input.close()
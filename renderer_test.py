@@ -0,0 +1,59 @@
+"""
+Checks that the dirty-rect renderer only presents the whole screen when it has to (headless, SDL dummy display).
+
+    python -m unittest renderer_test
+"""
+import unittest
+import pygame
+from game.headless import create_headless_state, init_headless, run_frames
+from game.game_state import GAME_SIZE
+from game.background import Background
+from game.renderer import DirtyRectRenderer
+
+class DirtyRectRendererTest(unittest.TestCase):
+    def setUp(self):
+        self.canvas = init_headless()
+        self.background = Background(GAME_SIZE, scrolling=False)
+        self.renderer = DirtyRectRenderer(GAME_SIZE)
+
+    def frame(self, *rects: pygame.Rect) -> None:
+        self.background.update()
+        self.renderer.begin_frame(self.canvas, self.background)
+        self.renderer.add_all(rects)
+        self.renderer.present()
+
+    def test_only_the_first_frame_is_full(self):
+        for x in range(10):
+            self.frame(pygame.Rect(x * 10, 50, 20, 20))
+        self.assertEqual((self.renderer.presents, self.renderer.full_presents), (10, 1))
+
+    def test_full_present_does_not_force_the_next_frame(self):
+        self.frame(pygame.Rect(0, 0, 20, 20))
+        self.frame(pygame.Rect(10, 0, 20, 20))
+        self.background.changed_rects = [self.background.screen_rect] # Wie nach einem Scrollschritt
+        self.renderer.begin_frame(self.canvas, self.background)
+        self.renderer.add(pygame.Rect(20, 0, 20, 20))
+        self.renderer.present()
+        self.frame(pygame.Rect(30, 0, 20, 20))
+        self.assertEqual((self.renderer.presents, self.renderer.full_presents), (4, 2))
+        self.assertEqual(self.renderer.previous, [pygame.Rect(30, 0, 20, 20)])
+
+    def test_unknown_area_is_redrawn_in_full(self):
+        self.frame(pygame.Rect(0, 0, 20, 20))
+        self.renderer.begin_frame(self.canvas, self.background)
+        self.renderer.add(None)
+        self.renderer.present()
+        self.assertIsNone(self.renderer.previous)
+        self.frame()
+        self.assertEqual(self.renderer.full_presents, 3)
+
+    def test_game_presents_few_full_frames(self):
+        state = create_headless_state(render=True, seed=7, dirty_rects=True)
+        run_frames(state, 1200)
+        renderer = state.renderer
+        assert isinstance(renderer, DirtyRectRenderer)
+        self.assertEqual(renderer.presents, 1200)
+        self.assertLess(renderer.full_presents, 12)
+
+if __name__ == "__main__":
+    unittest.main()
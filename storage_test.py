@@ -0,0 +1,279 @@
+"""
+Tests the storage service against a local stand-in for the storage server (http.server on 127.0.0.1).
+
+    python -m unittest storage_test
+"""
+from __future__ import annotations
+from collections import Counter
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import tempfile
+import threading
+import time
+import unittest
+from game import consts
+from game.storage import (
+    ChannelFull, CommandChannel, HttpStorageBackend, HttpTask, LocalCache, StorageCommand, StorageService, WriteJournal,
+    run_async_in_thread
+)
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real server
+    server: StandInHTTPServer
+
+    def setup(self):
+        super().setup()
+        with self.server.stand_in.lock:
+            self.server.stand_in.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def get_key(self) -> str:
+        return self.path.removeprefix("/storage/file/").rstrip("/")
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def respond(self, body: bytes = b"") -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        stand_in.count("GET")
+        time.sleep(stand_in.delay)
+        self.respond(stand_in.data.get(self.get_key(), "").encode())
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        body = self.read_body()
+        time.sleep(stand_in.delay)
+        if self.path.startswith("/storage/batch/"):
+            stand_in.count("BATCH")
+            request = json.loads(body)
+            stand_in.batches.append(request)
+            if "read" in request:
+                self.respond(json.dumps({key: stand_in.data.get(key, "") for key in request["read"]}).encode())
+                return
+            stand_in.data.update(request["write"])
+            self.respond(b"{}")
+            return
+        stand_in.count("POST")
+        stand_in.data[self.get_key()] = body.decode()
+        self.respond()
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: StandInServer
+
+class StandInServer:
+    """
+    Answers like the storage server and counts the connections and the requests per method (GET, POST, BATCH).
+    """
+    data: dict[str, str]
+    delay: float # Seconds before every answer
+    connections: int
+    requests: Counter[str]
+    batches: list[dict] # Bodies of the requests to the batch endpoint
+    lock: threading.Lock
+    url: str
+    batch_url: str
+
+    def __init__(self, delay: float = 0.0):
+        self.data = {}
+        self.delay = delay
+        self.connections = 0
+        self.requests = Counter()
+        self.batches = []
+        self.lock = threading.Lock()
+        self.httpd = StandInHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.httpd.stand_in = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/storage/"
+        self.url = base_url + "file/"
+        self.batch_url = base_url + "batch/"
+
+    def count(self, method: str) -> None:
+        with self.lock:
+            self.requests[method] += 1
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class StorageTestCase(unittest.TestCase):
+    server: StandInServer
+    cache_path: Path
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.addCleanup(self.server.close)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = Path(directory.name)
+
+    def create_service(self, batch: bool = False, **kwargs) -> StorageService:
+        batch_url = self.server.batch_url if batch else None
+        return StorageService(lambda: HttpStorageBackend(self.server.url, batch_url=batch_url), LocalCache(self.cache_path), **kwargs)
+
+    def start(self, service: StorageService) -> threading.Thread:
+        thread = run_async_in_thread(service.run())
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(service.close)
+        return thread
+
+    def stop(self, service: StorageService, thread: threading.Thread) -> None:
+        service.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def wait_for(self, condition: Callable[[], bool], timeout: float = 5.0) -> None:
+        end = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < end:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+class CommandChannelTest(unittest.TestCase):
+    def test_put_raises_channel_full_after_timeout(self):
+        channel: CommandChannel[int] = CommandChannel(2)
+        channel.put(1)
+        channel.put(2)
+        start = time.perf_counter()
+        with self.assertRaises(ChannelFull):
+            channel.put(3, timeout=0.1)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+        self.assertEqual(len(channel), 2)
+
+    def test_put_fails_after_close(self):
+        channel: CommandChannel[int] = CommandChannel(2)
+        channel.close()
+        with self.assertRaises(ChannelFull):
+            channel.put(1)
+
+class StorageServiceTest(StorageTestCase):
+    def test_send_counts_dropped_commands(self):
+        service = self.create_service(capacity=2)
+        sent = [service.send(StorageCommand(HttpTask.READ, key)) for key in ("a", "b", "c")]
+        self.assertEqual(sent, [True, True, False])
+        self.assertEqual(service.dropped, 1)
+
+    def test_connections_are_reused(self):
+        self.server.delay = 0.02 # So that several requests are in flight at once
+        service = self.create_service()
+        self.start(service)
+        keys = [f"key{index}" for index in range(40)]
+        for key in keys:
+            service.read(key)
+        self.wait_for(lambda: service.latency.requests == len(keys))
+        self.assertEqual(self.server.requests["GET"], len(keys))
+        self.assertLessEqual(self.server.connections, consts.STORAGE_POOL_SIZE)
+        workers = [thread for thread in threading.enumerate() if thread.name.startswith("storage-http")]
+        self.assertLessEqual(len(workers), consts.STORAGE_POOL_SIZE)
+
+    def test_close_finishes_sent_commands(self):
+        service = self.create_service(flush_window=10.0) # Only close makes it write now.
+        service.write("a", "1")
+        service.read("b")
+        thread = run_async_in_thread(service.run())
+        self.stop(service, thread)
+        self.assertEqual(self.server.data, {"a": "1"})
+        self.assertEqual(self.server.requests, Counter({"GET": 1, "POST": 1}))
+
+    def test_latency_records_each_request(self):
+        service = self.create_service(flush_window=0.0)
+        thread = self.start(service)
+        service.write("a", "1")
+        service.read("b")
+        service.read("c")
+        self.wait_for(lambda: service.latency.requests == 3)
+        self.stop(service, thread)
+        self.assertEqual(sum(self.server.requests.values()), 3)
+        self.assertEqual(len(service.latency.samples), 3)
+        self.assertEqual(service.latency.errors, 0)
+
+    def test_latency_records_errors(self):
+        service = StorageService(lambda: HttpStorageBackend("http://127.0.0.1:1/storage/file/", timeout=1), LocalCache(self.cache_path))
+        thread = self.start(service)
+        service.read("a")
+        self.wait_for(lambda: service.latency.requests == 1)
+        self.stop(service, thread)
+        self.assertEqual(service.latency.errors, 1)
+        self.assertTrue(service.latency.last_error)
+
+    def test_dropped_write_is_sent_with_the_next_write(self):
+        service = self.create_service(capacity=1, flush_window=0.0)
+        service.read("a") # Fills the channel
+        dropped = service.write_async("highscores", "1")
+        service.write("highscores", "2")
+        self.assertEqual(service.dropped, 2)
+        service.deliver_completions()
+        self.assertFalse(dropped.result())
+        thread = self.start(service)
+        self.wait_for(lambda: self.server.requests["GET"] == 1)
+        service.write("highscores", "3")
+        self.wait_for(lambda: self.server.requests["POST"] == 1)
+        self.stop(service, thread)
+        self.assertEqual(self.server.data, {"highscores": "3"})
+
+    def test_journal_is_loaded_before_the_service_starts(self):
+        path = self.cache_path / "journal.jsonl"
+        path.write_text(json.dumps({"seq": 0, "key": "highscores", "data": "a,10"}) + "\n")
+        journal = WriteJournal(path)
+        service = self.create_service(flush_window=0.0)
+        service.use_journal(journal)
+        self.assertEqual(journal.pending, {"highscores": (0, "a,10")})
+        syncs = journal.syncs
+        service.write("settings", "1") # Only appends a line, without fsync
+        self.assertEqual(journal.syncs, syncs)
+        thread = self.start(service)
+        self.wait_for(lambda: self.server.requests["POST"] == 2)
+        self.stop(service, thread)
+        self.assertEqual(self.server.data, {"highscores": "a,10", "settings": "1"})
+        self.assertEqual(service.replayed, 1)
+        self.assertEqual(journal.pending, {})
+
+class RequestCountTest(StorageTestCase):
+    def test_writes_to_one_key_are_coalesced(self):
+        service = self.create_service(flush_window=0.2)
+        thread = self.start(service)
+        for index in range(20):
+            service.write("highscores", str(index))
+        self.wait_for(lambda: self.server.requests["POST"] == 1)
+        self.stop(service, thread)
+        self.assertEqual(self.server.requests, Counter({"POST": 1}))
+        self.assertEqual(self.server.data, {"highscores": "19"})
+        self.assertEqual(service.coalesced, 19)
+
+    def test_concurrent_reads_share_one_request(self):
+        self.server.delay = 0.1
+        self.server.data["highscores"] = "a,10"
+        service = self.create_service()
+        thread = self.start(service)
+        first = service.read_async("highscores")
+        second = service.read_async("highscores")
+        self.wait_for(lambda: len(service.completions) == 2)
+        service.deliver_completions()
+        self.stop(service, thread)
+        self.assertEqual((first.result(), second.result()), ("a,10", "a,10"))
+        self.assertEqual(self.server.requests, Counter({"GET": 1}))
+        self.assertEqual(service.shared_reads, 1)
+
+    def test_batch_endpoint_groups_reads_and_writes(self):
+        service = self.create_service(batch=True, flush_window=0.1)
+        for key in ("a", "b", "c"):
+            service.read(key) # All three are waiting in the channel when the service starts.
+        service.write("d", "D")
+        service.write("e", "E")
+        thread = self.start(service)
+        self.wait_for(lambda: self.server.requests["BATCH"] == 2)
+        self.stop(service, thread)
+        self.assertEqual(self.server.requests, Counter({"BATCH": 2}))
+        self.assertEqual(self.server.batches, [{"read": ["a", "b", "c"]}, {"write": {"d": "D", "e": "E"}}])
+
+if __name__ == "__main__":
+    unittest.main()